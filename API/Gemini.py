@@ -1,6 +1,8 @@
 from API.interface.ILLMApi import *
+from API.Knowledge import knowledge
+from API.Prompts import assistant_prompt
+from app.src.utils.RateLimiter import provider_limiters
 import google.generativeai as genai
-import PyPDF2
 import os
 from dotenv import load_dotenv
 
@@ -12,91 +14,20 @@ class Gemini(ILLMApi):
         super().__init__("gemini-2.5-flash")
         self.api_key = os.getenv("GEMINI_API")
         genai.configure(api_key=self.api_key)
+        self.rate_limiter = provider_limiters["gemini"]
 
-        self._read_pdf()
-        # Generate system prompt with PDF content
-        faq_content = """
-        Esas son las Prenguntas Frecuentes (FAQ):
-        
-        ¿Quién es Ingelean S.A.S.?
-        Empresa colombiana fundada en 2013, especializada en soluciones de ingeniería Industria 4.0. NIT 900614119‑8, sede en Pereira, Risaralda.
-
-        ¿Misión y visión?
-        Misión: Optimizar procesos industriales mediante soluciones tecnológicas innovadoras.
-        Visión: Líderes globales Industria 4.0 para 2026.
-
-        ¿Servicios ofrecidos?
-        • Automatización industrial y parqueaderos
-        • Hardware embebido (PCBs, sistemas análogo/digital)
-        • Software (cloud, visión computador, ML)
-        • Tarjetas NFC personalizadas
-        • Telemetría, M2M, domótica, consultoría
-
-        ¿Automatización industrial?
-        Diagnóstico, diseño, simulación, programación PLCs y sistemas de control automático.
-
-        ¿Automatización parqueaderos?
-        ANPR, talanqueras RFID, tiquetes, software gestión vehicular.
-
-        ¿IngeleanPlus?
-        Ecosistema digital para análisis datos tiempo real, gestión recursos y monitoreo continuo.
-
-        ¿Cobertura geográfica?
-        Nacional: Risaralda, Caldas, Quindío, Magdalena, Bolívar, Cundinamarca, Antioquia, Valle, Chocó.
-        Internacional: España, Paraguay.
-
-        ¿Qué tipo de clientes atiende Ingelean?
-        Empresas industriales, manufactureras, tecnológicas y de servicios que buscan transformación digital, optimización de procesos y soluciones a medida en automatización, software y hardware.
-
-        ¿Qué metodologías de trabajo utiliza Ingelean?
-        Implementamos metodologías ágiles como Scrum, con enfoque colaborativo, iterativo y flexible. Aseguramos entregas parciales y mejora continua con participación activa del cliente.
-
-        ¿Contacto?
-        Web: www.ingelean.com
-        Tel: +57 311 419 6803 / +57 321 594 2872 / 324 607 9894
-        Email: comercial@ingelean.com
-        WhatsApp: wa.me/573043262538
-        """
-
-        self.system_prompt = f"""
-        Eres Johan, agente virtual de Ingelean especializado en soluciones industriales 4.0.
-
-        TONO: Profesional, empático y claro. Usa emojis y sé conciso.
-
-        PROCESO:
-        1. Solicita nombre del cliente
-        2. Determina motivo de contacto y tipo de requerimiento
-        3. Responde solo con información disponible
-        4. Si no tienes info, sugiere agendar llamada
-
-        EMPRESA: Soluciones innovadoras en ingeniería eléctrica, eficiencia energética y automatización industrial.
-
-        {faq_content}
-
-        INFORMACIÓN TÉCNICA:
-        {self.pdf_text}
-        """
+        # Prompt de sistema del agente (con el PDF completo o solo la instrucción si hay recuperación)
+        self.system_prompt = assistant_prompt(self.path_info)
         
         self.model = genai.GenerativeModel(self.model_name,
                                            system_instruction=self.system_prompt)
+        # Modelo sin el prompt de sistema (ni el PDF) para tareas internas como resúmenes
+        self.summary_model = genai.GenerativeModel(self.model_name)
 
 
     def _read_pdf(self):
-        file_path = './API/pdf/Brochure-Ingelean.pdf'
-        self.pdf_text = ""
-        try:
-            with open(file_path, 'rb') as file:
-                reader = PyPDF2.PdfReader(file)
-                for page in reader.pages:
-                    text = page.extract_text()
-                    if text:
-                        self.pdf_text += text
-        except FileNotFoundError:
-            print(f"Error: El archivo no se encontró en la ruta {file_path}")
-            return ""
-        except Exception as e:
-            print(f"Ocurrió un error al leer el PDF: {e}")
-            return ""
+        """Texto del PDF compartido entre clientes (caché en memoria y en disco)"""
+        self.pdf_text = knowledge.get_pdf_text(self.path_info)
         return self.pdf_text
 
 
@@ -114,8 +45,66 @@ class Gemini(ILLMApi):
             })
         return contexto_gemini
 
+    @staticmethod
+    def _usage(respuesta) -> Optional[Usage]:
+        metadata = getattr(respuesta, "usage_metadata", None)
+        return Usage(metadata.prompt_token_count, metadata.candidates_token_count) if metadata else None
+
     def responder_pregunta_con_contexto(self, pregunta: str, contexto: list):
         contexto_gemini = self._parse_contexto(contexto)
         chat = self.model.start_chat(history=contexto_gemini)
         respuesta = chat.send_message(pregunta, stream=True)
-        return respuesta
\ No newline at end of file
+        return respuesta
+
+    async def responder_pregunta_async(self, pregunta: str):
+        """Versión asíncrona: retorna un stream que se consume con `async for`"""
+        async with self._con_cupo(self._textos_peticion(pregunta)):
+            chat = self.model.start_chat()
+            respuesta = await chat.send_message_async(pregunta, stream=True)
+        return respuesta
+
+    async def responder_pregunta_con_contexto_async(self, pregunta: str, contexto: list):
+        """Versión asíncrona con historial: no bloquea el event loop mientras llegan los tokens"""
+        async with self._con_cupo(self._textos_peticion(pregunta, contexto)):
+            contexto_gemini = self._parse_contexto(contexto)
+            chat = self.model.start_chat(history=contexto_gemini)
+            respuesta = await chat.send_message_async(pregunta, stream=True)
+        return respuesta
+
+    async def stream_respuesta(self, pregunta: str, contexto: list = None, reserva=None):
+        """Respuesta en streaming como deltas tipados, con uso de tokens de usage_metadata"""
+        async with self._con_cupo(self._textos_peticion(pregunta, contexto), reserva) as reserva:
+            builder = DeltaBuilder(self.model_name)
+            chat = self.model.start_chat(history=self._parse_contexto(contexto) if contexto else None)
+            respuesta = await chat.send_message_async(pregunta, stream=True)
+            usage = None
+            async for chunk in respuesta:
+                usage = self._usage(chunk) or usage
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunk sin partes de texto (por ejemplo, solo metadatos o bloqueo de seguridad)
+                    text = ""
+                if text:
+                    yield builder.text(text)
+            await self._conciliar_uso(reserva, usage)
+            yield builder.end(usage)
+
+    async def resumir_conversacion_async(self, resumen_previo: str, contexto: list) -> str:
+        """Integra mensajes antiguos en un resumen acumulado de la conversación"""
+        conversacion = "\n".join(
+            f"{'Usuario' if i['role'] == 'user' else 'Asistente'}: {i['content']}" for i in contexto
+        )
+        prompt = f"""
+        Resume la siguiente conversación entre un cliente y el asistente de Ingelean en máximo 150 palabras.
+        Conserva el nombre del cliente, su motivo de contacto, requerimientos y compromisos acordados.
+
+        Resumen previo: {resumen_previo or "Ninguno"}
+
+        Nuevos mensajes:
+        {conversacion}
+        """
+        async with self._con_cupo([prompt]) as reserva:
+            respuesta = await self.summary_model.generate_content_async(prompt)
+            await self._conciliar_uso(reserva, self._usage(respuesta))
+        return respuesta.text
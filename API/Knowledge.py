@@ -0,0 +1,121 @@
+import hashlib
+import os
+import threading
+import PyPDF2
+
+# Preguntas frecuentes compartidas por los prompts de sistema de todos los proveedores
+FAQ_CONTENT = """
+        Esas son las Prenguntas Frecuentes (FAQ):
+        
+        ¿Quién es Ingelean S.A.S.?
+        Empresa colombiana fundada en 2013, especializada en soluciones de ingeniería Industria 4.0. NIT 900614119‑8, sede en Pereira, Risaralda.
+
+        ¿Misión y visión?
+        Misión: Optimizar procesos industriales mediante soluciones tecnológicas innovadoras.
+        Visión: Líderes globales Industria 4.0 para 2026.
+
+        ¿Servicios ofrecidos?
+        • Automatización industrial y parqueaderos
+        • Hardware embebido (PCBs, sistemas análogo/digital)
+        • Software (cloud, visión computador, ML)
+        • Tarjetas NFC personalizadas
+        • Telemetría, M2M, domótica, consultoría
+
+        ¿Automatización industrial?
+        Diagnóstico, diseño, simulación, programación PLCs y sistemas de control automático.
+
+        ¿Automatización parqueaderos?
+        ANPR, talanqueras RFID, tiquetes, software gestión vehicular.
+
+        ¿IngeleanPlus?
+        Ecosistema digital para análisis datos tiempo real, gestión recursos y monitoreo continuo.
+
+        ¿Cobertura geográfica?
+        Nacional: Risaralda, Caldas, Quindío, Magdalena, Bolívar, Cundinamarca, Antioquia, Valle, Chocó.
+        Internacional: España, Paraguay.
+
+        ¿Qué tipo de clientes atiende Ingelean?
+        Empresas industriales, manufactureras, tecnológicas y de servicios que buscan transformación digital, optimización de procesos y soluciones a medida en automatización, software y hardware.
+
+        ¿Qué metodologías de trabajo utiliza Ingelean?
+        Implementamos metodologías ágiles como Scrum, con enfoque colaborativo, iterativo y flexible. Aseguramos entregas parciales y mejora continua con participación activa del cliente.
+
+        ¿Contacto?
+        Web: www.ingelean.com
+        Tel: +57 311 419 6803 / +57 321 594 2872 / 324 607 9894
+        Email: comercial@ingelean.com
+        WhatsApp: wa.me/573043262538
+        """
+
+
+class Knowledge:
+    """Texto de los documentos de conocimiento, extraído una sola vez por proceso
+
+    El texto extraído del PDF se guarda en disco con el hash del archivo
+    como clave, de modo que un arranque en frío no vuelve a ejecutar PyPDF2
+    mientras el documento no cambie.
+    """
+
+    def __init__(self, cache_dir: str = None):
+        self.cache_dir = cache_dir or os.getenv("KNOWLEDGE_CACHE_DIR", "./.cache/knowledge")
+        self._texts = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def file_hash(file_path: str) -> str:
+        """Hash SHA-256 del contenido del archivo"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 16), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def get_pdf_text(self, file_path: str) -> str:
+        """Retorna el texto del PDF (memoria -> caché en disco -> PyPDF2)"""
+        with self._lock:
+            if file_path not in self._texts:
+                self._texts[file_path] = self._load_pdf_text(file_path)
+            return self._texts[file_path]
+
+    def invalidate(self):
+        """Descarta los textos en memoria (el próximo uso relee el documento cambiado)"""
+        with self._lock:
+            self._texts.clear()
+
+    def _load_pdf_text(self, file_path: str) -> str:
+        try:
+            cache_path = os.path.join(self.cache_dir, f"{self.file_hash(file_path)}.txt")
+        except FileNotFoundError:
+            print(f"Error: El archivo no se encontró en la ruta {file_path}")
+            return ""
+
+        if os.path.exists(cache_path):
+            with open(cache_path, 'r', encoding='utf-8') as cache_file:
+                return cache_file.read()
+
+        text = ""
+        try:
+            with open(file_path, 'rb') as file:
+                reader = PyPDF2.PdfReader(file)
+                for page in reader.pages:
+                    page_text = page.extract_text()
+                    if page_text:
+                        text += page_text + "\n"
+        except Exception as e:
+            print(f"Ocurrió un error al leer el PDF: {e}")
+            return ""
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Escritura atómica: otro worker puede estar leyendo la misma caché
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as cache_file:
+                cache_file.write(text)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"No se pudo guardar la caché del PDF: {e}")
+        return text
+
+
+# Instancia global compartida por todos los clientes LLM
+knowledge = Knowledge()
@@ -0,0 +1,310 @@
+import asyncio
+import os
+import time
+from typing import Callable, Dict, List, Optional
+from API.interface.ILLMApi import ILLMApi
+
+
+class CircuitBreaker:
+    """Deja de enviar peticiones a un proveedor tras fallos consecutivos
+
+    Abierto durante `reset_timeout` segundos; luego permite una petición de
+    prueba (semiabierto) que lo cierra si tiene éxito o lo reabre si falla.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_progress = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        """True si se puede enviar una petición (reserva la prueba en semiabierto)"""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_progress:
+            self._trial_in_progress = True
+            return True
+        return False
+
+    def release(self):
+        """Libera la prueba reservada si la petición se canceló sin resultado"""
+        self._trial_in_progress = False
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_progress = False
+
+    def failure(self):
+        self.failures += 1
+        self._trial_in_progress = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class ProviderStats:
+    """Latencia al primer token (EWMA) y circuit breaker de un proveedor
+
+    Sin mediciones nuevas la EWMA pierde peso: latency() la reduce a la
+    mitad cada `half_life` segundos. Así un proveedor relegado (que ya no
+    es primario y no se mide) vuelve a probarse como primario cuando su
+    dato queda viejo, antes cuanto menos lento fuera.
+    """
+
+    def __init__(self, alpha: float, breaker: CircuitBreaker, half_life: float = 0):
+        self.alpha = alpha
+        self.breaker = breaker
+        self.half_life = half_life
+        self.ewma_first_token: Optional[float] = None
+        self.measured_at: Optional[float] = None
+        self.requests = 0
+        self.errors = 0
+        self.hedge_wins = 0
+
+    def record_latency(self, seconds: float):
+        if self.ewma_first_token is None:
+            self.ewma_first_token = seconds
+        else:
+            self.ewma_first_token = self.alpha * seconds + (1 - self.alpha) * self.ewma_first_token
+        self.measured_at = time.monotonic()
+
+    def latency(self) -> float:
+        """EWMA para ordenar proveedores, descontada por antigüedad (inf sin mediciones)"""
+        if self.ewma_first_token is None:
+            return float("inf")
+        if self.half_life <= 0:
+            return self.ewma_first_token
+        return self.ewma_first_token * 0.5 ** ((time.monotonic() - self.measured_at) / self.half_life)
+
+    def to_dict(self) -> Dict:
+        return {
+            "ewma_first_token_ms": round(self.ewma_first_token * 1000, 1) if self.ewma_first_token is not None else None,
+            "requests": self.requests,
+            "errors": self.errors,
+            "hedge_wins": self.hedge_wins,
+            "circuit": self.breaker.state
+        }
+
+
+class LLMRouter(ILLMApi):
+    """Enruta las peticiones de chat entre varios proveedores ILLMApi
+
+    El primario es el proveedor disponible con menor latencia al primer
+    token (EWMA). Si no entrega el primer token en `hedge_delay` segundos
+    se lanza la misma petición al siguiente proveedor y se conserva la que
+    responda primero; la otra se cancela. Un error dispara el siguiente
+    proveedor de inmediato. Los proveedores se resuelven por nombre en el
+    registro, por lo que en benchmarks se pueden sustituir por falsos.
+    """
+
+    def __init__(self, providers: List[str], resolve: Callable[[str], ILLMApi],
+                 hedge_delay: Optional[float] = None, alpha: float = 0.2,
+                 failure_threshold: Optional[int] = None, reset_timeout: Optional[float] = None,
+                 half_life: Optional[float] = None):
+        super().__init__("router")
+        self.providers = list(providers)
+        self.resolve = resolve
+        self.hedge_delay = hedge_delay if hedge_delay is not None else float(os.getenv("LLM_HEDGE_DELAY", "2.5"))
+        failure_threshold = failure_threshold or int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+        reset_timeout = reset_timeout or float(os.getenv("LLM_BREAKER_RESET", "30"))
+        half_life = half_life if half_life is not None else float(os.getenv("LLM_EWMA_HALF_LIFE", "60"))
+        self.stats = {
+            name: ProviderStats(alpha, CircuitBreaker(failure_threshold, reset_timeout), half_life)
+            for name in self.providers
+        }
+
+    def _ranked(self) -> List[str]:
+        """Proveedores con el circuito cerrado ordenados por latencia
+
+        Un proveedor sin mediciones va después de los medidos (en el orden
+        configurado): solo se usa como respaldo hasta tener datos. Las
+        mediciones viejas se descuentan (ProviderStats.latency) para que un
+        proveedor relegado se vuelva a probar.
+        """
+        order = {name: index for index, name in enumerate(self.providers)}
+        available = [name for name in self.providers if self.stats[name].breaker.state != "open"]
+        if not available:
+            # Todos abiertos: se intenta igual en el orden configurado antes que fallar sin probar
+            return list(self.providers)
+        return sorted(available, key=lambda name: (self.stats[name].latency(), order[name]))
+
+    async def _first_delta(self, name: str, pregunta: str, contexto: list, dispatched: Dict[str, float]):
+        """Reserva cupo en `name`, lanza la petición y espera su primer delta
+
+        La latencia se mide desde que termina la espera en el límite del
+        proveedor (dispatched[name]): esa espera no es lentitud del proveedor.
+        """
+        stats = self.stats[name]
+        stats.requests += 1
+        provider = self.resolve(name)
+        reserva = await provider.reservar_cupo(pregunta, contexto)
+        dispatched[name] = time.perf_counter() + (reserva.delay if reserva is not None else 0)
+        stream = provider.stream_respuesta(pregunta, contexto, reserva=reserva)
+        try:
+            first = await stream.__anext__()
+        except StopAsyncIteration:
+            first = None
+        stats.record_latency(time.perf_counter() - dispatched[name])
+        return first, stream
+
+    async def _race(self, pregunta: str, contexto: list = None):
+        """Primer delta del proveedor que responda antes (con cobertura y failover)"""
+        queue = self._ranked()
+        # Con todos los circuitos abiertos se ignoran los breakers
+        force = all(self.stats[name].breaker.state == "open" for name in self.providers)
+        pending: Dict[asyncio.Task, str] = {}
+        launched: List[str] = []
+        dispatched: Dict[str, float] = {}
+        # Streams abiertos que no se entregan (perdedores): se cierran al final
+        opened = []
+        # Lanzamientos que tomaron la prueba semiabierta de su circuito (solo esos la liberan)
+        trials = set()
+
+        def launch() -> bool:
+            while queue:
+                name = queue.pop(0)
+                breaker = self.stats[name].breaker
+                half_open = breaker.state == "half_open"
+                if force or breaker.allow():
+                    if half_open and not force:
+                        trials.add(name)
+                    launched.append(name)
+                    pending[asyncio.create_task(self._first_delta(name, pregunta, contexto, dispatched))] = name
+                    return True
+            return False
+
+        def hedge_timeout() -> Optional[float]:
+            """Segundos hasta la cobertura: cuenta desde el envío real del último lanzado"""
+            if not queue:
+                return None
+            now = time.perf_counter()
+            return max(dispatched.get(launched[-1], now) + self.hedge_delay - now, 0)
+
+        if not launch():
+            # Ningún proveedor admite peticiones (pruebas semiabiertas en curso): se intenta igual
+            queue, force = list(self.providers), True
+            launch()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, timeout=hedge_timeout(), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # El primario no entregó el primer token a tiempo: petición de cobertura
+                    # (si seguía esperando cupo en su límite, el plazo se corrió)
+                    if hedge_timeout() == 0:
+                        launch()
+                    continue
+                winner = None
+                for task in done:
+                    name = pending.pop(task)
+                    try:
+                        first, stream = task.result()
+                    except Exception as e:
+                        print(f"Error del proveedor LLM {name}: {e}")
+                        self.stats[name].errors += 1
+                        self.stats[name].breaker.failure()
+                        continue
+                    self.stats[name].breaker.success()
+                    if winner is None:
+                        winner = (name, first, stream)
+                    else:
+                        opened.append(stream)
+                if winner is not None:
+                    name = winner[0]
+                    if name != launched[0]:
+                        self.stats[name].hedge_wins += 1
+                    return winner
+                if not pending:
+                    # Falló sin respuesta: se pasa al siguiente proveedor sin esperar
+                    launch()
+            raise RuntimeError("Ningún proveedor LLM respondió")
+        finally:
+            now = time.perf_counter()
+            for task, name in pending.items():
+                task.cancel()
+                # La espera hasta cancelar es una cota inferior de su latencia; sin esto
+                # un primario lento conservaría su EWMA y seguiría siendo el primario.
+                # No cuenta si seguía esperando cupo (no llegó a enviarse)
+                if name in dispatched and dispatched[name] < now:
+                    self.stats[name].record_latency(now - dispatched[name])
+                # La prueba semiabierta puede ser de otra petición: solo se libera la propia
+                if name in trials:
+                    self.stats[name].breaker.release()
+            if pending or opened:
+                # En otra tarea: si el cliente se fue, esta ya está cancelada y no puede esperar
+                await asyncio.shield(asyncio.create_task(self._close_losers(list(pending), opened)))
+
+    @staticmethod
+    async def _close_losers(tasks: List[asyncio.Task], opened: list):
+        """Espera a que terminen las tareas canceladas y cierra todos los streams abiertos
+
+        Una tarea puede haber terminado con su primer delta justo al
+        cancelarla: su stream se cierra también (devuelve el cupo del
+        proveedor y la conexión).
+        """
+        for result in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(result, tuple):
+                opened.append(result[1])
+        for stream in opened:
+            try:
+                await stream.aclose()
+            except Exception as e:
+                print(f"Error al cerrar el stream de un proveedor LLM: {e}")
+
+    async def _relay(self, name: str, first, stream):
+        """Reenvía el stream del ganador; un error a mitad de respuesta cuenta como fallo"""
+        try:
+            if first is not None:
+                yield first
+            async for delta in stream:
+                yield delta
+        except Exception:
+            self.stats[name].errors += 1
+            self.stats[name].breaker.failure()
+            raise
+        finally:
+            # Si el cliente se va a mitad de respuesta se cierra el stream del proveedor (devuelve su cupo)
+            await stream.aclose()
+
+    async def stream_respuesta(self, pregunta: str, contexto: list = None, reserva=None):
+        """Deltas del proveedor más rápido en entregar el primer token"""
+        name, first, stream = await self._race(pregunta, contexto)
+        async for delta in self._relay(name, first, stream):
+            yield delta
+
+    async def responder_pregunta_async(self, pregunta: str):
+        """Stream de deltas (con `.text`) sin historial"""
+        return self.stream_respuesta(pregunta)
+
+    async def responder_pregunta_con_contexto_async(self, pregunta: str, contexto: list):
+        """Stream de deltas (con `.text`) con el historial de la conversación"""
+        return self.stream_respuesta(pregunta, contexto)
+
+    async def resumir_conversacion_async(self, resumen_previo: str, contexto: list) -> str:
+        """Resumen con failover secuencial (tarea de fondo, sin cobertura)"""
+        for name in self._ranked():
+            stats = self.stats[name]
+            stats.requests += 1
+            try:
+                resumen = await self.resolve(name).resumir_conversacion_async(resumen_previo, contexto)
+                stats.breaker.success()
+                return resumen
+            except Exception as e:
+                print(f"Error del proveedor LLM {name} al resumir: {e}")
+                stats.errors += 1
+                stats.breaker.failure()
+        raise RuntimeError("Ningún proveedor LLM pudo resumir la conversación")
+
+    def get_stats(self) -> Dict:
+        """Latencia, errores y estado del circuito por proveedor"""
+        return {name: stats.to_dict() for name, stats in self.stats.items()}
@@ -1,57 +1,29 @@
 from API.interface.ILLMApi import *
+from API.Knowledge import FAQ_CONTENT, knowledge
+from API.RetrievalIndex import RETRIEVAL_ENABLED
+from app.src.utils.RateLimiter import provider_limiters
 from mistralai import Mistral
 import os
-import PyPDF2
 
 class MistralAPI(ILLMApi):
-    def __init__(self):
+    def __init__(self, system_prompt: str = None):
         super().__init__("mistral-large-latest")
         self.api_key = os.getenv("MISTRAL_API")
         self.client = Mistral(api_key=self.api_key)
+        # Todos los clientes de Mistral (métricas y respaldo del chat) comparten la cuenta y el límite
+        self.rate_limiter = provider_limiters["mistral"]
         
-        self._get_info()
-        faq_content = """
-        Esas son las Prenguntas Frecuentes (FAQ):
+        if system_prompt is not None:
+            # Cliente con otro rol (por ejemplo, respaldo del agente de chat)
+            self.system_prompt = system_prompt
+            return
         
-        ¿Quién es Ingelean S.A.S.?
-        Empresa colombiana fundada en 2013, especializada en soluciones de ingeniería Industria 4.0. NIT 900614119‑8, sede en Pereira, Risaralda.
-
-        ¿Misión y visión?
-        Misión: Optimizar procesos industriales mediante soluciones tecnológicas innovadoras.
-        Visión: Líderes globales Industria 4.0 para 2026.
-
-        ¿Servicios ofrecidos?
-        • Automatización industrial y parqueaderos
-        • Hardware embebido (PCBs, sistemas análogo/digital)
-        • Software (cloud, visión computador, ML)
-        • Tarjetas NFC personalizadas
-        • Telemetría, M2M, domótica, consultoría
-
-        ¿Automatización industrial?
-        Diagnóstico, diseño, simulación, programación PLCs y sistemas de control automático.
-
-        ¿Automatización parqueaderos?
-        ANPR, talanqueras RFID, tiquetes, software gestión vehicular.
-
-        ¿IngeleanPlus?
-        Ecosistema digital para análisis datos tiempo real, gestión recursos y monitoreo continuo.
-
-        ¿Cobertura geográfica?
-        Nacional: Risaralda, Caldas, Quindío, Magdalena, Bolívar, Cundinamarca, Antioquia, Valle, Chocó.
-        Internacional: España, Paraguay.
-
-        ¿Qué tipo de clientes atiende Ingelean?
-        Empresas industriales, manufactureras, tecnológicas y de servicios que buscan transformación digital, optimización de procesos y soluciones a medida en automatización, software y hardware.
-
-        ¿Qué metodologías de trabajo utiliza Ingelean?
-        Implementamos metodologías ágiles como Scrum, con enfoque colaborativo, iterativo y flexible. Aseguramos entregas parciales y mejora continua con participación activa del cliente.
-
-        ¿Contacto?
-        Web: www.ingelean.com
-        Tel: +57 311 419 6803 / +57 321 594 2872 / 324 607 9894
-        Email: comercial@ingelean.com
-        WhatsApp: wa.me/573043262538
-        """
+        if RETRIEVAL_ENABLED:
+            # Cada mensaje a evaluar llega con los fragmentos de referencia relevantes
+            conocimiento = "Usa como referencia la información de Ingelean incluida junto a cada mensaje."
+        else:
+            self._get_info()
+            conocimiento = f"{FAQ_CONTENT}\n\n        INFORMACIÓN TÉCNICA DE REFERENCIA:\n        {self.pdf_text}"
 
         self.system_prompt = f"""
         Eres un agente analizador de mensajes especializado en evaluar interacciones de servicio al cliente de Ingelean.
@@ -85,25 +57,14 @@ class MistralAPI(ILLMApi):
         - 0-19: Muy insatisfecho (quejas fuertes, críticas, frustración)
 
         CONTEXTO DE EVALUACIÓN:
-        {faq_content}
-
-        INFORMACIÓN TÉCNICA DE REFERENCIA:
-        {self.pdf_text}
+        {conocimiento}
 
         Analiza cada mensaje considerando este contexto empresarial y retorna ÚNICAMENTE el JSON correspondiente.
         """
 
     def _get_info(self):
-        """Extrae el contenido del PDF para usarlo como contexto"""
-        try:
-            with open(self.path_info, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                self.pdf_text = ""
-                for page in pdf_reader.pages:
-                    self.pdf_text += page.extract_text() + "\n"
-        except Exception as e:
-            print(f"Error al leer el PDF: {e}")
-            self.pdf_text = ""
+        """Extrae el contenido del PDF para usarlo como contexto (caché compartida)"""
+        self.pdf_text = knowledge.get_pdf_text(self.path_info)
 
     def generar_system_prompt(self, system_prompt: str):
         """Genera el prompt del sistema incluyendo el contenido del PDF"""
@@ -132,6 +93,74 @@ class MistralAPI(ILLMApi):
         except Exception as e:
             return f"Error al procesar la pregunta: {e}"
 
+    async def responder_pregunta_async(self, pregunta: str):
+        """Versión asíncrona de responder_pregunta (no bloquea el event loop)
+
+        A diferencia de la síncrona, un error del proveedor se lanza en lugar
+        de retornarse como texto: el análisis de métricas no debe confundirlo
+        con una respuesta del modelo.
+        """
+        messages = [
+            {
+                "role": "system",
+                "content": self.system_prompt
+            },
+            {
+                "role": "user", 
+                "content": pregunta
+            }
+        ]
+        
+        response = await self._complete_async(messages)
+        
+        return response.choices[0].message.content
+
+    async def analizar_lote_async(self, mensajes: list, referencia: str = None):
+        """Evalúa varios mensajes en una sola petición con salida JSON estructurada (lanza los errores del proveedor)"""
+        listado = "\n".join(
+            f"[{indice}] Escrito por {mensaje['role']}: {mensaje['content']}"
+            for indice, mensaje in enumerate(mensajes)
+        )
+        if referencia:
+            listado = f"REFERENCIA:\n{referencia}\n\n{listado}"
+        messages = [
+            {
+                "role": "system",
+                "content": self.system_prompt
+            },
+            {
+                "role": "user",
+                "content": f"""
+                Evalúa CADA uno de los siguientes mensajes por separado, con los mismos criterios.
+                Retorna ÚNICAMENTE un JSON con esta forma:
+                {{"resultados": [{{"indice": 0, "precision": 90}}, {{"indice": 1, "satisfacion": 70}}]}}
+
+                Mensajes:
+                {listado}
+                """
+            }
+        ]
+        
+        response = await self._complete_async(messages, response_format={"type": "json_object"})
+        
+        return response.choices[0].message.content
+
+    @staticmethod
+    def _usage(response) -> Optional[Usage]:
+        usage = getattr(response, "usage", None)
+        return Usage(usage.prompt_tokens, usage.completion_tokens) if usage else None
+
+    async def _complete_async(self, messages: list, **options):
+        """chat.complete_async respetando el límite de peticiones y tokens de la cuenta"""
+        async with self._con_cupo([message["content"] for message in messages]) as reserva:
+            response = await self.client.chat.complete_async(
+                model=self.model_name,
+                messages=messages,
+                **options
+            )
+            await self._conciliar_uso(reserva, self._usage(response))
+        return response
+
     def _parse_contexto(self, contexto: list):
         """Convierte el contexto al formato esperado por Mistral"""
         contexto_mistral = []
@@ -170,3 +199,79 @@ class MistralAPI(ILLMApi):
             return response.choices[0].message.content
         except Exception as e:
             return f"Error al procesar la pregunta con contexto: {e}"
+
+    async def responder_pregunta_con_contexto_async(self, pregunta: str, contexto: list):
+        """Versión asíncrona de responder_pregunta_con_contexto"""
+        try:
+            messages = [
+                {
+                    "role": "system",
+                    "content": self.system_prompt
+                }
+            ]
+            messages.extend(self._parse_contexto(contexto))
+            messages.append({
+                "role": "user",
+                "content": pregunta
+            })
+            
+            response = await self._complete_async(messages)
+            
+            return response.choices[0].message.content
+        except Exception as e:
+            return f"Error al procesar la pregunta con contexto: {e}"
+
+    async def stream_respuesta(self, pregunta: str, contexto: list = None, reserva=None):
+        """Respuesta token a token con chat.stream_async (deltas con uso y tiempos)"""
+        messages = [
+            {
+                "role": "system",
+                "content": self.system_prompt
+            }
+        ]
+        if contexto:
+            messages.extend(self._parse_contexto(contexto))
+        messages.append({
+            "role": "user",
+            "content": pregunta
+        })
+        
+        async with self._con_cupo([message["content"] for message in messages], reserva) as reserva:
+            builder = DeltaBuilder(self.model_name)
+            usage = None
+            response = await self.client.chat.stream_async(
+                model=self.model_name,
+                messages=messages
+            )
+            async with response as events:
+                async for event in events:
+                    chunk = event.data
+                    if chunk.usage:
+                        usage = Usage(chunk.usage.prompt_tokens, chunk.usage.completion_tokens)
+                    content = chunk.choices[0].delta.content if chunk.choices else None
+                    if isinstance(content, str) and content:
+                        yield builder.text(content)
+            await self._conciliar_uso(reserva, usage)
+            yield builder.end(usage)
+
+    async def resumir_conversacion_async(self, resumen_previo: str, contexto: list) -> str:
+        """Integra mensajes antiguos en un resumen acumulado de la conversación"""
+        conversacion = "\n".join(
+            f"{'Usuario' if i['role'] == 'user' else 'Asistente'}: {i['content']}" for i in contexto
+        )
+        messages = [
+            {
+                "role": "user",
+                "content": f"""
+                Resume la siguiente conversación entre un cliente y el asistente de Ingelean en máximo 150 palabras.
+                Conserva el nombre del cliente, su motivo de contacto, requerimientos y compromisos acordados.
+
+                Resumen previo: {resumen_previo or "Ninguno"}
+
+                Nuevos mensajes:
+                {conversacion}
+                """
+            }
+        ]
+        response = await self._complete_async(messages)
+        return response.choices[0].message.content
@@ -0,0 +1,28 @@
+from API.Knowledge import FAQ_CONTENT, knowledge
+from API.RetrievalIndex import RETRIEVAL_ENABLED
+
+
+def assistant_prompt(path_info: str) -> str:
+    """Prompt de sistema del agente virtual, compartido por los proveedores de chat"""
+    if RETRIEVAL_ENABLED:
+        # Cada pregunta llega con los fragmentos relevantes del PDF y las FAQ
+        conocimiento = "INFORMACIÓN: Usa la información relevante de Ingelean incluida en cada pregunta."
+    else:
+        pdf_text = knowledge.get_pdf_text(path_info)
+        conocimiento = f"{FAQ_CONTENT}\n\n        INFORMACIÓN TÉCNICA:\n        {pdf_text}"
+
+    return f"""
+        Eres Johan, agente virtual de Ingelean especializado en soluciones industriales 4.0.
+
+        TONO: Profesional, empático y claro. Usa emojis y sé conciso.
+
+        PROCESO:
+        1. Solicita nombre del cliente
+        2. Determina motivo de contacto y tipo de requerimiento
+        3. Responde solo con información disponible
+        4. Si no tienes info, sugiere agendar llamada
+
+        EMPRESA: Soluciones innovadoras en ingeniería eléctrica, eficiencia energética y automatización industrial.
+
+        {conocimiento}
+        """
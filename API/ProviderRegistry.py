@@ -0,0 +1,88 @@
+import os
+import threading
+from typing import Callable, Dict, Set
+from API.interface.ILLMApi import ILLMApi
+
+
+class ProviderRegistry:
+    """Registro de clientes LLM compartidos por todo el proceso
+
+    Cada cliente se construye una sola vez, en su primer uso, en lugar de
+    instanciarse en cada servicio y controlador al importar la aplicación.
+    Los que arman su prompt con los documentos de conocimiento se vuelven a
+    construir con refresh_knowledge() cuando estos cambian.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], ILLMApi]] = {}
+        self._instances: Dict[str, ILLMApi] = {}
+        self._uses_knowledge: Set[str] = set()
+        self._pinned: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], ILLMApi], uses_knowledge: bool = True):
+        """Registra la función que construye el cliente `name`"""
+        self._factories[name] = factory
+        if uses_knowledge:
+            self._uses_knowledge.add(name)
+
+    def set(self, name: str, instance: ILLMApi):
+        """Fija una instancia ya construida (por ejemplo, un proveedor falso en benchmarks)"""
+        with self._lock:
+            self._instances[name] = instance
+            self._pinned.add(name)
+
+    def refresh_knowledge(self):
+        """Descarta los clientes con prompts de conocimiento: se reconstruyen en su próximo uso
+
+        Los streams en curso terminan con el cliente anterior; las
+        instancias fijadas con set() se conservan.
+        """
+        with self._lock:
+            for name in self._uses_knowledge - self._pinned:
+                self._instances.pop(name, None)
+
+    def get(self, name: str) -> ILLMApi:
+        """Retorna el cliente compartido, construyéndolo en el primer uso"""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            if name not in self._instances:
+                if name not in self._factories:
+                    raise KeyError(f"Proveedor LLM no registrado: {name}")
+                self._instances[name] = self._factories[name]()
+            return self._instances[name]
+
+
+def _create_gemini() -> ILLMApi:
+    from API.Gemini import Gemini
+    return Gemini()
+
+
+def _create_mistral() -> ILLMApi:
+    from API.Mistral import MistralAPI
+    return MistralAPI()
+
+
+def _create_mistral_chat() -> ILLMApi:
+    # Mistral con el mismo prompt del agente, como respaldo de Gemini en el chat
+    from API.Mistral import MistralAPI
+    from API.Prompts import assistant_prompt
+    client = MistralAPI(system_prompt="")
+    client.system_prompt = assistant_prompt(client.path_info)
+    return client
+
+
+def _create_chat_router() -> ILLMApi:
+    from API.LLMRouter import LLMRouter
+    providers = os.getenv("LLM_CHAT_PROVIDERS", "gemini,mistral_chat")
+    return LLMRouter([name.strip() for name in providers.split(",") if name.strip()], provider_registry.get)
+
+
+# Registro global de proveedores
+provider_registry = ProviderRegistry()
+provider_registry.register("gemini", _create_gemini)
+provider_registry.register("mistral", _create_mistral)
+provider_registry.register("mistral_chat", _create_mistral_chat)
+provider_registry.register("chat", _create_chat_router, uses_knowledge=False)
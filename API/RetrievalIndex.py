@@ -0,0 +1,203 @@
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from API.Knowledge import FAQ_CONTENT, knowledge
+
+# Si está activo, los prompts llevan solo los fragmentos relevantes en lugar del documento completo
+RETRIEVAL_ENABLED = os.getenv("RETRIEVAL_ENABLED", "true").lower() == "true"
+
+STOPWORDS = {
+    "a", "al", "algo", "como", "con", "cual", "de", "del", "desde", "donde", "el", "ella", "en", "es",
+    "esa", "ese", "eso", "esta", "este", "esto", "ha", "hay", "la", "las", "le", "les", "lo", "los",
+    "mas", "me", "mi", "muy", "no", "nos", "o", "para", "pero", "por", "que", "quien", "se", "si",
+    "sin", "sobre", "son", "su", "sus", "te", "tu", "un", "una", "uno", "unos", "y", "ya", "yo"
+}
+
+
+class RetrievalIndex:
+    """Índice BM25 local sobre el PDF de la empresa y las FAQ
+
+    Los pesos BM25 se guardan como una matriz NumPy (términos x fragmentos)
+    en disco y se cargan con memory-map, por lo que varios workers comparten
+    las mismas páginas. El índice se puede construir offline con
+    `python -m API.RetrievalIndex` y se reconstruye si cambian los documentos.
+    """
+
+    def __init__(self, index_dir: Optional[str] = None, chunk_words: int = 120, overlap: int = 30,
+                 k1: float = 1.5, b: float = 0.75):
+        self.index_dir = index_dir or os.getenv("RETRIEVAL_INDEX_DIR", "./.cache/retrieval")
+        self.top_k = int(os.getenv("RETRIEVAL_TOP_K", "4"))
+        self.chunk_words = chunk_words
+        self.overlap = overlap
+        self.k1 = k1
+        self.b = b
+        self.vocabulary: Dict[str, int] = {}
+        self.chunks: List[Dict] = []
+        self.weights: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        """Minúsculas, sin tildes y sin palabras vacías"""
+        normalized = unicodedata.normalize("NFKD", text.lower())
+        normalized = "".join(char for char in normalized if not unicodedata.combining(char))
+        return [token for token in re.findall(r"\w+", normalized) if len(token) > 1 and token not in STOPWORDS]
+
+    def chunk_text(self, source: str, text: str) -> List[Dict]:
+        """Divide un documento en fragmentos de `chunk_words` palabras con solapamiento"""
+        words = text.split()
+        step = max(self.chunk_words - self.overlap, 1)
+        return [
+            {"source": source, "text": " ".join(words[start:start + self.chunk_words])}
+            for start in range(0, max(len(words) - self.overlap, 1), step)
+            if words[start:start + self.chunk_words]
+        ]
+
+    @staticmethod
+    def chunk_faq(text: str) -> List[Dict]:
+        """Un fragmento por pregunta frecuente"""
+        blocks = re.split(r"\n\s*\n(?=\s*¿)", text)
+        return [{"source": "faq", "text": " ".join(block.split())} for block in blocks if "¿" in block]
+
+    @staticmethod
+    def document_paths() -> List[str]:
+        """Documentos a indexar (KNOWLEDGE_DOCUMENTS, separados por coma)"""
+        paths = os.getenv("KNOWLEDGE_DOCUMENTS", "./API/pdf/Brochure-Ingelean.pdf")
+        return [path.strip() for path in paths.split(",") if path.strip()]
+
+    def _fingerprint(self) -> Dict[str, str]:
+        """Hash de cada fuente para detectar si el índice está desactualizado"""
+        fingerprint = {"faq": hashlib.sha256(FAQ_CONTENT.encode("utf-8")).hexdigest()}
+        for path in self.document_paths():
+            try:
+                fingerprint[path] = knowledge.file_hash(path)
+            except FileNotFoundError:
+                fingerprint[path] = ""
+        return fingerprint
+
+    def _read_document(self, path: str) -> str:
+        if path.lower().endswith(".pdf"):
+            return knowledge.get_pdf_text(path)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                return file.read()
+        except OSError as e:
+            print(f"Error al leer documento {path}: {e}")
+            return ""
+
+    def build(self, documents: Optional[List[Tuple[str, str]]] = None):
+        """Construye el índice a partir de (fuente, texto); por defecto FAQ + KNOWLEDGE_DOCUMENTS"""
+        chunks = self.chunk_faq(FAQ_CONTENT) if documents is None else []
+        if documents is None:
+            documents = [(path, self._read_document(path)) for path in self.document_paths()]
+        for source, text in documents:
+            chunks.extend(self.chunk_text(source, text))
+
+        tokenized = [Counter(self.tokenize(chunk["text"])) for chunk in chunks]
+        vocabulary: Dict[str, int] = {}
+        for counts in tokenized:
+            for term in counts:
+                vocabulary.setdefault(term, len(vocabulary))
+
+        weights = np.zeros((len(vocabulary), len(chunks)), dtype=np.float32)
+        lengths = np.array([sum(counts.values()) for counts in tokenized], dtype=np.float32)
+        avg_length = float(lengths.mean()) if len(chunks) else 1.0
+        document_frequency = Counter(term for counts in tokenized for term in counts)
+        for column, counts in enumerate(tokenized):
+            norm = self.k1 * (1 - self.b + self.b * lengths[column] / avg_length)
+            for term, tf in counts.items():
+                df = document_frequency[term]
+                idf = math.log(1 + (len(chunks) - df + 0.5) / (df + 0.5))
+                weights[vocabulary[term], column] = idf * tf * (self.k1 + 1) / (tf + norm)
+
+        self.vocabulary, self.chunks, self.weights = vocabulary, chunks, weights
+
+    def save(self):
+        """Guarda la matriz de pesos (.npy) y los metadatos; el meta se escribe al final"""
+        os.makedirs(self.index_dir, exist_ok=True)
+        weights_path = os.path.join(self.index_dir, "weights.npy")
+        tmp_path = f"{weights_path}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, self.weights)
+        os.replace(tmp_path, weights_path)
+
+        meta = {"fingerprint": self._fingerprint(), "shape": list(self.weights.shape),
+                "vocabulary": self.vocabulary, "chunks": self.chunks}
+        meta_path = os.path.join(self.index_dir, "meta.json")
+        with open(f"{meta_path}.tmp", "w", encoding="utf-8") as file:
+            json.dump(meta, file, ensure_ascii=False)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+    def load(self) -> bool:
+        """Carga el índice con memory-map; False si no existe o está desactualizado"""
+        try:
+            with open(os.path.join(self.index_dir, "meta.json"), "r", encoding="utf-8") as file:
+                meta = json.load(file)
+            weights = np.load(os.path.join(self.index_dir, "weights.npy"), mmap_mode="r")
+        except (OSError, ValueError):
+            return False
+        if meta["fingerprint"] != self._fingerprint() or list(weights.shape) != meta["shape"]:
+            return False
+        self.vocabulary, self.chunks, self.weights = meta["vocabulary"], meta["chunks"], weights
+        return True
+
+    def ensure_loaded(self):
+        """Carga el índice desde disco o lo construye si hace falta (una vez por proceso)"""
+        if self.weights is not None:
+            return
+        with self._lock:
+            if self.weights is None and not self.load():
+                self.build()
+                self.save()
+
+    def reload(self):
+        """Vuelve a cargar (o reconstruir) el índice si ya estaba en uso; tras un cambio de documentos"""
+        if self.weights is None:
+            return
+        with self._lock:
+            if not self.load():
+                self.build()
+                self.save()
+
+    def search(self, query: str, top_k: Optional[int] = None) -> List[Dict]:
+        """Retorna los `top_k` fragmentos más relevantes para la consulta"""
+        self.ensure_loaded()
+        top_k = top_k or self.top_k
+        term_ids = sorted({self.vocabulary[term] for term in self.tokenize(query) if term in self.vocabulary})
+        if not term_ids or not self.chunks:
+            return []
+        scores = np.asarray(self.weights[term_ids]).sum(axis=0)
+        top_k = min(top_k, len(scores))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return [dict(self.chunks[i], score=float(scores[i])) for i in best if scores[i] > 0]
+
+    def build_context(self, query: str, top_k: Optional[int] = None) -> str:
+        """Fragmentos relevantes formateados para incluir en el prompt"""
+        results = self.search(query, top_k)
+        return "\n\n".join(f"- {result['text']}" for result in results)
+
+    def augment_question(self, question: str, top_k: Optional[int] = None) -> str:
+        """Antepone a la pregunta la información relevante recuperada"""
+        context = self.build_context(question, top_k)
+        if not context:
+            return question
+        return f"INFORMACIÓN RELEVANTE DE INGELEAN:\n{context}\n\nPREGUNTA DEL CLIENTE:\n{question}"
+
+
+# Índice global compartido por los servicios
+retrieval_index = RetrievalIndex()
+
+
+if __name__ == "__main__":
+    # Construcción offline: python -m API.RetrievalIndex
+    retrieval_index.build()
+    retrieval_index.save()
+    print(f"Índice guardado en {retrieval_index.index_dir}: "
+          f"{len(retrieval_index.chunks)} fragmentos, {len(retrieval_index.vocabulary)} términos")
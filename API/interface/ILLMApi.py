@@ -1,9 +1,122 @@
 import os
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+
+class Usage:
+    """Tokens consumidos por una respuesta (según el proveedor)"""
+
+    __slots__ = ("prompt_tokens", "completion_tokens")
+
+    def __init__(self, prompt_tokens: int = 0, completion_tokens: int = 0):
+        self.prompt_tokens = prompt_tokens or 0
+        self.completion_tokens = completion_tokens or 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def to_dict(self):
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens
+        }
+
+
+class StreamDelta:
+    """Fragmento de una respuesta en streaming
+
+    Los deltas de texto traen `text` y el tiempo desde el inicio de la
+    petición; el último tiene `done=True`, texto vacío, el uso de tokens (si
+    el proveedor lo informa) y el tiempo al primer token.
+    """
+
+    __slots__ = ("provider", "text", "index", "elapsed", "done", "usage", "first_token")
+
+    def __init__(self, provider: str, text: str, index: int, elapsed: float, done: bool = False,
+                 usage: Optional[Usage] = None, first_token: Optional[float] = None):
+        self.provider = provider
+        self.text = text
+        self.index = index
+        self.elapsed = elapsed
+        self.done = done
+        self.usage = usage
+        self.first_token = first_token
+
+
+class DeltaBuilder:
+    """Numera los deltas de una respuesta y mide sus tiempos"""
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self.started = time.perf_counter()
+        self.index = 0
+        self.first_token: Optional[float] = None
+
+    def text(self, text: str) -> StreamDelta:
+        elapsed = time.perf_counter() - self.started
+        if self.first_token is None:
+            self.first_token = elapsed
+        delta = StreamDelta(self.provider, text, self.index, elapsed)
+        self.index += 1
+        return delta
+
+    def end(self, usage: Optional[Usage] = None) -> StreamDelta:
+        return StreamDelta(self.provider, "", self.index, time.perf_counter() - self.started,
+                           done=True, usage=usage, first_token=self.first_token)
+
 
 class ILLMApi:
     def __init__(self, model_name: str):
         self.model_name = model_name
         self.path_info = "./API/pdf/Brochure-Ingelean.pdf"
+        # Límite de peticiones/tokens del proveedor (ProviderRateLimiter); None = sin límite
+        self.rate_limiter = None
+
+    def _textos_peticion(self, pregunta: str, contexto: list = None) -> list:
+        """Textos que se envían al proveedor en una pregunta (para estimar tokens)"""
+        return [getattr(self, "system_prompt", None), pregunta, *(i["content"] for i in contexto or ())]
+
+    async def reservar_cupo(self, pregunta: str, contexto: list = None):
+        """Reserva turno en el límite del proveedor sin esperarlo (None = sin límite)
+
+        El router la usa para descontar la espera del TTFT del proveedor y
+        pasa la reserva a stream_respuesta(reserva=...).
+        """
+        if self.rate_limiter is None or not self.rate_limiter.enabled:
+            return None
+        return await self.rate_limiter.reserve(self.rate_limiter.estimate_tokens(*self._textos_peticion(pregunta, contexto)))
+
+    @asynccontextmanager
+    async def _con_cupo(self, textos: list, reserva=None):
+        """Espera el turno reservado (o lo reserva) durante la llamada al proveedor
+
+        Si la llamada se cancela (cliente desconectado, perdedor del hedging)
+        se devuelve el cupo: todo si aún no se envió, y solo los tokens de
+        respuesta estimados si ya estaba en curso.
+        """
+        if reserva is None and self.rate_limiter is not None and self.rate_limiter.enabled:
+            reserva = await self.rate_limiter.reserve(self.rate_limiter.estimate_tokens(*textos))
+        if reserva is not None:
+            try:
+                await reserva.wait()
+            except asyncio.CancelledError:
+                reserva.cancel(dispatched=False)
+                raise
+        try:
+            yield reserva
+        except (asyncio.CancelledError, GeneratorExit):
+            if reserva is not None:
+                reserva.cancel(dispatched=True)
+            raise
+
+    async def _conciliar_uso(self, reserva, usage: Optional[Usage]):
+        """Corrige la reserva con los tokens que informó el proveedor"""
+        if reserva is not None and usage is not None and usage.total_tokens:
+            await reserva.settle(usage.total_tokens)
 
     def _get_info(self):
         pass
@@ -16,3 +129,35 @@ class ILLMApi:
 
     def responder_pregunta_con_contexto(self, pregunta: str, contexto: str):
         pass
+
+    async def responder_pregunta_async(self, pregunta: str):
+        pass
+
+    async def responder_pregunta_con_contexto_async(self, pregunta: str, contexto: list):
+        pass
+
+    async def resumir_conversacion_async(self, resumen_previo: str, contexto: list) -> str:
+        pass
+
+    async def stream_respuesta(self, pregunta: str, contexto: list = None, reserva=None) -> AsyncIterator[StreamDelta]:
+        """Respuesta en streaming como StreamDelta (con o sin historial)
+
+        Implementación por defecto sobre responder_pregunta*_async, que
+        pueden retornar un stream de chunks con `.text` o el texto completo.
+        Los proveedores con streaming propio la sobrescriben para informar
+        el uso de tokens. `reserva` es el cupo ya reservado con reservar_cupo.
+        """
+        async with self._con_cupo(self._textos_peticion(pregunta, contexto), reserva):
+            builder = DeltaBuilder(self.model_name)
+            if contexto:
+                result = await self.responder_pregunta_con_contexto_async(pregunta, contexto)
+            else:
+                result = await self.responder_pregunta_async(pregunta)
+            if isinstance(result, str):
+                if result:
+                    yield builder.text(result)
+            else:
+                async for chunk in result:
+                    if chunk.text:
+                        yield builder.text(chunk.text)
+            yield builder.end()
@@ -0,0 +1,86 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from app.src.models.Chat import Chat
+from app.src.models.Message import Message
+
+
+class _CacheEntry:
+    __slots__ = ("chat", "messages", "max_messages", "expires_at")
+
+    def __init__(self, chat: Chat, messages: List[Message], max_messages: int, expires_at: float):
+        self.chat = chat
+        self.messages = messages
+        self.max_messages = max_messages
+        self.expires_at = expires_at
+
+
+class HistoryCache:
+    """Caché LRU con TTL del historial reciente de cada chat
+
+    Se actualiza al escribir mensajes, por lo que un turno de conversación
+    no necesita volver a leer de MongoDB el chat ni su historial. El caché
+    es por proceso: el TTL acota la desactualización cuando varios workers
+    escriben en el mismo chat.
+    """
+
+    def __init__(self, max_chats: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        self.max_chats = max_chats or int(os.getenv("HISTORY_CACHE_MAX_CHATS", "1000"))
+        self.ttl_seconds = ttl_seconds or float(os.getenv("HISTORY_CACHE_TTL", "900"))
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, chat_id: str) -> Optional[Tuple[Chat, List[Message]]]:
+        """Retorna (chat, historial reciente) o None si no está en caché o expiró"""
+        entry = self._entries.get(chat_id)
+        if entry is None or entry.expires_at < time.monotonic():
+            if entry is not None:
+                del self._entries[chat_id]
+                self.evictions += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(chat_id)
+        self.hits += 1
+        return entry.chat, list(entry.messages)
+
+    def put(self, chat_id: str, chat: Chat, messages: List[Message], max_messages: int):
+        """Guarda el historial reciente de un chat"""
+        self._entries[chat_id] = _CacheEntry(chat, list(messages[-max_messages:]), max_messages,
+                                             time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(chat_id)
+        while len(self._entries) > self.max_chats:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def append(self, chat_id: str, message: Message):
+        """Agrega un mensaje recién persistido al historial en caché (si existe)"""
+        entry = self._entries.get(chat_id)
+        if entry is None:
+            return
+        entry.messages.append(message)
+        if len(entry.messages) > entry.max_messages:
+            del entry.messages[0]
+        entry.expires_at = time.monotonic() + self.ttl_seconds
+
+    def invalidate(self, chat_id: str):
+        """Elimina un chat del caché"""
+        self._entries.pop(chat_id, None)
+
+    def get_stats(self) -> Dict:
+        """Contadores para monitoreo"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_chats": self.max_chats,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+
+# Instancia global del caché de historial
+history_cache = HistoryCache()
@@ -0,0 +1,206 @@
+import os
+import re
+import time
+import hashlib
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+from API.Knowledge import FAQ_CONTENT, knowledge
+from API.ProviderRegistry import provider_registry
+from API.RetrievalIndex import STOPWORDS, RetrievalIndex, retrieval_index
+
+
+class _ResponseEntry:
+    __slots__ = ("chunks", "terms", "expires_at")
+
+    def __init__(self, chunks: List[str], terms: FrozenSet[str], expires_at: float):
+        self.chunks = chunks
+        self.terms = terms
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    """Caché LRU con TTL de respuestas a preguntas de primer turno
+
+    La clave es el texto normalizado de la pregunta (minúsculas, sin tildes
+    ni signos). Si RESPONSE_CACHE_SIMILARITY es menor que 1, una pregunta
+    sin coincidencia exacta puede reutilizar la respuesta de otra con
+    suficientes términos en común (similitud de Jaccard). Se guardan los
+    chunks tal como llegaron del modelo para reproducirlos por SSE. Cuando
+    cambian los documentos de conocimiento el caché se vacía y se recarga
+    lo que generan las respuestas (texto del PDF, índice y prompts).
+    """
+
+    # Palabras que cambian el sentido de la pregunta y no se descartan
+    NEGATIONS = {"no", "sin"}
+    # Segundos entre revisiones de los documentos de conocimiento
+    CHECK_INTERVAL = 5.0
+
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[float] = None,
+                 similarity: Optional[float] = None):
+        self.enabled = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+        self.max_entries = max_entries or int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "500"))
+        self.ttl_seconds = ttl_seconds or float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+        self.similarity = similarity if similarity is not None else float(os.getenv("RESPONSE_CACHE_SIMILARITY", "1.0"))
+        self._entries: "OrderedDict[str, _ResponseEntry]" = OrderedDict()
+        # Índice invertido término -> claves, para buscar candidatos similares
+        self._postings: Dict[str, Set[str]] = {}
+        self._stat_signature: Optional[Tuple] = None
+        self._knowledge_version: Optional[str] = None
+        self._checked_at = 0.0
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Minúsculas, sin tildes y solo palabras separadas por un espacio"""
+        normalized = unicodedata.normalize("NFKD", text.lower())
+        normalized = "".join(char for char in normalized if not unicodedata.combining(char))
+        return " ".join(re.findall(r"\w+", normalized))
+
+    def _terms(self, key: str) -> FrozenSet[str]:
+        return frozenset(
+            word for word in key.split()
+            if word in self.NEGATIONS or (len(word) > 1 and word not in STOPWORDS)
+        )
+
+    def get(self, question: str) -> Optional[List[str]]:
+        """Retorna los chunks de la respuesta en caché o None"""
+        if not self.enabled:
+            return None
+        self._check_knowledge()
+        key = self.normalize(question)
+        entry = self._live_entry(key)
+        if entry is None and self.similarity < 1:
+            key = self._find_similar(self._terms(key))
+            entry = self._live_entry(key) if key else None
+            if entry is not None:
+                self.similar_hits += 1
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return list(entry.chunks)
+
+    def put(self, question: str, chunks: List[str]):
+        """Guarda la respuesta completa (como lista de chunks) de una pregunta"""
+        if not self.enabled or not chunks:
+            return
+        self._check_knowledge()
+        key = self.normalize(question)
+        if not key:
+            return
+        self._remove(key)
+        terms = self._terms(key)
+        self._entries[key] = _ResponseEntry(list(chunks), terms, time.monotonic() + self.ttl_seconds)
+        for term in terms:
+            self._postings.setdefault(term, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def clear(self):
+        """Vacía el caché"""
+        self._entries.clear()
+        self._postings.clear()
+
+    def _live_entry(self, key: str) -> Optional[_ResponseEntry]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at < time.monotonic():
+            self._remove(key)
+            self.evictions += 1
+            return None
+        return entry
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for term in entry.terms:
+            keys = self._postings.get(term)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[term]
+
+    def _find_similar(self, terms: FrozenSet[str]) -> Optional[str]:
+        """Clave con mayor similitud de Jaccard, si supera el umbral"""
+        if not terms:
+            return None
+        candidates = set()
+        for term in terms:
+            candidates.update(self._postings.get(term, ()))
+        best_key, best_score = None, self.similarity
+        for key in candidates:
+            other = self._entries[key].terms
+            score = len(terms & other) / len(terms | other)
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    def _check_knowledge(self):
+        """Vacía el caché y recarga el conocimiento si cambió el PDF/FAQ desde la última revisión
+
+        Revisa tamaño y fecha de los documentos; solo si cambiaron se
+        recalcula el hash del contenido.
+        """
+        now = time.monotonic()
+        if now - self._checked_at < self.CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        paths = RetrievalIndex.document_paths()
+        signature = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                signature.append((path, stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                signature.append((path, None, None))
+        signature = tuple(signature)
+        if signature == self._stat_signature:
+            return
+        self._stat_signature = signature
+
+        digest = hashlib.sha256(FAQ_CONTENT.encode("utf-8"))
+        for path in paths:
+            try:
+                digest.update(knowledge.file_hash(path).encode("ascii"))
+            except OSError:
+                digest.update(b"-")
+        version = digest.hexdigest()
+        if self._knowledge_version is not None and version != self._knowledge_version:
+            self._reload_knowledge()
+            if self._entries:
+                self.clear()
+                self.invalidations += 1
+        self._knowledge_version = version
+
+    @staticmethod
+    def _reload_knowledge():
+        """Sin esto las respuestas nuevas seguirían saliendo del documento anterior hasta reiniciar"""
+        knowledge.invalidate()
+        retrieval_index.reload()
+        provider_registry.refresh_knowledge()
+
+    def get_stats(self) -> Dict:
+        """Contadores para monitoreo"""
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+
+# Instancia global del caché de respuestas
+response_cache = ResponseCache()
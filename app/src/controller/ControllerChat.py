@@ -1,7 +1,9 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, status
 from pydantic import BaseModel
 from typing import Optional
 from app.src.service.ServiceChat import ServiceChat
+from app.src.utils.Pagination import Pagination
+from app.src.utils.Responses import FastJSONResponse
 
 # Modelos Pydantic para request/response
 class ChatCreateRequest(BaseModel):
@@ -22,7 +24,7 @@ class ControllerChat:
         @self.router.post("/")
         async def create_chat():
             """Crea un nuevo chat"""
-            result = self.service.create_chat()
+            result = await self.service.create_chat()
             
             if result["success"]:
                 return {
@@ -37,26 +39,35 @@ class ControllerChat:
                 )
         
         @self.router.get("/")
-        async def get_all_chats():
-            """Obtiene todos los chats con información de último mensaje"""
-            result = self.service.get_all_chats()
+        async def get_all_chats(
+            limit: int = Query(Pagination.DEFAULT_LIMIT, ge=1, le=Pagination.MAX_LIMIT),
+            after: Optional[str] = None,
+            before: Optional[str] = None
+        ):
+            """Obtiene una página de chats con información de último mensaje"""
+            result = await self.service.get_all_chats(limit, after, before)
             
             if result["success"]:
-                return {
+                # Respuesta ya serializable: se envía con orjson sin pasar por jsonable_encoder
+                return FastJSONResponse({
                     "status": "success",
                     "data": result["data"],
-                    "total": result["total"]
-                }
+                    "total": result["total"],
+                    "next_cursor": result["next_cursor"],
+                    "prev_cursor": result["prev_cursor"],
+                    "has_more": result["has_more"]
+                })
             else:
+                status_code = status.HTTP_400_BAD_REQUEST if "inválido" in result["error"] else status.HTTP_500_INTERNAL_SERVER_ERROR
                 raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    status_code=status_code,
                     detail=result["error"]
                 )
         
         @self.router.get("/{chat_id}")
         async def get_chat(chat_id: str):
             """Obtiene un chat por su ID"""
-            result = self.service.get_chat_by_id(chat_id)
+            result = await self.service.get_chat_by_id(chat_id)
             
             if result["success"]:
                 return {
@@ -0,0 +1,46 @@
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from typing import Literal, Optional
+from app.src.service.ServiceExport import ServiceExport
+
+
+class ControllerExport:
+    def __init__(self):
+        self.router = APIRouter(prefix="/api/export", tags=["Export"])
+        self.service = ServiceExport()
+        self._setup_routes()
+
+    def _setup_routes(self):
+        """Configura las rutas del controlador"""
+
+        @self.router.get("/messages")
+        async def export_messages(
+            format: Literal["ndjson", "gzip"] = "ndjson",
+            after: Optional[str] = None,
+            batch_size: Optional[int] = Query(None, ge=1, le=10000)
+        ):
+            """Exporta todos los chats y mensajes en streaming (NDJSON, opcionalmente gzip)
+
+            `after` reanuda desde el último checkpoint recibido.
+            """
+            result = self.service.validate_checkpoint(after)
+            if not result["success"]:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=result["error"]
+                )
+
+            compress = format == "gzip"
+            filename = "export.ndjson.gz" if compress else "export.ndjson"
+            return StreamingResponse(
+                self.service.export_ndjson(after, compress, batch_size),
+                media_type="application/gzip" if compress else "application/x-ndjson",
+                headers={
+                    "Cache-Control": "no-cache",
+                    "Content-Disposition": f'attachment; filename="{filename}"'
+                }
+            )
+
+    def get_router(self):
+        """Retorna el router configurado"""
+        return self.router
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, HTTPException, status
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
+from typing import Optional
 from app.src.service.ServiceMessage import ServiceMessage
-from API.Gemini import Gemini
-import json
-import asyncio
+from app.src.utils.Pagination import Pagination
+from app.src.utils.Responses import FastJSONResponse
+from app.src.utils.SSE import SSEEncoder
+from app.src.utils.AdmissionControl import AdmissionRejected, chat_admission
 
 # Modelos Pydantic para request/response
 class MessageCreateRequest(BaseModel):
@@ -18,65 +21,74 @@ class ControllerMessage:
         self.router = APIRouter(prefix="/api/message", tags=["Message"])
         self.service = ServiceMessage()
         self._setup_routes()
-        self.model = Gemini()
     
     async def _generate_response(self, result):
         """Genera respuesta en streaming"""
+        encoder = SSEEncoder()
         try:
-            for chunk in result:
+            async for chunk in result:
                 if chunk.text:  # Solo enviar si hay texto
-                    chunk_data = {
-                        "content": chunk.text,
-                        "type": "content"
-                    }
-                    yield f"data: {json.dumps(chunk_data)}\n\n"
+                    yield encoder.content(chunk.text)
             
             # Señal de finalización
-            final_data = {
-                "content": "",
-                "type": "done"
-            }
-            yield f"data: {json.dumps(final_data)}\n\n"
+            yield encoder.event({"content": "", "type": "done"})
         except Exception as e:
-            error_data = {
-                "error": str(e),
-                "type": "error"
-            }
-            yield f"data: {json.dumps(error_data)}\n\n"
+            yield encoder.error(str(e))
 
     def _setup_routes(self):
         """Configura las rutas del controlador"""
         # Rutas dinámicas para chat persistente
         @self.router.post("/chat/{chat_id}")
-        async def create_message_in_chat(chat_id: str, request: MessageCreateRequest):
-            """Crea un nuevo mensaje en un chat específico con respuesta streaming"""
+        async def create_message_in_chat(chat_id: str, request: MessageCreateRequest, http_request: Request):
+            """Crea un nuevo mensaje en un chat específico con respuesta streaming
+
+            Si el cliente cierra la conexión, Starlette cancela el stream: la
+            respuesta del proveedor se corta y lo generado se guarda como truncado.
+            """
+            # Cupo global de streams y un turno a la vez por chat; si no hay a tiempo, 429/503 con Retry-After
+            try:
+                ticket = await chat_admission.acquire(chat_id)
+            except AdmissionRejected as e:
+                raise HTTPException(
+                    status_code=e.status_code,
+                    detail=e.detail,
+                    headers={"Retry-After": str(e.retry_after)}
+                )
+            
+            # El cliente pudo irse mientras esperaba en la cola: no se gasta el turno en el LLM
+            if await http_request.is_disconnected():
+                ticket.release()
+                return Response(status_code=499)
+            
             try:
                 async def generate_response():
+                    # Frames preformateados; solo se serializa el texto de cada delta
+                    encoder = SSEEncoder()
                     try:
-                        async for chunk in self.service.create_message_with_response_streaming(chat_id, request.content):
-                            if chunk.get("type") == "error":
-                                error_data = {
-                                    "error": chunk.get("error", "Error desconocido"),
-                                    "type": "error"
-                                }
-                                yield f"data: {json.dumps(error_data)}\n\n"
+                        chunks = self.service.create_message_with_response_streaming(chat_id, request.content)
+                        async for chunk in SSEEncoder.coalesce(chunks):
+                            chunk_type = chunk.get("type", "content")
+                            if chunk_type == "error":
+                                yield encoder.error(chunk.get("error", "Error desconocido"))
                                 return
                             
-                            chunk_data = {
-                                "content": chunk.get("content", ""),
-                                "type": chunk.get("type", "content"),
-                                "user_message_id": chunk.get("user_message_id")
-                            }
-                            yield f"data: {json.dumps(chunk_data)}\n\n"
+                            if chunk_type == "content":
+                                yield encoder.content(chunk.get("content", ""), chunk.get("user_message_id"))
+                            else:
+                                yield encoder.event({
+                                    "content": chunk.get("content", ""),
+                                    "type": chunk_type,
+                                    "user_message_id": chunk.get("user_message_id")
+                                })
                     except Exception as e:
-                        error_data = {
-                            "error": str(e),
-                            "type": "error"
-                        }
-                        yield f"data: {json.dumps(error_data)}\n\n"
+                        yield encoder.error(str(e))
+                    finally:
+                        ticket.release()
                 
                 return StreamingResponse(
                     generate_response(),
+                    # Por si el stream nunca llega a iterarse (el cupo se libera una sola vez)
+                    background=BackgroundTask(ticket.release),
                     media_type="text/event-stream",
                     headers={
                         "Cache-Control": "no-cache",
@@ -87,6 +99,7 @@ class ControllerMessage:
                     }
                 )
             except Exception as e:
+                ticket.release()
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail=f"Error al procesar mensaje: {str(e)}"
@@ -95,7 +108,7 @@ class ControllerMessage:
         @self.router.get("/{message_id}")
         async def get_message(message_id: str):
             """Obtiene un mensaje por su ID"""
-            result = self.service.get_message_by_id(message_id)
+            result = await self.service.get_message_by_id(message_id)
             
             if result["success"]:
                 return {
@@ -110,19 +123,33 @@ class ControllerMessage:
                 )
         
         @self.router.get("/chat/{chat_id}")
-        async def get_messages_by_chat(chat_id: str):
-            """Obtiene todos los mensajes de un chat"""
-            result = self.service.get_messages_by_chat_id(chat_id)
+        async def get_messages_by_chat(
+            chat_id: str,
+            limit: int = Query(Pagination.DEFAULT_LIMIT, ge=1, le=Pagination.MAX_LIMIT),
+            after: Optional[str] = None,
+            before: Optional[str] = None
+        ):
+            """Obtiene una página de mensajes de un chat"""
+            result = await self.service.get_messages_by_chat_id(chat_id, limit, after, before)
             
             if result["success"]:
-                return {
+                # Respuesta ya serializable: se envía con orjson sin pasar por jsonable_encoder
+                return FastJSONResponse({
                     "status": "success",
                     "data": result["data"],
                     "total": result["total"],
-                    "chat_id": result["chat_id"]
-                }
+                    "chat_id": result["chat_id"],
+                    "next_cursor": result["next_cursor"],
+                    "prev_cursor": result["prev_cursor"],
+                    "has_more": result["has_more"]
+                })
             else:
-                status_code = status.HTTP_404_NOT_FOUND if "no encontrado" in result["error"] else status.HTTP_500_INTERNAL_SERVER_ERROR
+                if "no encontrado" in result["error"]:
+                    status_code = status.HTTP_404_NOT_FOUND
+                elif "inválido" in result["error"]:
+                    status_code = status.HTTP_400_BAD_REQUEST
+                else:
+                    status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
                 raise HTTPException(
                     status_code=status_code,
                     detail=result["error"]
@@ -1,7 +1,11 @@
+from datetime import datetime
 from fastapi import APIRouter, HTTPException, status
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from typing import Optional
 from app.src.service.ServiceMetricas import ServiceMetricas
+from app.src.service.ServiceMetricasJob import metricas_jobs
+from app.src.utils.AdmissionControl import AdmissionRejected, metricas_admission
 
 
 # Modelos Pydantic para request/response
@@ -11,20 +15,87 @@ class MessageCreateRequest(BaseModel):
 class MessageUpdateRequest(BaseModel):
     content: str
 
+class MetricasJobRequest(BaseModel):
+    since: Optional[datetime] = None  # Sin rango: todos los chats
+    until: Optional[datetime] = None
+
 class ControllerMetricas:
     def __init__(self):
         self.router = APIRouter(prefix="/api/metricas", tags=["Metricas"])
         self.service = ServiceMetricas()
+        self.jobs = metricas_jobs
         self._setup_routes()
     
+    @staticmethod
+    def _job_result(result):
+        """Respuesta de los endpoints de trabajos"""
+        if result["success"]:
+            return {
+                "status": "success",
+                "data": result["data"],
+                **({"message": result["message"]} if "message" in result else {})
+            }
+        if "no encontrado" in result["error"]:
+            status_code = status.HTTP_404_NOT_FOUND
+        elif "inválido" in result["error"]:
+            status_code = status.HTTP_400_BAD_REQUEST
+        else:
+            status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        raise HTTPException(status_code=status_code, detail=result["error"])
 
     def _setup_routes(self):
         """Configura las rutas del controlador"""
         
 
         @self.router.get("/{chat_id}")
-        async def create_metricas(chat_id: str):
-            return self.service.create_analisis(chat_id)
+        async def create_metricas(chat_id: str, batch: Optional[bool] = None):
+            # Análisis acotados (uno a la vez por chat); los trabajos masivos tienen su propio límite
+            try:
+                ticket = await metricas_admission.acquire(chat_id)
+            except AdmissionRejected as e:
+                raise HTTPException(
+                    status_code=e.status_code,
+                    detail=e.detail,
+                    headers={"Retry-After": str(e.retry_after)}
+                )
+            try:
+                result = await self.service.create_analisis(chat_id, batch)
+            except Exception as e:
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"Error al analizar métricas: {str(e)}"
+                )
+            finally:
+                ticket.release()
+            
+            # Los fallos llegan como {"success": False, ...}; el resultado exitoso se retorna tal cual
+            if result.get("success") is False:
+                status_code = status.HTTP_404_NOT_FOUND if "no encontrado" in result["error"] else status.HTTP_500_INTERNAL_SERVER_ERROR
+                raise HTTPException(status_code=status_code, detail=result["error"])
+            return result
+        
+        @self.router.post("/jobs", status_code=status.HTTP_202_ACCEPTED)
+        async def create_metricas_job(request: MetricasJobRequest):
+            """Inicia el análisis en segundo plano de los chats creados en [since, until)"""
+            return self._job_result(await self.jobs.create_job(request.since, request.until))
+        
+        @self.router.get("/jobs/{job_id}")
+        async def get_metricas_job(job_id: str):
+            """Estado y avance de un trabajo de métricas"""
+            return self._job_result(await self.jobs.get_job(job_id))
+        
+        @self.router.get("/jobs/{job_id}/aggregates")
+        async def get_metricas_job_aggregates(job_id: str):
+            """Promedios parciales de los chats ya procesados por el trabajo"""
+            return self._job_result(await self.jobs.get_aggregates(job_id))
+        
+        @self.router.post("/jobs/{job_id}/cancel")
+        async def cancel_metricas_job(job_id: str):
+            """Cancela un trabajo en curso"""
+            result = await self.jobs.cancel_job(job_id)
+            if not result["success"]:
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=result["error"])
+            return self._job_result(result)
     def get_router(self):
         """Retorna el router configurado"""
-        return self.router
\ No newline at end of file
+        return self.router
@@ -1,45 +1,134 @@
 import os
-from pymongo import MongoClient
-from pymongo.database import Database
+import time
+import asyncio
+import importlib.util
+from typing import Dict, List
+from pymongo import AsyncMongoClient
+from pymongo.asynchronous.database import AsyncDatabase
+from app.src.database.pool_monitor import pool_monitor
+
+# Módulo de Python que necesita cada compresor de red de PyMongo (zlib viene con Python)
+COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
 
 class DatabaseConnection:
     _instance = None
     _client = None
     _database = None
-    
+
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(DatabaseConnection, cls).__new__(cls)
         return cls._instance
-    
-    def __init__(self):
-        if self._client is None:
-            self.connect()
-    
+
+    @staticmethod
+    def _compressors() -> List[str]:
+        """Compresores de MONGO_COMPRESSORS cuyo paquete está instalado (en orden de preferencia)"""
+        requested = os.getenv("MONGO_COMPRESSORS", "zstd,snappy,zlib")
+        available = []
+        for name in (item.strip() for item in requested.split(",")):
+            module = COMPRESSOR_MODULES.get(name)
+            if module and importlib.util.find_spec(module) is not None:
+                available.append(name)
+        return available
+
+    @classmethod
+    def client_options(cls) -> Dict:
+        """Opciones del pool y timeouts del cliente, configurables por entorno"""
+        options = {
+            "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+            "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "10")),
+            "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000")),
+            "maxConnecting": int(os.getenv("MONGO_MAX_CONNECTING", "4")),
+            "waitQueueTimeoutMS": int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000")),
+            "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+            "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+            "socketTimeoutMS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "20000")),
+            "retryWrites": True,
+            "retryReads": True,
+            "appname": os.getenv("MONGO_APP_NAME", "hackaton-chat-api")
+        }
+        compressors = cls._compressors()
+        if compressors:
+            options["compressors"] = compressors
+        return options
+
     def connect(self):
-        """Establece la conexión con MongoDB"""
+        """Crea el cliente con el pool configurado (cliente asyncio, no bloquea el event loop)
+
+        El cliente no abre sockets hasta la primera operación; open() hace el
+        calentamiento durante el arranque de la aplicación.
+        """
         try:
             mongo_url = os.getenv("MONGO_URL")
-            self._client = MongoClient(mongo_url)
+            options = self.client_options()
+            self._client = AsyncMongoClient(mongo_url, event_listeners=[pool_monitor], **options)
             self._database = self._client["hackaton_chat"]
-            print("Conexión a MongoDB establecida correctamente")
+            pool_monitor.max_pool_size = options["maxPoolSize"]
+            print(f"Cliente de MongoDB creado (pool {options['minPoolSize']}-{options['maxPoolSize']}, "
+                  f"compresión: {', '.join(options.get('compressors', [])) or 'ninguna'})")
         except Exception as e:
             print(f"Error al conectar con MongoDB: {e}")
             raise e
-    
-    def get_database(self) -> Database:
-        """Retorna la instancia de la base de datos"""
+
+    async def open(self):
+        """Conecta y calienta el pool abriendo MONGO_WARMUP_CONNECTIONS sockets en paralelo"""
+        if self._database is None:
+            self.connect()
+        database = self._database
+        warmup = int(os.getenv("MONGO_WARMUP_CONNECTIONS", os.getenv("MONGO_MIN_POOL_SIZE", "10")))
+        start = time.perf_counter()
+        await asyncio.gather(*(database.command("ping") for _ in range(max(warmup, 1))))
+        print(f"Conexión a MongoDB establecida correctamente ({max(warmup, 1)} conexiones "
+              f"en {(time.perf_counter() - start) * 1000:.0f} ms)")
+
+    def get_client(self) -> AsyncMongoClient:
+        """Retorna el cliente (lo crea en el primer uso)"""
+        if self._client is None:
+            self.connect()
+        return self._client
+
+    def get_database(self) -> AsyncDatabase:
+        """Retorna la instancia de la base de datos
+
+        La aplicación crea el cliente en el lifespan (open()); aquí solo se crea
+        en el primer uso para scripts que no pasan por él.
+        """
         if self._database is None:
             self.connect()
         return self._database
-    
-    def close_connection(self):
+
+    def set_database(self, database):
+        """Reemplaza la base de datos activa (benchmarks y entornos de prueba)"""
+        self._database = database
+
+    async def ping(self):
+        """Verifica la conexión con MongoDB sin bloquear el event loop"""
+        return await self.get_database().command("ping")
+
+    async def probe(self, timeout: float = None) -> Dict:
+        """Sondeo para /health: ping acotado por timeout más el estado del pool
+
+        No espera la selección de servidor completa (serverSelectionTimeoutMS):
+        si MongoDB no responde en `timeout` segundos se reporta como no disponible.
+        """
+        timeout = timeout or float(os.getenv("HEALTH_PING_TIMEOUT", "1.0"))
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.ping(), timeout=timeout)
+            status = {"connected": True, "ping_ms": round((time.perf_counter() - start) * 1000, 2)}
+        except Exception as e:
+            status = {"connected": False, "error": str(e) or "Timeout del ping a MongoDB"}
+        status["pool"] = pool_monitor.get_stats()
+        return status
+
+    async def close_connection(self):
         """Cierra la conexión con MongoDB"""
         if self._client:
-            self._client.close()
+            await self._client.close()
             self._client = None
             self._database = None
             print("Conexión a MongoDB cerrada")
 
-# Instancia global de la conexión
+# Instancia global de la conexión (el cliente se crea en el arranque, en open())
 db_connection = DatabaseConnection()
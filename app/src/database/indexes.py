@@ -0,0 +1,90 @@
+import os
+from datetime import datetime
+from typing import Dict, List
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+
+class IndexCoverageError(RuntimeError):
+    """Una consulta crítica no está cubierta por un índice"""
+
+
+class IndexRegistry:
+    """Registro declarativo de índices y consultas críticas de los repositorios"""
+    
+    # Etapas del plan que indican recorrido completo u ordenamiento en memoria
+    FORBIDDEN_STAGES = {"COLLSCAN", "SORT"}
+    
+    def __init__(self):
+        self._indexes: Dict[str, List[IndexModel]] = {}
+        self._queries: List[Dict] = []
+    
+    def register_index(self, collection: str, keys: list, name: str, **options):
+        """Declara un índice que debe existir en la colección"""
+        self._indexes.setdefault(collection, []).append(IndexModel(keys, name=name, **options))
+    
+    def register_query(self, name: str, collection: str, filter: dict, sort: list):
+        """Declara una consulta crítica que debe resolverse con un índice"""
+        self._queries.append({"name": name, "collection": collection, "filter": filter, "sort": sort})
+    
+    async def ensure_indexes(self, database):
+        """Crea los índices declarados (idempotente)"""
+        for collection, indexes in self._indexes.items():
+            created = await database[collection].create_indexes(indexes)
+            print(f"Índices asegurados en {collection}: {', '.join(created)}")
+    
+    async def verify_queries(self, database):
+        """Ejecuta explain() sobre cada consulta crítica y falla si alguna no usa índice"""
+        failures = []
+        for query in self._queries:
+            cursor = database[query["collection"]].find(query["filter"]).sort(query["sort"])
+            plan = await cursor.explain()
+            stages = self._plan_stages(plan["queryPlanner"]["winningPlan"])
+            forbidden = stages & self.FORBIDDEN_STAGES
+            if forbidden:
+                failures.append(f"{query['name']} ({', '.join(sorted(forbidden))})")
+        if failures:
+            raise IndexCoverageError(f"Consultas sin índice: {'; '.join(failures)}")
+    
+    async def setup(self, database):
+        """Asegura los índices y, salvo que se desactive con MONGO_INDEX_CHECK=false, verifica las consultas"""
+        await self.ensure_indexes(database)
+        if os.getenv("MONGO_INDEX_CHECK", "true").lower() != "false":
+            await self.verify_queries(database)
+    
+    def _plan_stages(self, plan: dict) -> set:
+        """Recorre el árbol del plan ganador y retorna los nombres de sus etapas"""
+        stages = set()
+        if "stage" in plan:
+            stages.add(plan["stage"])
+        for key in ("inputStage", "queryPlan"):
+            if key in plan:
+                stages |= self._plan_stages(plan[key])
+        for child in plan.get("inputStages", []):
+            stages |= self._plan_stages(child)
+        return stages
+
+
+# Registro global con los índices de la aplicación
+index_registry = IndexRegistry()
+
+index_registry.register_index("messages", [("chat_id", ASCENDING), ("datetime", ASCENDING), ("_id", ASCENDING)],
+                              name="chat_id_datetime_id")
+index_registry.register_index("chats", [("datetime", DESCENDING), ("_id", DESCENDING)],
+                              name="datetime_id")
+
+# RepositoryMessage.get_messages_by_chat_id / get_messages_page / get_summaries_by_chat_ids
+index_registry.register_query("messages por chat_id ordenados por datetime", "messages",
+                              {"chat_id": ObjectId()}, [("datetime", ASCENDING), ("_id", ASCENDING)])
+# RepositoryMessage.iter_all_messages (exportación completa y su reanudación)
+index_registry.register_query("messages ordenados por chat_id y datetime", "messages",
+                              {}, [("chat_id", ASCENDING), ("datetime", ASCENDING), ("_id", ASCENDING)])
+# RepositoryChat.get_all_chats / get_chats_page
+index_registry.register_query("chats ordenados por datetime", "chats",
+                              {}, [("datetime", DESCENDING), ("_id", DESCENDING)])
+index_registry.register_query("chats anteriores a un datetime", "chats",
+                              {"datetime": {"$lt": datetime.now()}}, [("datetime", DESCENDING), ("_id", DESCENDING)])
+# RepositoryChat.iter_chats_in_range (trabajos de métricas por rango de fechas)
+index_registry.register_query("chats en un rango de datetime", "chats",
+                              {"datetime": {"$gte": datetime.now(), "$lt": datetime.now()}},
+                              [("datetime", ASCENDING), ("_id", ASCENDING)])
@@ -0,0 +1,77 @@
+from typing import Dict, Optional
+from pymongo import monitoring
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Contadores del pool de conexiones de PyMongo a partir de sus eventos
+
+    Permite reportar en /health cuántas conexiones están en uso, cuántas
+    peticiones esperan una conexión y cuántas esperas terminaron en timeout,
+    sin consultar a MongoDB.
+    """
+
+    def __init__(self):
+        self.max_pool_size: Optional[int] = None
+        self.open = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.checkout_failures = 0
+        self.checkout_timeouts = 0
+        self.pool_clears = 0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self.pool_clears += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.open = max(self.open - 1, 0)
+
+    def connection_check_out_started(self, event):
+        self.waiting += 1
+
+    def connection_check_out_failed(self, event):
+        self.waiting = max(self.waiting - 1, 0)
+        self.checkout_failures += 1
+        if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+            self.checkout_timeouts += 1
+
+    def connection_checked_out(self, event):
+        self.waiting = max(self.waiting - 1, 0)
+        self.checked_out += 1
+
+    def connection_checked_in(self, event):
+        self.checked_out = max(self.checked_out - 1, 0)
+
+    def get_stats(self) -> Dict:
+        """Uso del pool; saturation = conexiones en uso / tamaño máximo"""
+        saturation = None
+        if self.max_pool_size:
+            saturation = round(self.checked_out / self.max_pool_size, 4)
+        return {
+            "max_pool_size": self.max_pool_size,
+            "open": self.open,
+            "checked_out": self.checked_out,
+            "waiting": self.waiting,
+            "saturation": saturation,
+            "checkout_failures": self.checkout_failures,
+            "checkout_timeouts": self.checkout_timeouts,
+            "pool_clears": self.pool_clears
+        }
+
+
+# Monitor global del pool (se registra al crear el cliente)
+pool_monitor = PoolMonitor()
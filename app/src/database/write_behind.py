@@ -0,0 +1,191 @@
+import os
+import asyncio
+import logging
+from typing import Dict, List, Optional
+from pymongo.errors import BulkWriteError, ConnectionFailure, PyMongoError
+from app.src.database.connection import db_connection
+from app.src.utils.Metrics import DB_BATCH_LATENCY
+
+# Código de MongoDB para clave duplicada (documento ya insertado en un intento anterior)
+DUPLICATE_KEY = 11000
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    """Cola de escritura diferida con inserciones por lotes
+
+    Los documentos llegan con su `_id` ya asignado, se acumulan en memoria
+    y se insertan con `insert_many` cuando se junta un lote o pasa el
+    intervalo de vaciado. Los errores transitorios se reintentan con espera
+    exponencial; si siguen tras WRITE_BEHIND_MAX_RETRIES (por ejemplo, una
+    elección de primario larga) el lote vuelve al frente de la cola y la
+    tarea de vaciado lo reintenta con espera creciente (hasta
+    MAX_BACKOFF segundos), sin perderlo. Como los `_id` son fijos, un
+    reintento no duplica documentos (las claves duplicadas se ignoran).
+    Solo se descartan, con log, los documentos que MongoDB rechaza. Al
+    cerrar la aplicación se vacía lo pendiente.
+    """
+
+    # Tope de la espera entre reintentos
+    MAX_BACKOFF = 5.0
+
+    def __init__(self, collection_name: str, batch_size: Optional[int] = None,
+                 flush_interval: Optional[float] = None, max_retries: Optional[int] = None,
+                 max_pending: Optional[int] = None):
+        self.collection_name = collection_name
+        self.enabled = os.getenv("WRITE_BEHIND_ENABLED", "true").lower() == "true"
+        self.batch_size = batch_size or int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "100"))
+        self.flush_interval = flush_interval or float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "0.05"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("WRITE_BEHIND_MAX_RETRIES", "5"))
+        self.max_pending = max_pending or int(os.getenv("WRITE_BEHIND_MAX_PENDING", "10000"))
+        self.retry_backoff = 0.1
+        self._buffer: List[Dict] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.inserted = 0
+        self.batches = 0
+        self.retries = 0
+        self.requeued = 0
+        self.failed = 0
+        self._failed_flushes = 0
+
+    def _collection(self):
+        return db_connection.get_database()[self.collection_name]
+
+    def _ensure_started(self):
+        """Arranca la tarea de vaciado en el event loop actual (en el primer uso)"""
+        if self._task is None or self._task.done():
+            self._closing = False
+            self._wakeup = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._task = asyncio.create_task(self._run())
+
+    async def add(self, document: Dict):
+        """Encola un documento (con `_id` asignado) para insertarlo en el próximo lote"""
+        if not self.enabled:
+            await self._collection().insert_one(document)
+            return
+        self._ensure_started()
+        self._buffer.append(document)
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+        if len(self._buffer) >= self.max_pending:
+            # Contrapresión: si la base de datos no da abasto, el productor espera el vaciado
+            await self.flush()
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if not await self.flush() and not self._closing:
+                # Base de datos caída: el lote volvió a la cola, se espera antes de reintentar
+                self._failed_flushes += 1
+                try:
+                    # El cierre (o un lote lleno) interrumpe la espera
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self._backoff(self._failed_flushes))
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                self._failed_flushes = 0
+
+    def _backoff(self, attempt: int) -> float:
+        return min(self.retry_backoff * 2 ** attempt, self.MAX_BACKOFF)
+
+    async def flush(self) -> bool:
+        """Inserta todo lo pendiente (lo usan también las lecturas que necesitan datos al día)
+
+        Retorna False si la base de datos no respondió: lo pendiente sigue en
+        la cola para el próximo intento. Nunca lanza errores de escritura.
+        """
+        if self._flush_lock is None:
+            return True
+        # Aunque el búfer esté vacío, el lock espera al lote que se está insertando
+        async with self._flush_lock:
+            while self._buffer:
+                batch = self._buffer[:self.batch_size]
+                del self._buffer[:len(batch)]
+                if not await self._write(batch):
+                    self._buffer[0:0] = batch
+                    self.requeued += 1
+                    return False
+        return True
+
+    @staticmethod
+    def _is_transient(error: PyMongoError) -> bool:
+        return isinstance(error, ConnectionFailure) or error.has_error_label("RetryableWriteError")
+
+    async def _write(self, batch: List[Dict]) -> bool:
+        """Inserta un lote; False si sigue fallando por errores transitorios (el lote no se pierde)"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                with DB_BATCH_LATENCY.time(self.collection_name):
+                    await self._collection().insert_many(batch, ordered=False)
+                self.inserted += len(batch)
+                self.batches += 1
+                return True
+            except BulkWriteError as e:
+                # Documentos ya insertados en un intento anterior: no es un error
+                errors = [error for error in e.details.get("writeErrors", []) if error.get("code") != DUPLICATE_KEY]
+                self.inserted += e.details.get("nInserted", 0)
+                self.batches += 1
+                if errors:
+                    self._drop(len(errors), errors[0].get("errmsg"))
+                return True
+            except Exception as e:
+                if isinstance(e, PyMongoError) and self._is_transient(e):
+                    if attempt == self.max_retries:
+                        logger.warning("Escritura diferida de %s sin respuesta de MongoDB, %d documentos vuelven a la cola: %s",
+                                       self.collection_name, len(batch), e)
+                        return False
+                    self.retries += 1
+                    await asyncio.sleep(self._backoff(attempt))
+                    continue
+                if len(batch) > 1:
+                    # Error permanente: documento por documento, para descartar solo el que falla
+                    for document in batch:
+                        if not await self._write([document]):
+                            return False
+                    return True
+                self._drop(1, e)
+                return True
+        return False
+
+    def _drop(self, count: int, error):
+        self.failed += count
+        logger.error("Escritura diferida de %s: %d documentos descartados: %s", self.collection_name, count, error)
+
+    async def close(self):
+        """Detiene la tarea de vaciado e inserta lo pendiente"""
+        if self._task is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        await self._task
+        if not await self.flush():
+            self.failed += len(self._buffer)
+            logger.error("Escritura diferida de %s: %d documentos sin guardar al cerrar", self.collection_name,
+                         len(self._buffer))
+            self._buffer.clear()
+        self._task = None
+
+    def get_stats(self) -> Dict:
+        """Contadores para monitoreo"""
+        return {
+            "enabled": self.enabled,
+            "pending": len(self._buffer),
+            "inserted": self.inserted,
+            "batches": self.batches,
+            "retries": self.retries,
+            "requeued": self.requeued,
+            "failed": self.failed
+        }
+
+
+# Cola global de mensajes
+message_writer = WriteBehindQueue("messages")
@@ -3,21 +3,37 @@ from typing import Optional
 from bson import ObjectId
 
 class Chat:
+    __slots__ = ("_id", "datetime", "summary", "summary_until")
+    
     def __init__(self):
         self._id: Optional[ObjectId] = None
         self.datetime = datetime.now()
+        # Resumen acumulado de los turnos que ya no entran en la ventana de contexto
+        self.summary: Optional[str] = None
+        self.summary_until: Optional[datetime] = None
     
     def to_dict(self):
         """Convierte el objeto a diccionario para MongoDB"""
         return {
             "_id": self._id,
-            "datetime": self.datetime
+            "datetime": self.datetime,
+            "summary": self.summary,
+            "summary_until": self.summary_until
+        }
+    
+    def to_response(self):
+        """Convierte el objeto al formato de respuesta de la API"""
+        return {
+            "id": str(self._id),
+            "datetime": self.datetime.isoformat()
         }
     
     @classmethod
     def from_dict(cls, data: dict):
         """Crea un objeto Chat desde un diccionario de MongoDB"""
-        chat = cls()
+        chat = cls.__new__(cls)
         chat._id = data.get("_id")
-        chat.datetime = data.get("datetime", datetime.now())
-        return chat
\ No newline at end of file
+        chat.datetime = data.get("datetime") or datetime.now()
+        chat.summary = data.get("summary")
+        chat.summary_until = data.get("summary_until")
+        return chat
@@ -3,12 +3,20 @@ from typing import Optional
 from bson import ObjectId
 
 class Message:
-    def __init__(self, role: str, content: str, chat_id: Optional[ObjectId] = None):
+    # Sin __dict__ por instancia: historiales grandes ocupan menos memoria
+    __slots__ = ("_id", "role", "content", "datetime", "chat_id", "truncated")
+    
+    # Campos que usa la respuesta de la API (proyección de las consultas de historial)
+    RESPONSE_PROJECTION = {"role": 1, "content": 1, "datetime": 1, "chat_id": 1, "truncated": 1}
+    
+    def __init__(self, role: str, content: str, chat_id: Optional[ObjectId] = None, truncated: bool = False):
         self._id: Optional[ObjectId] = None
         self.role = role
         self.content = content
         self.datetime = datetime.now()
         self.chat_id = chat_id
+        # Respuesta cortada porque el cliente se desconectó a mitad del stream
+        self.truncated = truncated
     
     def to_dict(self):
         """Convierte el objeto a diccionario para MongoDB"""
@@ -17,18 +25,42 @@ class Message:
             "role": self.role,
             "content": self.content,
             "datetime": self.datetime,
-            "chat_id": self.chat_id
+            "chat_id": self.chat_id,
+            "truncated": self.truncated
+        }
+    
+    def to_response(self):
+        """Convierte el objeto al formato de respuesta de la API"""
+        return {
+            "id": str(self._id),
+            "role": self.role,
+            "content": self.content,
+            "datetime": self.datetime.isoformat(),
+            "chat_id": str(self.chat_id),
+            "truncated": self.truncated
+        }
+    
+    @staticmethod
+    def response_from_document(data: dict):
+        """Convierte un documento de MongoDB directamente al formato de respuesta (sin crear un Message)"""
+        return {
+            "id": str(data["_id"]),
+            "role": data.get("role", "user"),
+            "content": data.get("content", ""),
+            "datetime": data["datetime"].isoformat(),
+            "chat_id": str(data.get("chat_id")),
+            "truncated": data.get("truncated", False)
         }
     
     @classmethod
     def from_dict(cls, data: dict):
         """Crea un objeto Message desde un diccionario de MongoDB"""
-        message = cls(
-            role=data.get("role", "user"),
-            content=data.get("content", ""),
-            chat_id=data.get("chat_id")
-        )
+        # Sin pasar por __init__: evita calcular datetime.now() para cada documento leído
+        message = cls.__new__(cls)
         message._id = data.get("_id")
-        message.datetime = data.get("datetime", datetime.now())
+        message.role = data.get("role", "user")
+        message.content = data.get("content", "")
+        message.datetime = data.get("datetime") or datetime.now()
+        message.chat_id = data.get("chat_id")
+        message.truncated = data.get("truncated", False)
         return message
-        
\ No newline at end of file
@@ -0,0 +1,85 @@
+from datetime import datetime
+from typing import Dict, Optional
+from bson import ObjectId
+
+class MetricasJob:
+    """Análisis de métricas en segundo plano sobre un conjunto de chats"""
+    __slots__ = ("_id", "status", "since", "until", "total", "processed", "failed",
+                 "checkpoint", "aggregates", "last_error", "owner", "lease_until",
+                 "created_at", "updated_at", "finished_at")
+
+    # Agregados parciales que se acumulan con $inc a medida que avanza el trabajo
+    AGGREGATE_KEYS = ("nuevos_analizados", "satisfacion_sum", "satisfacion_count",
+                      "precision_sum", "precision_count")
+
+    def __init__(self, since: Optional[datetime] = None, until: Optional[datetime] = None):
+        self._id: Optional[ObjectId] = None
+        self.status = "running"
+        self.since = since
+        self.until = until
+        self.total = 0
+        self.processed = 0
+        self.failed = 0
+        # Cursor (Pagination) del último chat tal que todos los anteriores ya terminaron
+        self.checkpoint: Optional[str] = None
+        self.aggregates: Dict = {key: 0 for key in self.AGGREGATE_KEYS}
+        self.last_error: Optional[str] = None
+        # Proceso que ejecuta el trabajo y hasta cuándo lo tiene reservado
+        self.owner: Optional[str] = None
+        self.lease_until: Optional[datetime] = None
+        self.created_at = datetime.now()
+        self.updated_at = self.created_at
+        self.finished_at: Optional[datetime] = None
+
+    def to_dict(self):
+        """Convierte el objeto a diccionario para MongoDB"""
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def to_response(self):
+        """Convierte el objeto al formato de respuesta de la API"""
+        return {
+            "id": str(self._id),
+            "status": self.status,
+            "since": self.since.isoformat() if self.since else None,
+            "until": self.until.isoformat() if self.until else None,
+            "total": self.total,
+            "processed": self.processed,
+            "failed": self.failed,
+            "progress": round(self.processed / self.total, 4) if self.total else 1.0,
+            "last_error": self.last_error,
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+    def aggregates_response(self):
+        """Promedios parciales (o finales si el trabajo terminó) de los chats procesados"""
+        aggregates = self.aggregates or {}
+        satisfacion_count = aggregates.get("satisfacion_count", 0)
+        precision_count = aggregates.get("precision_count", 0)
+        return {
+            "id": str(self._id),
+            "status": self.status,
+            "partial": self.status != "completed",
+            "chats_procesados": self.processed,
+            "total": self.total,
+            "nuevos_analizados": aggregates.get("nuevos_analizados", 0),
+            "satisfacion_promedio": aggregates.get("satisfacion_sum", 0) / satisfacion_count if satisfacion_count else 0,
+            "precision_promedio": aggregates.get("precision_sum", 0) / precision_count if precision_count else 0,
+            "satisfacion_count": satisfacion_count,
+            "precision_count": precision_count
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """Crea un objeto MetricasJob desde un diccionario de MongoDB"""
+        job = cls.__new__(cls)
+        for slot in cls.__slots__:
+            setattr(job, slot, data.get(slot))
+        job.total = job.total or 0
+        job.processed = job.processed or 0
+        job.failed = job.failed or 0
+        job.aggregates = job.aggregates or {}
+        job.created_at = job.created_at or datetime.now()
+        job.updated_at = job.updated_at or job.created_at
+        return job
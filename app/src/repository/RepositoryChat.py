@@ -1,14 +1,19 @@
-from typing import List, Optional
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 from bson import ObjectId
 from app.src.models.Chat import Chat
 from app.src.database.connection import db_connection
+from app.src.utils.Metrics import instrumented
+from app.src.utils.Pagination import Pagination
 
+@instrumented
 class RepositoryChat:
-    def __init__(self):
-        self.db = db_connection.get_database()
-        self.collection = self.db["chats"]
+    @property
+    def collection(self):
+        """Colección de la conexión activa (se resuelve en cada uso: sobrevive a reconexiones)"""
+        return db_connection.get_database()["chats"]
     
-    def create_chat(self, chat: Chat) -> Chat:
+    async def create_chat(self, chat: Chat) -> Chat:
         """Crea un nuevo chat en la base de datos"""
         try:
             chat_dict = chat.to_dict()
@@ -16,18 +21,18 @@ class RepositoryChat:
             if chat_dict["_id"] is None:
                 del chat_dict["_id"]
             
-            result = self.collection.insert_one(chat_dict)
+            result = await self.collection.insert_one(chat_dict)
             chat._id = result.inserted_id
             return chat
         except Exception as e:
             print(f"Error al crear chat: {e}")
             raise e
     
-    def get_chat_by_id(self, chat_id: str) -> Optional[Chat]:
+    async def get_chat_by_id(self, chat_id: str) -> Optional[Chat]:
         """Obtiene un chat por su ID"""
         try:
             obj_id = ObjectId(chat_id)
-            chat_data = self.collection.find_one({"_id": obj_id})
+            chat_data = await self.collection.find_one({"_id": obj_id})
             
             if chat_data:
                 return Chat.from_dict(chat_data)
@@ -36,12 +41,90 @@ class RepositoryChat:
             print(f"Error al obtener chat: {e}")
             return None
     
-    def get_all_chats(self) -> List[Chat]:
+    async def update_summary(self, chat_id: str, summary: str, summary_until: datetime) -> bool:
+        """Actualiza el resumen acumulado de la conversación"""
+        try:
+            result = await self.collection.update_one(
+                {"_id": ObjectId(chat_id)},
+                {"$set": {"summary": summary, "summary_until": summary_until}}
+            )
+            return result.modified_count > 0
+        except Exception as e:
+            print(f"Error al actualizar resumen del chat: {e}")
+            return False
+    
+    def iter_all_chats(self, after: Optional[ObjectId] = None, batch_size: int = 1000):
+        """Cursor de todos los chats ordenados por _id, después de `after` (exportación completa)"""
+        query = {"_id": {"$gt": after}} if after is not None else {}
+        return self.collection.find(query).sort("_id", 1).batch_size(batch_size)
+    
+    async def get_metrics(self, chat_id: str) -> Dict:
+        """Obtiene los agregados de métricas del chat (sumas y conteos)"""
+        try:
+            chat_data = await self.collection.find_one({"_id": ObjectId(chat_id)}, {"metricas": 1})
+            return (chat_data or {}).get("metricas") or {}
+        except Exception as e:
+            print(f"Error al obtener métricas del chat: {e}")
+            return {}
+    
+    async def set_metrics(self, chat_id: str, metrics: Dict) -> bool:
+        """Reemplaza los agregados de métricas del chat"""
+        try:
+            result = await self.collection.update_one({"_id": ObjectId(chat_id)}, {"$set": {"metricas": metrics}})
+            return result.modified_count > 0
+        except Exception as e:
+            print(f"Error al guardar métricas del chat: {e}")
+            return False
+    
+    async def get_all_chats(self) -> List[Chat]:
         """Obtiene todos los chats ordenados por fecha de creación"""
         try:
-            chats_data = self.collection.find().sort("datetime", -1)
-            return [Chat.from_dict(chat_data) for chat_data in chats_data]
+            cursor = self.collection.find().sort("datetime", -1)
+            return [Chat.from_dict(chat_data) async for chat_data in cursor]
         except Exception as e:
             print(f"Error al obtener chats: {e}")
             return []
-    
\ No newline at end of file
+    
+    def range_filter(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> Dict:
+        """Filtro de chats creados en [since, until)"""
+        date_filter = {}
+        if since is not None:
+            date_filter["$gte"] = since
+        if until is not None:
+            date_filter["$lt"] = until
+        return {"datetime": date_filter} if date_filter else {}
+    
+    async def count_chats(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> int:
+        """Cantidad de chats creados en [since, until)"""
+        try:
+            return await self.collection.count_documents(self.range_filter(since, until))
+        except Exception as e:
+            print(f"Error al contar chats: {e}")
+            return 0
+    
+    def iter_chats_in_range(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                            after: Optional[str] = None, batch_size: int = 500):
+        """Cursor de chats (solo _id y datetime) en orden ascendente desde el cursor `after`"""
+        query = self.range_filter(since, until)
+        keyset, order = Pagination.build_query(1, after)
+        query.update(keyset)
+        return self.collection.find(query, {"_id": 1, "datetime": 1}).sort(
+            [("datetime", order), ("_id", order)]
+        ).batch_size(batch_size)
+    
+    async def get_chats_page(self, limit: int, after: Optional[str] = None,
+                             before: Optional[str] = None) -> Tuple[List[Chat], bool]:
+        """Obtiene una página de chats, más recientes primero (keyset sobre datetime, _id)"""
+        keyset, order = Pagination.build_query(-1, after, before)
+        try:
+            cursor = self.collection.find(keyset, {"summary": 0}).sort([("datetime", order), ("_id", order)]).limit(limit + 1)
+            chats = [Chat.from_dict(chat_data) async for chat_data in cursor]
+        except Exception as e:
+            print(f"Error al obtener página de chats: {e}")
+            return [], False
+        
+        has_more = len(chats) > limit
+        chats = chats[:limit]
+        if before:
+            chats.reverse()
+        return chats, has_more
@@ -1,14 +1,21 @@
-from typing import List, Optional
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 from bson import ObjectId
+from pymongo import UpdateOne
 from app.src.models.Message import Message
 from app.src.database.connection import db_connection
+from app.src.utils.Metrics import instrumented
+from app.src.database.write_behind import message_writer
+from app.src.utils.Pagination import Pagination
 
+@instrumented
 class RepositoryMessage:
-    def __init__(self):
-        self.db = db_connection.get_database()
-        self.collection = self.db["messages"]
+    @property
+    def collection(self):
+        """Colección de la conexión activa (se resuelve en cada uso: sobrevive a reconexiones)"""
+        return db_connection.get_database()["messages"]
     
-    def create_message(self, message: Message) -> Message:
+    async def create_message(self, message: Message) -> Message:
         """Crea un nuevo mensaje en la base de datos"""
         try:
             message_dict = message.to_dict()
@@ -16,18 +23,29 @@ class RepositoryMessage:
             if message_dict["_id"] is None:
                 del message_dict["_id"]
             
-            result = self.collection.insert_one(message_dict)
+            result = await self.collection.insert_one(message_dict)
             message._id = result.inserted_id
             return message
         except Exception as e:
             print(f"Error al crear mensaje: {e}")
             raise e
     
-    def get_message_by_id(self, message_id: str) -> Optional[Message]:
+    async def enqueue_message(self, message: Message) -> Message:
+        """Asigna el _id y encola el mensaje en la escritura diferida por lotes"""
+        if message._id is None:
+            message._id = ObjectId()
+        await message_writer.add(message.to_dict())
+        return message
+    
+    async def flush_pending(self):
+        """Espera a que se inserten los mensajes encolados (lecturas que deben verlos)"""
+        await message_writer.flush()
+    
+    async def get_message_by_id(self, message_id: str) -> Optional[Message]:
         """Obtiene un mensaje por su ID"""
         try:
             obj_id = ObjectId(message_id)
-            message_data = self.collection.find_one({"_id": obj_id})
+            message_data = await self.collection.find_one({"_id": obj_id})
             
             if message_data:
                 return Message.from_dict(message_data)
@@ -36,13 +54,159 @@ class RepositoryMessage:
             print(f"Error al obtener mensaje: {e}")
             return None
     
-    def get_messages_by_chat_id(self, chat_id: str) -> List[Message]:
+    async def get_messages_by_chat_id(self, chat_id: str) -> List[Message]:
         """Obtiene todos los mensajes de un chat ordenados por fecha"""
         try:
             obj_id = ObjectId(chat_id)
-            messages_data = self.collection.find({"chat_id": obj_id}).sort("datetime", 1)
-            return [Message.from_dict(message_data) for message_data in messages_data]
+            cursor = self.collection.find({"chat_id": obj_id}).sort("datetime", 1)
+            return [Message.from_dict(message_data) async for message_data in cursor]
         except Exception as e:
             print(f"Error al obtener mensajes del chat: {e}")
             return []
-    
\ No newline at end of file
+    
+    async def get_recent_messages(self, chat_id: str, limit: int) -> List[Message]:
+        """Obtiene los últimos `limit` mensajes de un chat en orden cronológico"""
+        try:
+            obj_id = ObjectId(chat_id)
+            cursor = self.collection.find({"chat_id": obj_id}).sort("datetime", -1).limit(limit)
+            messages = [Message.from_dict(message_data) async for message_data in cursor]
+            messages.reverse()
+            return messages
+        except Exception as e:
+            print(f"Error al obtener mensajes recientes del chat: {e}")
+            return []
+    
+    async def get_messages_between(self, chat_id: str, start: Optional[datetime], end: datetime,
+                                   limit: int) -> List[Message]:
+        """Obtiene mensajes con start < datetime < end en orden cronológico"""
+        try:
+            date_filter = {"$lt": end}
+            if start is not None:
+                date_filter["$gt"] = start
+            cursor = self.collection.find({"chat_id": ObjectId(chat_id), "datetime": date_filter}).sort("datetime", 1).limit(limit)
+            return [Message.from_dict(message_data) async for message_data in cursor]
+        except Exception as e:
+            print(f"Error al obtener mensajes del rango: {e}")
+            return []
+    
+    async def get_summaries_by_chat_ids(self, chat_ids: List[ObjectId],
+                                        preview_length: int = 100) -> Dict[ObjectId, Tuple[int, Message]]:
+        """Conteo de mensajes y último mensaje de varios chats en una sola agregación
+
+        El contenido del último mensaje llega recortado a `preview_length` + 1
+        caracteres (el extra indica que hubo recorte): MongoDB no transfiere
+        mensajes completos solo para mostrar una vista previa.
+        """
+        try:
+            cursor = await self.collection.aggregate([
+                {"$match": {"chat_id": {"$in": chat_ids}}},
+                {"$sort": {"chat_id": 1, "datetime": 1}},
+                {"$project": {
+                    "role": 1,
+                    "content": {"$substrCP": ["$content", 0, preview_length + 1]},
+                    "datetime": 1,
+                    "chat_id": 1
+                }},
+                {"$group": {
+                    "_id": "$chat_id",
+                    "message_count": {"$sum": 1},
+                    "last_message": {"$last": {
+                        "_id": "$_id",
+                        "role": "$role",
+                        "content": "$content",
+                        "datetime": "$datetime",
+                        "chat_id": "$chat_id"
+                    }}
+                }}
+            ])
+            return {
+                summary["_id"]: (summary["message_count"], Message.from_dict(summary["last_message"]))
+                async for summary in cursor
+            }
+        except Exception as e:
+            print(f"Error al obtener resumen de mensajes: {e}")
+            return {}
+    
+    async def get_messages_page(self, chat_id: str, limit: int, after: Optional[str] = None,
+                                before: Optional[str] = None) -> Tuple[List[Message], bool]:
+        """Obtiene una página de mensajes en orden cronológico (keyset sobre datetime, _id)"""
+        documents, has_more = await self.get_messages_page_documents(chat_id, limit, after, before)
+        return [Message.from_dict(message_data) for message_data in documents], has_more
+    
+    async def get_messages_page_documents(self, chat_id: str, limit: int, after: Optional[str] = None,
+                                          before: Optional[str] = None,
+                                          projection: Optional[Dict] = None) -> Tuple[List[Dict], bool]:
+        """Igual que get_messages_page pero retorna los documentos de MongoDB sin convertir
+
+        Con `projection` solo se transfieren los campos necesarios (por ejemplo,
+        Message.RESPONSE_PROJECTION para responder directamente a la API).
+        """
+        keyset, order = Pagination.build_query(1, after, before)
+        try:
+            query = {"chat_id": ObjectId(chat_id)}
+            if keyset:
+                query.update(keyset)
+            cursor = self.collection.find(query, projection).sort([("datetime", order), ("_id", order)]).limit(limit + 1)
+            documents = await cursor.to_list(length=None)
+        except Exception as e:
+            print(f"Error al obtener página de mensajes: {e}")
+            return [], False
+        
+        has_more = len(documents) > limit
+        documents = documents[:limit]
+        if before:
+            documents.reverse()
+        return documents, has_more
+    
+    def iter_all_messages(self, after: Optional[str] = None, batch_size: int = 1000):
+        """Cursor único sobre todos los mensajes en orden (chat_id, datetime, _id)
+
+        Usa el índice chat_id_datetime_id (sin ordenar en memoria) y trae los
+        documentos de a `batch_size`; lanza ValueError si el checkpoint no es válido.
+        """
+        query = Pagination.build_export_query(after)
+        return self.collection.find(query).sort(
+            [("chat_id", 1), ("datetime", 1), ("_id", 1)]
+        ).batch_size(batch_size)
+    
+    async def get_unscored_messages(self, chat_id: str) -> List[Message]:
+        """Obtiene los mensajes del chat que aún no tienen métricas"""
+        try:
+            obj_id = ObjectId(chat_id)
+            cursor = self.collection.find({"chat_id": obj_id, "metricas": None}).sort("datetime", 1)
+            return [Message.from_dict(message_data) async for message_data in cursor]
+        except Exception as e:
+            print(f"Error al obtener mensajes sin métricas: {e}")
+            return []
+    
+    async def set_metrics_many(self, metrics: List[Tuple[ObjectId, Dict]]) -> int:
+        """Guarda las métricas de varios mensajes en un solo bulk write; retorna cuántos se actualizaron
+
+        Un mensaje que el modelo no pudo puntuar se guarda con {}: queda evaluado y no se reenvía.
+        """
+        try:
+            now = datetime.now()
+            operations = [
+                # Solo si no fueron evaluados por otro análisis concurrente
+                UpdateOne({"_id": message_id, "metricas": None},
+                          {"$set": {"metricas": message_metrics, "metricas_at": now}})
+                for message_id, message_metrics in metrics
+            ]
+            result = await self.collection.bulk_write(operations, ordered=False)
+            return result.modified_count
+        except Exception as e:
+            print(f"Error al guardar métricas de mensajes: {e}")
+            return 0
+    
+    async def get_metrics_by_chat_id(self, chat_id: str) -> List[Dict]:
+        """Obtiene las métricas guardadas de los mensajes del chat en orden cronológico"""
+        try:
+            obj_id = ObjectId(chat_id)
+            cursor = self.collection.find(
+                {"chat_id": obj_id, "metricas": {"$ne": None}},
+                {"metricas": 1, "_id": 0}
+            ).sort("datetime", 1)
+            return [message_data["metricas"] async for message_data in cursor]
+        except Exception as e:
+            print(f"Error al obtener métricas de mensajes: {e}")
+            return []
@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from bson import ObjectId
+from pymongo import ReturnDocument
+from app.src.models.MetricasJob import MetricasJob
+from app.src.database.connection import db_connection
+from app.src.utils.Metrics import instrumented
+
+@instrumented
+class RepositoryMetricasJob:
+    @property
+    def collection(self):
+        """Colección de la conexión activa (se resuelve en cada uso: sobrevive a reconexiones)"""
+        return db_connection.get_database()["metricas_jobs"]
+
+    async def create_job(self, job: MetricasJob) -> MetricasJob:
+        """Crea un trabajo en la base de datos"""
+        try:
+            job_dict = job.to_dict()
+            if job_dict["_id"] is None:
+                del job_dict["_id"]
+            result = await self.collection.insert_one(job_dict)
+            job._id = result.inserted_id
+            return job
+        except Exception as e:
+            print(f"Error al crear trabajo de métricas: {e}")
+            raise e
+
+    async def get_job(self, job_id: str) -> Optional[MetricasJob]:
+        """Obtiene un trabajo por su ID"""
+        try:
+            job_data = await self.collection.find_one({"_id": ObjectId(job_id)})
+            return MetricasJob.from_dict(job_data) if job_data else None
+        except Exception as e:
+            print(f"Error al obtener trabajo de métricas: {e}")
+            return None
+
+    async def get_orphan_job_ids(self) -> List[ObjectId]:
+        """Trabajos en curso cuyo proceso dejó de renovar la reserva (caído o reiniciado)"""
+        try:
+            cursor = self.collection.find(
+                {"status": "running", "lease_until": {"$lt": datetime.now()}}, {"_id": 1}
+            )
+            return [job_data["_id"] async for job_data in cursor]
+        except Exception as e:
+            print(f"Error al buscar trabajos de métricas huérfanos: {e}")
+            return []
+
+    async def claim_job(self, job_id: ObjectId, owner: str, lease: float) -> Optional[MetricasJob]:
+        """Reserva un trabajo huérfano para `owner`; None si otro proceso lo tomó antes"""
+        try:
+            now = datetime.now()
+            job_data = await self.collection.find_one_and_update(
+                {"_id": job_id, "status": "running", "lease_until": {"$lt": now}},
+                {"$set": {"owner": owner, "lease_until": now + timedelta(seconds=lease), "updated_at": now}},
+                return_document=ReturnDocument.AFTER
+            )
+            return MetricasJob.from_dict(job_data) if job_data else None
+        except Exception as e:
+            print(f"Error al reservar trabajo de métricas: {e}")
+            return None
+
+    async def save_progress(self, job_id: ObjectId, owner: str, lease: float, checkpoint: Optional[str],
+                            increments: Dict, last_error: Optional[str] = None) -> bool:
+        """Guarda checkpoint y agregados parciales y renueva la reserva
+
+        Retorna False si el trabajo ya no está en curso o pasó a otro proceso;
+        en ese caso quien lo ejecuta debe detenerse.
+        """
+        now = datetime.now()
+        update = {"$set": {"lease_until": now + timedelta(seconds=lease), "updated_at": now}}
+        if checkpoint is not None:
+            update["$set"]["checkpoint"] = checkpoint
+        if last_error is not None:
+            update["$set"]["last_error"] = last_error
+        if increments:
+            update["$inc"] = increments
+        result = await self.collection.update_one({"_id": job_id, "status": "running", "owner": owner}, update)
+        return result.matched_count > 0
+
+    async def release_job(self, job_id: ObjectId, owner: str) -> bool:
+        """Libera la reserva de un trabajo que sigue en curso (para que otro proceso lo retome)"""
+        try:
+            result = await self.collection.update_one(
+                {"_id": job_id, "status": "running", "owner": owner},
+                {"$set": {"lease_until": datetime.now()}}
+            )
+            return result.modified_count > 0
+        except Exception as e:
+            print(f"Error al liberar trabajo de métricas: {e}")
+            return False
+
+    async def finish_job(self, job_id: ObjectId, owner: str, status: str,
+                         last_error: Optional[str] = None) -> bool:
+        """Marca el trabajo como terminado ("completed" o "failed")"""
+        try:
+            now = datetime.now()
+            update = {"status": status, "finished_at": now, "updated_at": now, "lease_until": None}
+            if last_error is not None:
+                update["last_error"] = last_error
+            result = await self.collection.update_one(
+                {"_id": job_id, "status": "running", "owner": owner}, {"$set": update}
+            )
+            return result.modified_count > 0
+        except Exception as e:
+            print(f"Error al finalizar trabajo de métricas: {e}")
+            return False
+
+    async def cancel_job(self, job_id: str) -> bool:
+        """Cancela un trabajo en curso; el proceso que lo ejecuta se detiene en su próximo checkpoint"""
+        try:
+            now = datetime.now()
+            result = await self.collection.update_one(
+                {"_id": ObjectId(job_id), "status": "running"},
+                {"$set": {"status": "cancelled", "finished_at": now, "updated_at": now, "lease_until": None}}
+            )
+            return result.modified_count > 0
+        except Exception as e:
+            print(f"Error al cancelar trabajo de métricas: {e}")
+            return False
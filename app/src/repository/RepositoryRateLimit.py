@@ -0,0 +1,40 @@
+from typing import Dict, Optional
+from pymongo.errors import DuplicateKeyError
+from app.src.database.connection import db_connection
+
+
+class RepositoryRateLimit:
+    """Estado compartido de los limitadores de los proveedores LLM (un documento por proveedor)
+
+    Cada documento guarda, por dimensión ("requests", "tokens"), el instante
+    teórico (epoch en segundos) en que el cupo vuelve a estar libre, y un
+    número de revisión para actualizarlo con compare-and-set entre procesos.
+    No se instrumenta: se llama antes de cada petición al LLM.
+    """
+
+    @property
+    def collection(self):
+        """Colección de la conexión activa (se resuelve en cada uso: sobrevive a reconexiones)"""
+        return db_connection.get_database()["rate_limits"]
+
+    async def get_state(self, key: str) -> Optional[Dict]:
+        """Retorna el estado del limitador `key` (None si todavía no existe)"""
+        return await self.collection.find_one({"_id": key})
+
+    async def replace_state(self, key: str, revision: Optional[int], values: Dict[str, float]) -> bool:
+        """Guarda `values` solo si nadie lo modificó desde `revision`; False si otro proceso ganó"""
+        if revision is None:
+            try:
+                await self.collection.insert_one({"_id": key, "revision": 1, **values})
+                return True
+            except DuplicateKeyError:
+                return False
+        result = await self.collection.update_one(
+            {"_id": key, "revision": revision},
+            {"$set": values, "$inc": {"revision": 1}}
+        )
+        return result.modified_count > 0
+
+    async def shift(self, key: str, seconds: Dict[str, float]):
+        """Corre los instantes de las dimensiones (positivo = consumo extra, negativo = devolución)"""
+        await self.collection.update_one({"_id": key}, {"$inc": {**seconds, "revision": 1}})
@@ -1,25 +1,23 @@
-from typing import Dict
+from typing import Dict, Optional
 from app.src.models.Chat import Chat
 from app.src.repository.RepositoryChat import RepositoryChat
 from app.src.repository.RepositoryMessage import RepositoryMessage
+from app.src.utils.Pagination import Pagination
 
 class ServiceChat:
     def __init__(self):
         self.chat_repository = RepositoryChat()
         self.message_repository = RepositoryMessage()
     
-    def create_chat(self) -> Dict:
+    async def create_chat(self) -> Dict:
         """Crea un nuevo chat"""
         try:
             chat = Chat()
-            created_chat = self.chat_repository.create_chat(chat)
+            created_chat = await self.chat_repository.create_chat(chat)
             
             return {
                 "success": True,
-                "data": {
-                    "id": str(created_chat._id),
-                    "datetime": created_chat.datetime.isoformat()
-                },
+                "data": created_chat.to_response(),
                 "message": "Chat creado exitosamente"
             }
         except Exception as e:
@@ -29,10 +27,10 @@ class ServiceChat:
                 "message": "No se pudo crear el chat"
             }
     
-    def get_chat_by_id(self, chat_id: str) -> Dict:
+    async def get_chat_by_id(self, chat_id: str) -> Dict:
         """Obtiene un chat por su ID"""
         try:
-            chat = self.chat_repository.get_chat_by_id(chat_id)
+            chat = await self.chat_repository.get_chat_by_id(chat_id)
             
             if not chat:
                 return {
@@ -43,10 +41,7 @@ class ServiceChat:
             
             return {
                 "success": True,
-                "data": {
-                    "id": str(chat._id),
-                    "datetime": chat.datetime.isoformat()
-                }
+                "data": chat.to_response()
             }
         except Exception as e:
             return {
@@ -55,25 +50,27 @@ class ServiceChat:
                 "message": "No se pudo obtener el chat"
             }
     
-    def get_all_chats(self) -> Dict:
-        """Obtiene todos los chats"""
+    async def get_all_chats(self, limit: Optional[int] = None, after: Optional[str] = None,
+                            before: Optional[str] = None) -> Dict:
+        """Obtiene una página de chats"""
         try:
-            chats = self.chat_repository.get_all_chats()
+            chats, has_more = await self.chat_repository.get_chats_page(Pagination.clamp_limit(limit), after, before)
+            # Los mensajes encolados cuentan en el conteo y el último mensaje
+            await self.message_repository.flush_pending()
+            # Una sola agregación para toda la página: conteo y vista previa del último mensaje sin cargar el historial
+            summaries = await self.message_repository.get_summaries_by_chat_ids([chat._id for chat in chats])
             
             chats_data = []
             for chat in chats:
-                # Obtener el último mensaje para preview
-                messages = self.message_repository.get_messages_by_chat_id(str(chat._id))
-                last_message = messages[-1] if messages else None
-                
+                message_count, last_message = summaries.get(chat._id, (0, None))
                 chat_data = {
                     "id": str(chat._id),
                     "datetime": chat.datetime.isoformat(),
-                    "message_count": len(messages),
+                    "message_count": message_count,
                     "last_message": {
-                        "content": last_message.content[:100] + "..." if last_message and len(last_message.content) > 100 else last_message.content if last_message else None,
-                        "datetime": last_message.datetime.isoformat() if last_message else None,
-                        "role": last_message.role if last_message else None
+                        "content": last_message.content[:100] + "..." if len(last_message.content) > 100 else last_message.content,
+                        "datetime": last_message.datetime.isoformat(),
+                        "role": last_message.role
                     } if last_message else None
                 }
                 chats_data.append(chat_data)
@@ -81,7 +78,14 @@ class ServiceChat:
             return {
                 "success": True,
                 "data": chats_data,
-                "total": len(chats_data)
+                "total": len(chats_data),
+                **Pagination.page_cursors(chats, has_more, after, before)
+            }
+        except ValueError as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "message": "Parámetros de paginación inválidos"
             }
         except Exception as e:
             return {
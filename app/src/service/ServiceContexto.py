@@ -0,0 +1,106 @@
+import os
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from app.src.models.Chat import Chat
+from app.src.models.Message import Message
+from app.src.repository.RepositoryChat import RepositoryChat
+from app.src.repository.RepositoryMessage import RepositoryMessage
+from app.src.utils.Metrics import LLM_REQUEST_LATENCY
+from API.ProviderRegistry import provider_registry
+
+
+class ServiceContexto:
+    """Ventana deslizante de contexto para las llamadas al LLM
+
+    Conserva los turnos más recientes dentro de un presupuesto de tokens y,
+    opcionalmente, mantiene en el chat un resumen acumulado de los turnos
+    que quedaron fuera de la ventana.
+    """
+
+    # Tope de mensajes antiguos que se resumen por actualización
+    SUMMARY_BATCH = 200
+
+    def __init__(self, provider: Optional[str] = None):
+        self.chat_repository = RepositoryChat()
+        self.message_repository = RepositoryMessage()
+        # Proveedor del registro usado para los resúmenes (None = sin resúmenes)
+        self.provider = provider
+        self.max_tokens = int(os.getenv("CONTEXT_MAX_TOKENS", "4000"))
+        self.max_messages = int(os.getenv("CONTEXT_MAX_MESSAGES", "60"))
+        self.summary_enabled = os.getenv("CONTEXT_SUMMARY", "true").lower() == "true"
+        self._summaries_in_progress = set()
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """Estimación rápida de tokens (~4 caracteres por token)"""
+        return len(text) // 4 + 1
+
+    async def get_recent_history(self, chat_id: str) -> List[Message]:
+        """Obtiene solo los mensajes que pueden entrar en la ventana"""
+        return await self.message_repository.get_recent_messages(chat_id, self.max_messages)
+
+    def build_window(self, history: List[Message], summary: Optional[str] = None) -> Tuple[List[Dict], List[Message]]:
+        """Arma el contexto más reciente que cabe en el presupuesto de tokens
+
+        Retorna el contexto para el LLM y los mensajes que quedaron fuera.
+        """
+        budget = self.max_tokens
+        prefix = []
+        if summary and self.summary_enabled:
+            prefix = [
+                {"role": "user", "content": f"Resumen de la conversación anterior: {summary}"},
+                {"role": "assistant", "content": "Entendido, continúo la conversación con ese contexto."}
+            ]
+            budget -= sum(self.estimate_tokens(i["content"]) for i in prefix)
+
+        start = len(history)
+        while start > 0:
+            cost = self.estimate_tokens(history[start - 1].content)
+            if cost > budget:
+                break
+            budget -= cost
+            start -= 1
+
+        # La ventana debe empezar con un turno del usuario
+        while start < len(history) and history[start].role != "user":
+            start += 1
+
+        window = [{"role": message.role, "content": message.content} for message in history[start:]]
+        return prefix + window, history[:start]
+
+    def schedule_summary(self, chat: Chat, history: List[Message], dropped: List[Message]):
+        """Actualiza en segundo plano el resumen si hay turnos fuera de la ventana sin resumir"""
+        if not self.summary_enabled or self.provider is None or not history:
+            return
+        window_start = history[len(dropped)].datetime if len(dropped) < len(history) else history[-1].datetime
+        # Si se alcanzó el tope de mensajes leídos puede haber historial más antiguo aún sin resumir
+        truncated = dropped or len(history) >= self.max_messages
+        if not truncated or (chat.summary_until and chat.summary_until >= window_start):
+            return
+        chat_id = str(chat._id)
+        if chat_id in self._summaries_in_progress:
+            return
+        self._summaries_in_progress.add(chat_id)
+        asyncio.create_task(self._update_summary(chat, window_start))
+
+    async def _update_summary(self, chat: Chat, window_start):
+        """Integra en el resumen los mensajes entre summary_until y el inicio de la ventana"""
+        chat_id = str(chat._id)
+        try:
+            pending = await self.message_repository.get_messages_between(
+                chat_id, chat.summary_until, window_start, self.SUMMARY_BATCH
+            )
+            if not pending:
+                return
+            contexto = [{"role": message.role, "content": message.content} for message in pending]
+            model = provider_registry.get(self.provider)
+            with LLM_REQUEST_LATENCY.time(self.provider, "resumen"):
+                summary = await model.resumir_conversacion_async(chat.summary, contexto)
+            await self.chat_repository.update_summary(chat_id, summary, pending[-1].datetime)
+            # El objeto puede estar compartido con el caché de historial
+            chat.summary = summary
+            chat.summary_until = pending[-1].datetime
+        except Exception as e:
+            print(f"Error al actualizar resumen de la conversación: {e}")
+        finally:
+            self._summaries_in_progress.discard(chat_id)
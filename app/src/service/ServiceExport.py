@@ -0,0 +1,133 @@
+import os
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+from bson import ObjectId
+from app.src.repository.RepositoryMessage import RepositoryMessage
+from app.src.repository.RepositoryChat import RepositoryChat
+from app.src.utils.Pagination import Pagination
+from app.src.utils.Responses import dumps
+
+
+class ServiceExport:
+    """Exportación de todos los chats y mensajes como NDJSON en streaming
+
+    Combina dos cursores ordenados: chats por _id y mensajes por
+    (chat_id, datetime, _id). Cada chat se emite una vez, antes de sus
+    mensajes (o solo, si no tiene ninguno), y cada `batch_size` líneas se
+    emite un lote, así la memoria no depende del tamaño de la colección.
+    Cada línea lleva `type`: "chat", "message", "checkpoint" al final de
+    cada lote (cursor para reanudar con `after`), "error" si un cursor falla
+    a mitad de camino y "end" al terminar.
+
+    Un checkpoint siempre queda después de la línea de su chat: al reanudar
+    no se repite, aunque el chat tenga más mensajes por exportar.
+    """
+
+    # Posición de un chat sin mensajes exportados: antes de cualquier mensaje suyo
+    CHAT_START = (datetime.min, ObjectId("0" * 24))
+
+    def __init__(self):
+        self.message_repository = RepositoryMessage()
+        self.chat_repository = RepositoryChat()
+        self.batch_size = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+        self.gzip_level = int(os.getenv("EXPORT_GZIP_LEVEL", "6"))
+
+    @staticmethod
+    def validate_checkpoint(after: Optional[str]) -> Dict:
+        """Valida el checkpoint antes de abrir el stream (para responder 400 y no un stream roto)"""
+        try:
+            Pagination.build_export_query(after)
+            return {"success": True}
+        except ValueError as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "message": "El checkpoint no corresponde a una exportación"
+            }
+
+    async def export_ndjson(self, after: Optional[str] = None, compress: bool = False,
+                            batch_size: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Genera la exportación en bloques de bytes (NDJSON o gzip incremental)"""
+        batch_size = batch_size or self.batch_size
+        # wbits=31: formato gzip; cada lote se cierra con Z_SYNC_FLUSH para que el cliente lo reciba ya
+        compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31) if compress else None
+
+        def encode(lines: List[bytes]) -> bytes:
+            data = b"\n".join(lines) + b"\n"
+            if compressor is None:
+                return data
+            return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+        # Los mensajes aún en la cola de escritura diferida también se exportan
+        await self.message_repository.flush_pending()
+
+        # El chat del checkpoint ya tiene su línea: los chats se retoman después de él
+        current_chat = Pagination.decode_export_cursor(after)[0] if after else None
+        exported = 0
+        checkpoint = after
+        position = None
+        lines: List[bytes] = []
+        try:
+            chats = self.chat_repository.iter_all_chats(current_chat, batch_size)
+            messages = self.message_repository.iter_all_messages(after, batch_size)
+            next_chat = await anext(chats, None)
+            document = await anext(messages, None)
+            while next_chat is not None or document is not None:
+                if next_chat is not None and (document is None or next_chat["_id"] <= document["chat_id"]):
+                    # Chat que empieza aquí (o que no tiene mensajes)
+                    current_chat = next_chat["_id"]
+                    lines.append(self._chat_line(current_chat, next_chat))
+                    position = (current_chat, *self.CHAT_START)
+                    next_chat = await anext(chats, None)
+                else:
+                    if document["chat_id"] != current_chat:
+                        # Mensaje de un chat que ya no existe: línea de chat sin datos
+                        current_chat = document["chat_id"]
+                        lines.append(self._chat_line(current_chat, {}))
+                    lines.append(self._message_line(document))
+                    exported += 1
+                    position = (document["chat_id"], document["datetime"], document["_id"])
+                    document = await anext(messages, None)
+
+                if len(lines) >= batch_size:
+                    checkpoint = Pagination.encode_export_cursor(*position)
+                    lines.append(dumps({"type": "checkpoint", "cursor": checkpoint, "exported": exported}))
+                    yield encode(lines)
+                    lines = []
+
+            if lines:
+                checkpoint = Pagination.encode_export_cursor(*position)
+                lines.append(dumps({"type": "checkpoint", "cursor": checkpoint, "exported": exported}))
+            lines.append(dumps({"type": "end", "exported": exported}))
+            yield encode(lines)
+        except Exception as e:
+            # El lote a medio leer se descarta: el cliente reanuda desde el último checkpoint emitido
+            print(f"Error durante la exportación: {e}")
+            yield encode([dumps({"type": "error", "error": str(e), "cursor": checkpoint, "exported": exported})])
+
+        if compressor is not None:
+            yield compressor.flush()
+
+    @staticmethod
+    def _chat_line(chat_id, chat: Dict) -> bytes:
+        return dumps({
+            "type": "chat",
+            "id": chat_id,
+            "datetime": chat.get("datetime"),
+            "summary": chat.get("summary"),
+            "metricas": chat.get("metricas")
+        })
+
+    @staticmethod
+    def _message_line(document: Dict) -> bytes:
+        return dumps({
+            "type": "message",
+            "id": document["_id"],
+            "chat_id": document["chat_id"],
+            "role": document.get("role"),
+            "content": document.get("content"),
+            "datetime": document.get("datetime"),
+            "truncated": document.get("truncated", False),
+            "metricas": document.get("metricas")
+        })
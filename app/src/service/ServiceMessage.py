@@ -1,9 +1,17 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 from bson import ObjectId
 from app.src.models.Message import Message
 from app.src.repository.RepositoryMessage import RepositoryMessage
 from app.src.repository.RepositoryChat import RepositoryChat
-from API.Gemini import Gemini
+from app.src.service.ServiceContexto import ServiceContexto
+from app.src.cache.HistoryCache import history_cache
+from app.src.cache.ResponseCache import response_cache
+from app.src.utils.Pagination import Pagination
+from app.src.utils.Metrics import observe_stream
+from app.src.utils.Tracing import span
+from API.ProviderRegistry import provider_registry
+from API.interface.ILLMApi import DeltaBuilder
+from API.RetrievalIndex import RETRIEVAL_ENABLED, retrieval_index
 import asyncio
 
 
@@ -11,85 +19,160 @@ class ServiceMessage:
     def __init__(self):
         self.message_repository = RepositoryMessage()
         self.chat_repository = RepositoryChat()
-        self.model = Gemini()
+        self.contexto = ServiceContexto("chat")
+    
+    @property
+    def model(self):
+        """Router de chat compartido (Gemini con respaldo en Mistral, se construye en el primer uso)"""
+        return provider_registry.get("chat")
     
     async def create_message_with_response_streaming(self, chat_id: str, content: str):
         """Crea un mensaje y genera respuesta en streaming, guardando en BD de forma asíncrona"""
+        # Span raíz del turno: enlaza la ruta, las consultas a MongoDB y el stream del LLM
+        with span("chat.turn", **{"chat.id": chat_id}) as turn_span:
+            try:
+                # Verificar que el chat existe y obtener el historial reciente (caché o BD)
+                chat, history = await self._get_chat_with_history(chat_id)
+                if not chat:
+                    raise ValueError("Chat no encontrado")
+                
+                # Encolar el mensaje del usuario (se inserta por lotes, fuera del camino de la petición)
+                user_message = Message(role="user", content=content, chat_id=ObjectId(chat_id))
+                created_user_message = await self.message_repository.enqueue_message(user_message)
+                history_cache.append(chat_id, created_user_message)
+                
+                # Preparar contexto acotado por presupuesto de tokens (+ resumen de turnos antiguos)
+                contexto, dropped = self.contexto.build_window(history, chat.summary)
+                
+                # Preguntas de primer turno repetidas se responden desde el caché. El primer
+                # turno se decide con el historial previo al mensaje recién encolado: un
+                # contexto vacío también puede ser un historial que no cupo en el presupuesto
+                first_turn = not history
+                cached_chunks = response_cache.get(content) if first_turn else None
+                if cached_chunks is not None:
+                    stream = self._replay_chunks(cached_chunks)
+                else:
+                    # Agregar solo los fragmentos relevantes del PDF/FAQ en lugar del documento completo
+                    pregunta = retrieval_index.augment_question(content) if RETRIEVAL_ENABLED else content
+                
+                    # Generar respuesta (deltas de texto asíncronos, no bloquea otros streams)
+                    stream = self.model.stream_respuesta(pregunta, contexto)
+                
+                # Preparar para recopilar la respuesta completa
+                complete_response = ""
+                chunks = []
+                
+                # Generar chunks y recopilar respuesta
+                try:
+                    with span("llm.stream") as llm_span:
+                        async for delta in stream:
+                            if delta.done:
+                                # TTFT, duración y tokens/s del proveedor que respondió (o del caché)
+                                observe_stream(delta)
+                                llm_span.set_attribute("llm.provider", delta.provider)
+                                llm_span.set_attribute("llm.time_to_first_token", delta.first_token or 0.0)
+                            elif delta.text:
+                                complete_response += delta.text
+                                chunks.append(delta.text)
+                                yield {
+                                    "content": delta.text,
+                                    "type": "content",
+                                    "user_message_id": str(created_user_message._id)
+                                }
+                except (asyncio.CancelledError, GeneratorExit):
+                    # El cliente se desconectó: se corta el stream del proveedor y se guarda lo recibido
+                    turn_span.set_attribute("chat.truncated", True)
+                    self._abandon_stream(chat_id, stream, complete_response)
+                    raise
+                
+                if cached_chunks is None and first_turn:
+                    response_cache.put(content, chunks)
+                
+                # Encolar la respuesta del asistente (escritura diferida, no bloquea el streaming)
+                await self._save_assistant_message_async(chat_id, complete_response)
+                
+                # Resumir en segundo plano los turnos que quedaron fuera de la ventana
+                self.contexto.schedule_summary(chat, history, dropped)
+                
+                # Señal de finalización
+                yield {
+                    "content": "",
+                    "type": "done",
+                    "user_message_id": str(created_user_message._id)
+                }
+                
+            except Exception as e:
+                turn_span.set_attribute("error", str(e))
+                yield {
+                    "error": str(e),
+                    "type": "error"
+                }
+    
+    @staticmethod
+    async def _replay_chunks(chunks: List[str]):
+        """Reproduce una respuesta en caché como deltas, con los mismos chunks que el modelo"""
+        builder = DeltaBuilder("cache")
+        for text in chunks:
+            yield builder.text(text)
+            # Cede el event loop entre chunks como lo haría un stream real
+            await asyncio.sleep(0)
+        yield builder.end()
+    
+    async def _get_chat_with_history(self, chat_id: str):
+        """Obtiene el chat y su historial reciente, usando el caché cuando es posible"""
+        cached = history_cache.get(chat_id)
+        if cached:
+            return cached
+        
+        chat = await self.chat_repository.get_chat_by_id(chat_id)
+        if not chat:
+            return None, []
+        # Solo el historial reciente que puede entrar en la ventana de contexto
+        await self.message_repository.flush_pending()
+        history = await self.contexto.get_recent_history(chat_id)
+        history_cache.put(chat_id, chat, history, self.contexto.max_messages)
+        return chat, history
+    
+    def _abandon_stream(self, chat_id: str, stream, partial: str):
+        """Cierra el stream del proveedor y guarda la respuesta parcial de un turno abandonado
+
+        Se llama con la tarea ya cancelada (o el generador cerrándose), donde
+        no se puede esperar nada: el mensaje se crea aquí para conservar su
+        lugar en el historial, y el cierre y la escritura van en otra tarea.
+        """
+        message = None
+        if partial:
+            message = Message(role="assistant", content=partial, chat_id=ObjectId(chat_id), truncated=True)
+            message._id = ObjectId()
+            history_cache.append(chat_id, message)
+        asyncio.create_task(self._close_abandoned_stream(stream, message))
+
+    async def _close_abandoned_stream(self, stream, message: Optional[Message]):
         try:
-            # Verificar que el chat existe
-            chat = self.chat_repository.get_chat_by_id(chat_id)
-            if not chat:
-                raise ValueError("Chat no encontrado")
-            
-            # Obtener historial de mensajes para contexto
-            history = self.message_repository.get_messages_by_chat_id(chat_id)
-            
-            # Crear el mensaje del usuario inmediatamente
-            user_message = Message(role="user", content=content, chat_id=ObjectId(chat_id))
-            created_user_message = self.message_repository.create_message(user_message)
-            
-            # Preparar contexto para el modelo
-            history_dict = []
-            for msg in history:
-                history_dict.append({
-                    "role": msg.role,
-                    "content": msg.content
-                })
-            
-            # Agregar el mensaje actual al contexto
-            history_dict.append({
-                "role": "user",
-                "content": content
-            })
-            
-            # Generar respuesta (streaming)
-            if len(history_dict) == 1:  # Primer mensaje
-                result = self.model.responder_pregunta(content)
-            else:
-                result = self.model.responder_pregunta_con_contexto(content, history_dict[:-1])
-            
-            # Preparar para recopilar la respuesta completa
-            complete_response = ""
-            
-            # Generar chunks y recopilar respuesta
-            for chunk in result:
-                if chunk.text:
-                    complete_response += chunk.text
-                    yield {
-                        "content": chunk.text,
-                        "type": "content",
-                        "user_message_id": str(created_user_message._id)
-                    }
-            
-            # Guardar respuesta del asistente de forma asíncrona (no bloquea el streaming)
-            asyncio.create_task(self._save_assistant_message_async(chat_id, complete_response))
-            
-            # Señal de finalización
-            yield {
-                "content": "",
-                "type": "done",
-                "user_message_id": str(created_user_message._id)
-            }
-            
+            # Si la cancelación llegó dentro del stream ya terminó; si no, se cierra aquí
+            await stream.aclose()
         except Exception as e:
-            yield {
-                "error": str(e),
-                "type": "error"
-            }
-    
+            print(f"Error al cerrar el stream del proveedor: {e}")
+        if message is not None:
+            try:
+                await self.message_repository.enqueue_message(message)
+            except Exception as e:
+                print(f"Error al guardar respuesta truncada: {e}")
+
     async def _save_assistant_message_async(self, chat_id: str, content: str):
-        """Guarda el mensaje del asistente de forma asíncrona"""
+        """Encola el mensaje del asistente en la escritura diferida"""
         try:
             assistant_message = Message(role="assistant", content=content, chat_id=ObjectId(chat_id))
-            self.message_repository.create_message(assistant_message)
+            created_message = await self.message_repository.enqueue_message(assistant_message)
+            history_cache.append(chat_id, created_message)
         except Exception as e:
             print(f"Error al guardar mensaje del asistente: {e}")
     
-    def create_message(self, chat_id: str, content: str) -> Dict:
-        """Crea un nuevo mensaje en un chat (versión síncrona para compatibilidad)"""
+    async def create_message(self, chat_id: str, content: str) -> Dict:
+        """Crea un nuevo mensaje en un chat sin generar respuesta del modelo"""
         try:
             # Verificar que el chat existe
-            chat = self.chat_repository.get_chat_by_id(chat_id)
+            chat = await self.chat_repository.get_chat_by_id(chat_id)
             if not chat:
                 return {
                     "success": False,
@@ -99,17 +182,12 @@ class ServiceMessage:
             
             # Crear el mensaje
             message = Message(role="user", content=content, chat_id=ObjectId(chat_id))
-            created_message = self.message_repository.create_message(message)
+            created_message = await self.message_repository.create_message(message)
+            history_cache.append(chat_id, created_message)
             
             return {
                 "success": True,
-                "data": {
-                    "id": str(created_message._id),
-                    "role": created_message.role,
-                    "content": created_message.content,
-                    "datetime": created_message.datetime.isoformat(),
-                    "chat_id": str(created_message.chat_id)
-                },
+                "data": created_message.to_response(),
                 "message": "Mensaje creado exitosamente"
             }
         except Exception as e:
@@ -119,10 +197,12 @@ class ServiceMessage:
                 "message": "No se pudo crear el mensaje"
             }
     
-    def get_message_by_id(self, message_id: str) -> Dict:
+    async def get_message_by_id(self, message_id: str) -> Dict:
         """Obtiene un mensaje por su ID"""
         try:
-            message = self.message_repository.get_message_by_id(message_id)
+            # Incluir los mensajes que aún están en la cola de escritura diferida
+            await self.message_repository.flush_pending()
+            message = await self.message_repository.get_message_by_id(message_id)
             
             if not message:
                 return {
@@ -133,13 +213,7 @@ class ServiceMessage:
             
             return {
                 "success": True,
-                "data": {
-                    "id": str(message._id),
-                    "role": message.role,
-                    "content": message.content,
-                    "datetime": message.datetime.isoformat(),
-                    "chat_id": str(message.chat_id)
-                }
+                "data": message.to_response()
             }
         except Exception as e:
             return {
@@ -148,11 +222,13 @@ class ServiceMessage:
                 "message": "No se pudo obtener el mensaje"
             }
     
-    def get_messages_by_chat_id(self, chat_id: str) -> Dict:
-        """Obtiene todos los mensajes de un chat"""
+    async def get_messages_by_chat_id(self, chat_id: str, limit: Optional[int] = None,
+                                      after: Optional[str] = None, before: Optional[str] = None) -> Dict:
+        """Obtiene una página de mensajes de un chat en orden cronológico"""
         try:
+            await self.message_repository.flush_pending()
             # Verificar que el chat existe
-            chat = self.chat_repository.get_chat_by_id(chat_id)
+            chat = await self.chat_repository.get_chat_by_id(chat_id)
             if not chat:
                 return {
                     "success": False,
@@ -160,23 +236,24 @@ class ServiceMessage:
                     "message": "El chat especificado no existe"
                 }
             
-            messages = self.message_repository.get_messages_by_chat_id(chat_id)
-            
-            messages_data = []
-            for message in messages:
-                messages_data.append({
-                    "id": str(message._id),
-                    "role": message.role,
-                    "content": message.content,
-                    "datetime": message.datetime.isoformat(),
-                    "chat_id": str(message.chat_id)
-                })
+            # De documento de MongoDB a respuesta en una sola pasada, sin instanciar Message
+            documents, has_more = await self.message_repository.get_messages_page_documents(
+                chat_id, Pagination.clamp_limit(limit), after, before, Message.RESPONSE_PROJECTION
+            )
+            messages_data = [Message.response_from_document(document) for document in documents]
             
             return {
                 "success": True,
                 "data": messages_data,
                 "total": len(messages_data),
-                "chat_id": chat_id
+                "chat_id": chat_id,
+                **Pagination.page_cursors(documents, has_more, after, before)
+            }
+        except ValueError as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "message": "Parámetros de paginación inválidos"
             }
         except Exception as e:
             return {
@@ -186,10 +263,10 @@ class ServiceMessage:
             }
     
     
-    def get_chat_conversation_context(self, chat_id: str) -> List[Dict]:
+    async def get_chat_conversation_context(self, chat_id: str) -> List[Dict]:
         """Obtiene el contexto de conversación para las APIs de LLM"""
         try:
-            messages = self.message_repository.get_messages_by_chat_id(chat_id)
+            messages = await self.message_repository.get_messages_by_chat_id(chat_id)
             context = []
             
             for message in messages:
@@ -1,91 +1,186 @@
-from typing import Dict
+from typing import Dict, List, Optional
 from app.src.repository.RepositoryMessage import RepositoryMessage
 from app.src.repository.RepositoryChat import RepositoryChat
-from API.Mistral import MistralAPI
+from app.src.utils.Metrics import LLM_REQUEST_LATENCY, METRICAS_ANALYSIS_LATENCY
+from app.src.utils.Tracing import span
+from API.ProviderRegistry import provider_registry
+from API.RetrievalIndex import RETRIEVAL_ENABLED, retrieval_index
+import ast
+import asyncio
+import os
 import re
 import json
 
 
 class ServiceMetricas:
+    DEFAULT_BATCH_SIZE = 20
+    
     def __init__(self):
         self.message_repository = RepositoryMessage()
         self.chat_repository = RepositoryChat()
-        self.model = MistralAPI()
+        # Máximo de peticiones simultáneas a Mistral y tamaño de lote (0 = un mensaje por petición)
+        self.concurrency = int(os.getenv("METRICAS_CONCURRENCY", "8"))
+        self.batch_size = int(os.getenv("METRICAS_BATCH_SIZE", "0"))
+        self._semaphore = asyncio.Semaphore(self.concurrency)
     
-    def create_analisis(self, chat_id):
-        messages = self._get_messages_by_chat_id(chat_id)
-        respuesta = []
-        satisfacion_list = []
-        precision_list = []
+    @property
+    def model(self):
+        """Cliente Mistral compartido (se construye en el primer uso)"""
+        return provider_registry.get("mistral")
+    
+    async def create_analisis(self, chat_id, batch: Optional[bool] = None):
+        """Evalúa solo los mensajes nuevos del chat y retorna las métricas acumuladas"""
+        with span("metricas.analisis", **{"chat.id": str(chat_id)}), METRICAS_ANALYSIS_LATENCY.time():
+            return await self._create_analisis(chat_id, batch)
+    
+    async def _create_analisis(self, chat_id, batch: Optional[bool] = None):
+        chat = await self.chat_repository.get_chat_by_id(chat_id)
+        if not chat:
+            return {
+                "success": False,
+                "error": "Chat no encontrado",
+                "message": "El chat especificado no existe"
+            }
         
-        for i in range(len(messages["data"])):
-            response = self.model.responder_pregunta(f"Escrito por {messages['data'][i]['role']}: "+messages["data"][i]["content"])
-            # Usar expresión regular para extraer diccionarios del string
-            pattern = r'\{[^{}]*\}'
-            matches = re.findall(pattern, response)
-            
-            for match in matches:
-                try:
-                    # Convertir el string a diccionario
-                    dict_data = json.loads(match)
-                    respuesta.append(dict_data)
-                except json.JSONDecodeError:
-                    # Si no se puede parsear como JSON, intentar con eval (menos seguro)
-                    try:
-                        dict_data = eval(match)
-                        respuesta.append(dict_data)
-                    except:
-                        continue
+        # Mensajes agregados desde el último análisis
+        await self.message_repository.flush_pending()
+        pending = await self.message_repository.get_unscored_messages(chat_id)
+        pending_data = [{"role": message.role, "content": message.content} for message in pending]
         
-        # Procesar las respuestas para extraer satisfacción y precisión
-        for resp in respuesta:
-            if "satisfacion" in resp:
-                satisfacion_list.append(resp["satisfacion"])
-            if "precision" in resp:
-                precision_list.append(resp["precision"])
+        # Evaluación concurrente (o por lotes) en lugar de una petición serial por mensaje
+        use_batch = self.batch_size > 0 if batch is None else batch
+        if use_batch:
+            scores = await self._analizar_lotes(pending_data)
+        else:
+            scores = await self._analizar_concurrente(pending_data)
         
-        # Calcular promedios
-        satisfacion_promedio = sum(satisfacion_list) / len(satisfacion_list) if satisfacion_list else 0
-        precision_promedio = sum(precision_list) / len(precision_list) if precision_list else 0
+        # Persistir los puntajes por mensaje; una respuesta sin puntaje se guarda como {} para
+        # no volver a enviar el mensaje al modelo en cada análisis. Si el proveedor falló
+        # (None) el mensaje queda sin métricas y se reintenta en el próximo análisis
+        scored = [(message._id, score) for message, score in zip(pending, scores) if score is not None]
+        if scored:
+            await self.message_repository.set_metrics_many(scored)
+        
+        stored = await self.message_repository.get_metrics_by_chat_id(chat_id)
+        
+        satisfacion_list = [resp["satisfacion"] for resp in stored if "satisfacion" in resp]
+        precision_list = [resp["precision"] for resp in stored if "precision" in resp]
+        
+        # Agregados del chat recalculados desde los puntajes guardados: si un análisis anterior
+        # se cortó entre la escritura de los mensajes y la del chat, aquí se corrigen
+        aggregates = self._sumar(stored)
+        if aggregates != await self.chat_repository.get_metrics(chat_id):
+            await self.chat_repository.set_metrics(chat_id, aggregates)
+        
+        # Promedios a partir de los agregados
+        satisfacion_count = aggregates.get("satisfacion_count", 0)
+        precision_count = aggregates.get("precision_count", 0)
+        satisfacion_promedio = aggregates.get("satisfacion_sum", 0) / satisfacion_count if satisfacion_count else 0
+        precision_promedio = aggregates.get("precision_sum", 0) / precision_count if precision_count else 0
         
         # Retornar resultado organizado
         return {
             "satisfacion": satisfacion_list,
             "precision": precision_list,
             "satisfacion_promedio": satisfacion_promedio,
-            "precision_promedio": precision_promedio
+            "precision_promedio": precision_promedio,
+            "nuevos_analizados": len(scored),
+            "pendientes": len(pending) - len(scored)
         }
-    def _get_messages_by_chat_id(self, chat_id: str) -> Dict:
-        """Obtiene todos los mensajes de un chat"""
+    
+    @staticmethod
+    def _sumar(scores: List[Dict]) -> Dict:
+        """Sumas y conteos de los puntajes para los agregados del chat"""
+        increments = {}
+        for key in ("satisfacion", "precision"):
+            values = [score[key] for score in scores if key in score]
+            if values:
+                increments[f"{key}_sum"] = sum(values)
+                increments[f"{key}_count"] = len(values)
+        return increments
+    
+    async def _analizar_concurrente(self, messages: List[Dict]) -> List[Optional[Dict]]:
+        """Evalúa cada mensaje con peticiones concurrentes acotadas por un semáforo"""
+        return list(await asyncio.gather(*(self._analizar_mensaje(message) for message in messages)))
+    
+    async def _analizar_mensaje(self, message: Dict) -> Optional[Dict]:
+        """Evalúa un mensaje y retorna sus métricas
+
+        {} si el modelo respondió sin un puntaje válido; None si el proveedor
+        falló (429, timeout, red), para reintentarlo en el próximo análisis.
+        """
+        pregunta = f"Escrito por {message['role']}: " + message["content"]
+        if RETRIEVAL_ENABLED and message["role"] != "user":
+            # La precisión se evalúa contra los fragmentos relevantes de la documentación
+            pregunta = f"REFERENCIA:\n{retrieval_index.build_context(message['content'])}\n\nMENSAJE:\n{pregunta}"
         try:
-            # Verificar que el chat existe
-            chat = self.chat_repository.get_chat_by_id(chat_id)
-            if not chat:
-                return {
-                    "success": False,
-                    "error": "Chat no encontrado",
-                    "message": "El chat especificado no existe"
-                }
-            
-            messages = self.message_repository.get_messages_by_chat_id(chat_id)
-            
-            messages_data = []
-            for message in messages:
-                messages_data.append({
-                    "role": message.role,
-                    "content": message.content,
-                })
-            
-            return {
-                "success": True,
-                "data": messages_data,
-                "total": len(messages_data),
-                "chat_id": chat_id
-            }
+            async with self._semaphore:
+                with LLM_REQUEST_LATENCY.time("mistral", "analisis"):
+                    response = await self.model.responder_pregunta_async(pregunta)
         except Exception as e:
-            return {
-                "success": False,
-                "error": f"Error al obtener mensajes: {str(e)}",
-                "message": "No se pudieron obtener los mensajes"
-            }
-    
\ No newline at end of file
+            print(f"Error del proveedor al analizar un mensaje: {e}")
+            return None
+        score = {}
+        for dict_data in self._parse_response(response):
+            score.update({key: dict_data[key] for key in ("satisfacion", "precision") if key in dict_data})
+        return score
+    
+    async def _analizar_lotes(self, messages: List[Dict]) -> List[Optional[Dict]]:
+        """Evalúa los mensajes en lotes (una petición por lote) con salida JSON"""
+        size = self.batch_size or self.DEFAULT_BATCH_SIZE
+        batches = [messages[i:i + size] for i in range(0, len(messages), size)]
+        results = await asyncio.gather(*(self._analizar_lote(batch) for batch in batches))
+        return [score for result in results for score in result]
+    
+    async def _analizar_lote(self, batch: List[Dict]) -> List[Optional[Dict]]:
+        """Evalúa un lote; si la respuesta no es válida, evalúa sus mensajes uno a uno
+
+        Si el proveedor falla, todo el lote queda en None (se reintenta en el
+        próximo análisis) sin repetir la petición mensaje a mensaje.
+        """
+        referencia = None
+        if RETRIEVAL_ENABLED:
+            referencia = retrieval_index.build_context(
+                " ".join(message["content"] for message in batch if message["role"] != "user")
+            )
+        try:
+            async with self._semaphore:
+                with LLM_REQUEST_LATENCY.time("mistral", "analisis_lote"):
+                    response = await self.model.analizar_lote_async(batch, referencia)
+        except Exception as e:
+            print(f"Error del proveedor al analizar un lote: {e}")
+            return [None] * len(batch)
+        try:
+            resultados = json.loads(response)["resultados"]
+            by_index = {int(item["indice"]): item for item in resultados}
+            if len(by_index) != len(batch):
+                raise ValueError("Respuesta incompleta")
+            respuesta = []
+            for indice in range(len(batch)):
+                item = by_index[indice]
+                respuesta.append({key: item[key] for key in ("satisfacion", "precision") if key in item})
+            return respuesta
+        except (ValueError, KeyError, TypeError):
+            return await self._analizar_concurrente(batch)
+    
+    def _parse_response(self, response: str) -> List[Dict]:
+        """Extrae los diccionarios de métricas de la respuesta del modelo"""
+        respuesta = []
+        # Usar expresión regular para extraer diccionarios del string
+        pattern = r'\{[^{}]*\}'
+        matches = re.findall(pattern, response)
+        
+        for match in matches:
+            try:
+                # Convertir el string a diccionario
+                dict_data = json.loads(match)
+                respuesta.append(dict_data)
+            except json.JSONDecodeError:
+                # Si no es JSON válido, intentar como literal de Python (comillas simples); nunca eval
+                try:
+                    dict_data = ast.literal_eval(match)
+                except (ValueError, SyntaxError):
+                    continue
+                if isinstance(dict_data, dict):
+                    respuesta.append(dict_data)
+        return respuesta
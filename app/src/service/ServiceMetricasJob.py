@@ -0,0 +1,276 @@
+import os
+import uuid
+import socket
+import asyncio
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from bson import ObjectId
+from app.src.models.MetricasJob import MetricasJob
+from app.src.repository.RepositoryChat import RepositoryChat
+from app.src.repository.RepositoryMetricasJob import RepositoryMetricasJob
+from app.src.service.ServiceMetricas import ServiceMetricas
+from app.src.utils.Pagination import Pagination
+
+
+class _JobProgress:
+    """Avance de un trabajo: calcula el checkpoint aunque los chats terminen en desorden
+
+    El checkpoint solo avanza hasta el último chat tal que todos los
+    anteriores ya terminaron; los agregados de un chat se entregan junto con
+    ese avance, así al retomar desde el checkpoint ningún chat se cuenta dos veces.
+    """
+
+    def __init__(self):
+        self._in_flight: "OrderedDict[ObjectId, list]" = OrderedDict()
+        self.checkpoint: Optional[str] = None
+        self.increments: Dict = {}
+        self.last_error: Optional[str] = None
+        self.stopped = False
+
+    def start(self, chat: Dict):
+        self._in_flight[chat["_id"]] = [Pagination.encode_cursor(chat["datetime"], chat["_id"]), None]
+
+    def done(self, chat_id: ObjectId, increments: Dict):
+        self._in_flight[chat_id][1] = increments
+        while self._in_flight:
+            cursor, chat_increments = next(iter(self._in_flight.values()))
+            if chat_increments is None:
+                break
+            self._in_flight.popitem(last=False)
+            self.checkpoint = cursor
+            self._merge(chat_increments)
+
+    def _merge(self, increments: Dict):
+        for key, value in increments.items():
+            self.increments[key] = self.increments.get(key, 0) + value
+
+    def take(self) -> Tuple[Optional[str], Dict, Optional[str]]:
+        """Entrega lo acumulado desde el último guardado"""
+        taken = (self.checkpoint, self.increments, self.last_error)
+        self.checkpoint, self.increments, self.last_error = None, {}, None
+        return taken
+
+    def give_back(self, checkpoint: Optional[str], increments: Dict, last_error: Optional[str]):
+        """Devuelve lo que no se pudo guardar para el próximo intento"""
+        self.checkpoint = self.checkpoint or checkpoint
+        self.last_error = self.last_error or last_error
+        self._merge(increments)
+
+
+class ServiceMetricasJob:
+    """Trabajos de análisis de métricas sobre muchos chats en segundo plano
+
+    Cada trabajo recorre los chats de un rango de fechas (o todos) y los
+    reparte entre METRICAS_JOB_WORKERS workers que usan ServiceMetricas
+    (incremental: solo evalúa mensajes nuevos). Las peticiones a Mistral pasan
+    por el mismo límite del proveedor que el resto de la aplicación
+    (MISTRAL_RPM/TPM, compartido entre procesos). El avance se guarda en MongoDB cada
+    METRICAS_JOB_CHECKPOINT_INTERVAL segundos junto con una reserva
+    (lease); si el proceso se cae, otro la retoma desde el checkpoint al arrancar.
+    """
+
+    def __init__(self):
+        self.job_repository = RepositoryMetricasJob()
+        self.chat_repository = RepositoryChat()
+        self.workers = int(os.getenv("METRICAS_JOB_WORKERS", "4"))
+        self.checkpoint_interval = float(os.getenv("METRICAS_JOB_CHECKPOINT_INTERVAL", "2"))
+        self.lease = float(os.getenv("METRICAS_JOB_LEASE", "30"))
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._metricas: Optional[ServiceMetricas] = None
+        self._tasks: Dict[ObjectId, asyncio.Task] = {}
+
+    @property
+    def metricas(self) -> ServiceMetricas:
+        """ServiceMetricas compartido por los trabajos (mismo semáforo de concurrencia)"""
+        if self._metricas is None:
+            self._metricas = ServiceMetricas()
+        return self._metricas
+
+    async def create_job(self, since: Optional[datetime] = None, until: Optional[datetime] = None):
+        """Crea un trabajo sobre los chats creados en [since, until) y lo inicia en segundo plano"""
+        if since and until and since >= until:
+            return {
+                "success": False,
+                "error": "Rango de fechas inválido",
+                "message": "'since' debe ser anterior a 'until'"
+            }
+        try:
+            job = MetricasJob(since, until)
+            job.owner = self.owner
+            job.lease_until = datetime.now() + timedelta(seconds=self.lease)
+            job.total = await self.chat_repository.count_chats(since, until)
+            job = await self.job_repository.create_job(job)
+            self._start(job)
+            return {
+                "success": True,
+                "data": job.to_response(),
+                "message": "Trabajo de métricas iniciado"
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "message": "Error al crear el trabajo de métricas"
+            }
+
+    async def get_job(self, job_id: str):
+        """Estado y avance de un trabajo"""
+        job = await self.job_repository.get_job(job_id)
+        if not job:
+            return {
+                "success": False,
+                "error": "Trabajo no encontrado",
+                "message": "El trabajo especificado no existe"
+            }
+        return {"success": True, "data": job.to_response()}
+
+    async def get_aggregates(self, job_id: str):
+        """Promedios acumulados hasta el último checkpoint del trabajo"""
+        job = await self.job_repository.get_job(job_id)
+        if not job:
+            return {
+                "success": False,
+                "error": "Trabajo no encontrado",
+                "message": "El trabajo especificado no existe"
+            }
+        return {"success": True, "data": job.aggregates_response()}
+
+    async def cancel_job(self, job_id: str):
+        """Cancela un trabajo en curso (se detiene en su próximo checkpoint, en cualquier proceso)"""
+        if not await self.job_repository.cancel_job(job_id):
+            return {
+                "success": False,
+                "error": "Trabajo no encontrado o ya terminado",
+                "message": "Solo se pueden cancelar trabajos en curso"
+            }
+        job = await self.job_repository.get_job(job_id)
+        return {
+            "success": True,
+            "data": job.to_response() if job else None,
+            "message": "Trabajo de métricas cancelado"
+        }
+
+    async def resume_orphans(self) -> int:
+        """Retoma los trabajos en curso cuya reserva venció (al arrancar la aplicación)"""
+        resumed = 0
+        for job_id in await self.job_repository.get_orphan_job_ids():
+            job = await self.job_repository.claim_job(job_id, self.owner, self.lease)
+            if job:
+                self._start(job)
+                resumed += 1
+        if resumed:
+            print(f"Trabajos de métricas retomados: {resumed}")
+        return resumed
+
+    async def close(self):
+        """Detiene los trabajos del proceso guardando su avance (otro proceso o el reinicio los retoma)"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def get_stats(self) -> Dict:
+        """Trabajos en ejecución en este proceso"""
+        return {
+            "running": len(self._tasks),
+            "workers": self.workers
+        }
+
+    def _start(self, job: MetricasJob):
+        task = asyncio.create_task(self._run(job))
+        self._tasks[job._id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job._id, None))
+
+    async def _run(self, job: MetricasJob):
+        progress = _JobProgress()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.workers * 2)
+        workers = [asyncio.create_task(self._worker(queue, progress)) for _ in range(self.workers)]
+        saver = asyncio.create_task(self._save_loop(job, progress))
+        status, error = None, None
+        try:
+            cursor = self.chat_repository.iter_chats_in_range(job.since, job.until, job.checkpoint)
+            async for chat in cursor:
+                if progress.stopped:
+                    break
+                progress.start(chat)
+                await queue.put(chat)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+            if not progress.stopped:
+                status = "completed"
+        except asyncio.CancelledError:
+            # Apagado de la aplicación: los chats a medio analizar quedan después del checkpoint
+            pass
+        except Exception as e:
+            print(f"Error en el trabajo de métricas {job._id}: {e}")
+            status, error = "failed", str(e)
+        finally:
+            saver.cancel()
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(saver, *workers, return_exceptions=True)
+            if not progress.stopped and await self._save(job, progress):
+                if status:
+                    await self.job_repository.finish_job(job._id, self.owner, status, error)
+                else:
+                    await self.job_repository.release_job(job._id, self.owner)
+
+    async def _worker(self, queue: asyncio.Queue, progress: _JobProgress):
+        while True:
+            chat = await queue.get()
+            if chat is None:
+                return
+            if progress.stopped:
+                continue
+            increments = {"processed": 1}
+            try:
+                result = await self.metricas.create_analisis(str(chat["_id"]))
+                if result.get("success") is False:
+                    increments["failed"] = 1
+                    progress.last_error = result.get("error")
+                else:
+                    increments.update(self._increments(result))
+                    if result.get("pendientes"):
+                        # Quedan sin métricas: los evalúa el próximo análisis de ese chat
+                        progress.last_error = f"{result['pendientes']} mensajes sin evaluar por error del proveedor"
+            except Exception as e:
+                print(f"Error al analizar el chat {chat['_id']}: {e}")
+                increments["failed"] = 1
+                progress.last_error = str(e)
+            progress.done(chat["_id"], increments)
+
+    @staticmethod
+    def _increments(result: Dict) -> Dict:
+        """Aporte de un chat a los agregados del trabajo"""
+        return {
+            "aggregates.nuevos_analizados": result.get("nuevos_analizados", 0),
+            "aggregates.satisfacion_sum": sum(result.get("satisfacion", [])),
+            "aggregates.satisfacion_count": len(result.get("satisfacion", [])),
+            "aggregates.precision_sum": sum(result.get("precision", [])),
+            "aggregates.precision_count": len(result.get("precision", []))
+        }
+
+    async def _save_loop(self, job: MetricasJob, progress: _JobProgress):
+        while True:
+            await asyncio.sleep(self.checkpoint_interval)
+            if not await self._save(job, progress):
+                # Cancelado o tomado por otro proceso tras vencer la reserva
+                progress.stopped = True
+                return
+
+    async def _save(self, job: MetricasJob, progress: _JobProgress) -> bool:
+        """Guarda el avance y renueva la reserva; False si el trabajo ya no es de este proceso"""
+        checkpoint, increments, last_error = progress.take()
+        try:
+            return await self.job_repository.save_progress(job._id, self.owner, self.lease,
+                                                           checkpoint, increments, last_error)
+        except Exception as e:
+            print(f"Error al guardar el avance del trabajo de métricas {job._id}: {e}")
+            progress.give_back(checkpoint, increments, last_error)
+            return True
+
+
+# Instancia global: la comparten el controlador y el ciclo de vida de la aplicación
+metricas_jobs = ServiceMetricasJob()
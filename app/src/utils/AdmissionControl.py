@@ -0,0 +1,197 @@
+import os
+import math
+import time
+import asyncio
+from collections import deque
+from typing import Deque, Dict, Optional
+
+
+class AdmissionRejected(Exception):
+    """Petición rechazada por sobrecarga (503) o por otro turno en curso en el mismo chat (429)"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class _ChatSlot:
+    """Lock de un chat y cuántas peticiones lo usan (se elimina al quedar libre)"""
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class AdmissionTicket:
+    """Cupo concedido: se libera una sola vez al terminar la respuesta (aunque se llame varias)"""
+    __slots__ = ("_controller", "chat_id", "started", "_released")
+
+    def __init__(self, controller: "AdmissionController", chat_id: Optional[str]):
+        self._controller = controller
+        self.chat_id = chat_id
+        self.started = time.perf_counter()
+        self._released = False
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        self._controller._release(self)
+
+
+class AdmissionController:
+    """Control de admisión para endpoints que llaman al LLM
+
+    - Tope global de peticiones en curso (ADMISSION_<NOMBRE>_MAX_CONCURRENT).
+    - Cola FIFO acotada (ADMISSION_<NOMBRE>_MAX_QUEUE): si la espera estimada
+      supera el plazo (ADMISSION_<NOMBRE>_QUEUE_TIMEOUT) la petición se descarta
+      de inmediato, y la que se queda sin plazo en la cola también; ambas con 503.
+    - Un turno a la vez por chat: los envíos dobles esperan al anterior (y ven
+      su respuesta en el historial); si ya hay uno esperando se responde 429.
+
+    Los rechazos llevan Retry-After estimado con la duración media de los cupos.
+    """
+
+    def __init__(self, name: str, max_concurrent: int = 32, max_queue: int = 64,
+                 queue_timeout: float = 10.0, max_chat_waiting: int = 1):
+        prefix = f"ADMISSION_{name.upper()}_"
+        self.name = name
+        self.max_concurrent = int(os.getenv(prefix + "MAX_CONCURRENT", str(max_concurrent)))
+        self.max_queue = int(os.getenv(prefix + "MAX_QUEUE", str(max_queue)))
+        self.queue_timeout = float(os.getenv(prefix + "QUEUE_TIMEOUT", str(queue_timeout)))
+        self.max_chat_waiting = int(os.getenv(prefix + "CHAT_QUEUE", str(max_chat_waiting)))
+        self.alpha = 0.2
+        self.active = 0
+        self.avg_hold: Optional[float] = None
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._chats: Dict[str, _ChatSlot] = {}
+        self.admitted = 0
+        self.rejected_chat_busy = 0
+        self.shed_queue_full = 0
+        self.shed_deadline = 0
+
+    def _estimated_wait(self, position: int) -> float:
+        """Segundos hasta que se libere un cupo para quien quede en `position` de la cola"""
+        hold = self.avg_hold if self.avg_hold is not None else 1.0
+        return hold * position / max(self.max_concurrent, 1)
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self._estimated_wait(len(self._waiters) + 1)))
+
+    async def acquire(self, chat_id: Optional[str] = None) -> AdmissionTicket:
+        """Espera turno en el chat y un cupo global; lanza AdmissionRejected si no hay a tiempo"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.queue_timeout
+        slot = None
+        if chat_id is not None:
+            slot = await self._lock_chat(chat_id, deadline)
+        try:
+            await self._acquire_slot(deadline)
+        except BaseException:
+            if slot is not None:
+                self._unlock_chat(chat_id)
+            raise
+        self.admitted += 1
+        return AdmissionTicket(self, chat_id)
+
+    async def _lock_chat(self, chat_id: str, deadline: float) -> _ChatSlot:
+        slot = self._chats.get(chat_id)
+        if slot is None:
+            slot = self._chats[chat_id] = _ChatSlot()
+        # users cuenta el turno en curso más los que esperan detrás (aunque aún no tomaran el lock)
+        if slot.users - 1 >= self.max_chat_waiting:
+            self.rejected_chat_busy += 1
+            raise AdmissionRejected(429, "Ya hay un turno en curso en este chat", self._chat_retry_after())
+        slot.users += 1
+        if slot.users == 1:
+            # Chat libre: el lock se toma sin ceder el event loop
+            await slot.lock.acquire()
+            return slot
+        try:
+            await asyncio.wait_for(slot.lock.acquire(), max(deadline - asyncio.get_running_loop().time(), 0))
+        except asyncio.TimeoutError:
+            self._drop_chat_user(chat_id, slot)
+            self.rejected_chat_busy += 1
+            raise AdmissionRejected(429, "El turno anterior de este chat no terminó a tiempo", self._chat_retry_after())
+        except BaseException:
+            self._drop_chat_user(chat_id, slot)
+            raise
+        return slot
+
+    def _chat_retry_after(self) -> int:
+        return max(1, math.ceil(self.avg_hold if self.avg_hold is not None else 1.0))
+
+    def _drop_chat_user(self, chat_id: str, slot: _ChatSlot):
+        slot.users -= 1
+        if slot.users == 0 and self._chats.get(chat_id) is slot:
+            del self._chats[chat_id]
+
+    def _unlock_chat(self, chat_id: str):
+        slot = self._chats[chat_id]
+        slot.lock.release()
+        self._drop_chat_user(chat_id, slot)
+
+    async def _acquire_slot(self, deadline: float):
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            return
+        loop = asyncio.get_running_loop()
+        if len(self._waiters) >= self.max_queue:
+            self.shed_queue_full += 1
+            raise AdmissionRejected(503, "Servicio saturado, intente más tarde", self._retry_after())
+        # Descartar ya si la espera estimada no entra en el plazo (no ocupar la cola para nada)
+        if self.avg_hold is not None and self._estimated_wait(len(self._waiters) + 1) > deadline - loop.time():
+            self.shed_deadline += 1
+            raise AdmissionRejected(503, "Servicio saturado, intente más tarde", self._retry_after())
+
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), max(deadline - loop.time(), 0))
+        except BaseException as e:
+            if waiter.done():
+                # El cupo llegó justo al vencer el plazo o al cancelarse: se devuelve
+                self._release_slot()
+            else:
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.shed_deadline += 1
+                raise AdmissionRejected(503, "Tiempo de espera agotado en la cola, intente más tarde",
+                                        self._retry_after())
+            raise
+
+    def _release_slot(self):
+        """Entrega el cupo al siguiente en la cola que siga esperando, o lo libera"""
+        if self._waiters:
+            self._waiters.popleft().set_result(None)
+            return
+        self.active -= 1
+
+    def _release(self, ticket: AdmissionTicket):
+        hold = time.perf_counter() - ticket.started
+        self.avg_hold = hold if self.avg_hold is None else self.alpha * hold + (1 - self.alpha) * self.avg_hold
+        self._release_slot()
+        if ticket.chat_id is not None:
+            self._unlock_chat(ticket.chat_id)
+
+    def get_stats(self) -> Dict:
+        """Estado para /health"""
+        return {
+            "active": self.active,
+            "max_concurrent": self.max_concurrent,
+            "queued": len(self._waiters),
+            "max_queue": self.max_queue,
+            "avg_hold_s": round(self.avg_hold, 3) if self.avg_hold is not None else None,
+            "admitted": self.admitted,
+            "rejected_chat_busy": self.rejected_chat_busy,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_deadline": self.shed_deadline
+        }
+
+
+# Turnos de chat (stream al LLM) y análisis de métricas
+chat_admission = AdmissionController("chat", max_concurrent=32, max_queue=64, queue_timeout=10.0)
+metricas_admission = AdmissionController("metricas", max_concurrent=4, max_queue=16, queue_timeout=30.0)
@@ -0,0 +1,199 @@
+import os
+import time
+import inspect
+import functools
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+from app.src.utils.Tracing import span, tracer
+
+# Con METRICS_ENABLED=false no se instrumentan repositorios ni rutas (sin costo alguno)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_RATE_BUCKETS = (1, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class _Series:
+    __slots__ = ("counts", "total")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.total = 0.0
+
+
+class _Timer:
+    """Context manager que observa la duración del bloque (también alrededor de un await)"""
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: "Histogram", labels: Tuple):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+
+class Histogram:
+    """Histograma con buckets fijos por combinación de etiquetas
+
+    observe() solo busca el bucket e incrementa contadores: sin locks, ya
+    que todo corre en el event loop. Los acumulados que exige el formato
+    de Prometheus se calculan al exponer.
+    """
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple, _Series] = {}
+
+    def observe(self, value: float, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = _Series(len(self.buckets) + 1)
+        series.counts[bisect_left(self.buckets, value)] += 1
+        series.total += value
+
+    def time(self, *labels) -> _Timer:
+        return _Timer(self, labels)
+
+    @staticmethod
+    def _escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in list(self._series.items()):
+            base = ",".join(f'{name}="{self._escape(value)}"' for name, value in zip(self.labelnames, labels))
+            prefix = f"{base}," if base else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, series.counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            cumulative += series.counts[-1]
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {cumulative}')
+            suffix = f"{{{base}}}" if base else ""
+            lines.append(f"{self.name}_sum{suffix} {series.total}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Histogramas de la aplicación expuestos en /metrics (formato de texto de Prometheus)"""
+
+    def __init__(self):
+        self.enabled = METRICS_ENABLED
+        self._histograms: Dict[str, Histogram] = {}
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple = LATENCY_BUCKETS) -> Histogram:
+        if name not in self._histograms:
+            self._histograms[name] = Histogram(name, help, labelnames, buckets)
+        return self._histograms[name]
+
+    def render(self) -> bytes:
+        lines = []
+        for histogram in self._histograms.values():
+            lines.extend(histogram.render())
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+# Registro global y métricas de las etapas de un turno de chat
+metrics = MetricsRegistry()
+HTTP_LATENCY = metrics.histogram("http_request_duration_seconds",
+                                 "Duración de las peticiones HTTP (incluye el stream completo)",
+                                 ("method", "route", "status"))
+REPOSITORY_LATENCY = metrics.histogram("repository_operation_seconds",
+                                       "Duración de los métodos de repositorio", ("repository", "method"))
+DB_BATCH_LATENCY = metrics.histogram("db_batch_write_seconds",
+                                     "Duración de los insert_many de la escritura diferida", ("collection",))
+LLM_TTFT = metrics.histogram("llm_time_to_first_token_seconds",
+                             "Tiempo al primer token de las respuestas en streaming", ("provider",))
+LLM_STREAM_DURATION = metrics.histogram("llm_stream_duration_seconds",
+                                        "Duración total de las respuestas en streaming", ("provider",))
+LLM_TOKEN_RATE = metrics.histogram("llm_tokens_per_second",
+                                   "Tokens por segundo después del primer token", ("provider",),
+                                   buckets=TOKEN_RATE_BUCKETS)
+LLM_REQUEST_LATENCY = metrics.histogram("llm_request_duration_seconds",
+                                        "Duración de las peticiones LLM sin streaming", ("provider", "operation"))
+LLM_RATE_LIMIT_WAIT = metrics.histogram("llm_rate_limit_wait_seconds",
+                                        "Espera impuesta por el límite de peticiones y tokens del proveedor",
+                                        ("provider",))
+METRICAS_ANALYSIS_LATENCY = metrics.histogram("metricas_analysis_seconds",
+                                              "Duración del análisis de métricas de un chat")
+
+
+def observe_stream(delta):
+    """Registra TTFT, duración y tokens/s a partir del delta final (done) de un stream"""
+    provider = delta.provider
+    if delta.first_token is not None:
+        LLM_TTFT.observe(delta.first_token, provider)
+    LLM_STREAM_DURATION.observe(delta.elapsed, provider)
+    # Sin uso informado por el proveedor se aproxima con la cantidad de deltas
+    tokens = delta.usage.completion_tokens if delta.usage and delta.usage.completion_tokens else delta.index
+    generating = delta.elapsed - (delta.first_token or 0.0)
+    if tokens and generating > 0:
+        LLM_TOKEN_RATE.observe(tokens / generating, provider)
+
+
+def instrumented(cls):
+    """Decorador de clase: mide (y traza, si está activo) cada método async público del repositorio"""
+    if not metrics.enabled and tracer is None:
+        return cls
+    for name, method in list(vars(cls).items()):
+        if name.startswith("_") or not inspect.iscoroutinefunction(method):
+            continue
+        setattr(cls, name, _timed(method, cls.__name__, name))
+    return cls
+
+
+def _timed(method, repository: str, name: str):
+    labels = (repository, name)
+    span_name = f"{repository}.{name}"
+
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        with span(span_name):
+            start = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                REPOSITORY_LATENCY.observe(time.perf_counter() - start, *labels)
+    return wrapper
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: latencia por ruta (plantilla, no la URL) y span raíz de cada petición"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        with span(f"{scope['method']} {scope['path']}", **{"http.method": scope["method"]}) as request_span:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                # El router deja la ruta resuelta en el scope
+                route = getattr(scope.get("route"), "path", None) or "unmatched"
+                HTTP_LATENCY.observe(time.perf_counter() - start, scope["method"], route, status["code"])
+                request_span.update_name(f"{scope['method']} {route}")
+                request_span.set_attribute("http.route", route)
+                request_span.set_attribute("http.status_code", status["code"])
@@ -0,0 +1,107 @@
+import base64
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+
+class Pagination:
+    """Paginación keyset sobre (datetime, _id) con cursores opacos"""
+    DEFAULT_LIMIT = 50
+    MAX_LIMIT = 200
+    
+    @staticmethod
+    def encode_cursor(value: datetime, obj_id: ObjectId) -> str:
+        """Codifica la posición (datetime, _id) como un cursor opaco"""
+        raw = json.dumps({"d": value.isoformat(), "i": str(obj_id)}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+    
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+        """Decodifica un cursor; lanza ValueError si no es válido"""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            return datetime.fromisoformat(data["d"]), ObjectId(data["i"])
+        except (ValueError, KeyError, TypeError, InvalidId):
+            raise ValueError("Cursor inválido")
+    
+    @staticmethod
+    def build_query(order: int, after: Optional[str] = None, before: Optional[str] = None) -> Tuple[Dict, int]:
+        """Construye el filtro keyset y la dirección de orden a usar en Mongo
+        
+        `order` es el orden natural del listado (1 ascendente, -1 descendente).
+        `after` avanza en ese orden y `before` retrocede.
+        """
+        if after and before:
+            raise ValueError("Cursor inválido: use solo 'after' o 'before'")
+        cursor = after or before
+        if before:
+            order = -order
+        if not cursor:
+            return {}, order
+        
+        value, obj_id = Pagination.decode_cursor(cursor)
+        op = "$gt" if order == 1 else "$lt"
+        return {
+            "$or": [
+                {"datetime": {op: value}},
+                {"datetime": value, "_id": {op: obj_id}}
+            ]
+        }, order
+    
+    @staticmethod
+    def encode_export_cursor(chat_id: ObjectId, value: datetime, obj_id: ObjectId) -> str:
+        """Codifica la posición (chat_id, datetime, _id) de la exportación completa"""
+        raw = json.dumps({"c": str(chat_id), "d": value.isoformat(), "i": str(obj_id)}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+    
+    @staticmethod
+    def decode_export_cursor(after: str) -> Tuple[ObjectId, datetime, ObjectId]:
+        """Posición (chat_id, datetime, _id) de un checkpoint de la exportación"""
+        try:
+            padded = after + "=" * (-len(after) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            return ObjectId(data["c"]), datetime.fromisoformat(data["d"]), ObjectId(data["i"])
+        except (ValueError, KeyError, TypeError, InvalidId):
+            raise ValueError("Checkpoint inválido")
+    
+    @staticmethod
+    def build_export_query(after: Optional[str] = None) -> Dict:
+        """Filtro keyset para reanudar la exportación después de un checkpoint"""
+        if not after:
+            return {}
+        chat_id, value, obj_id = Pagination.decode_export_cursor(after)
+        return {
+            "$or": [
+                {"chat_id": {"$gt": chat_id}},
+                {"chat_id": chat_id, "datetime": {"$gt": value}},
+                {"chat_id": chat_id, "datetime": value, "_id": {"$gt": obj_id}}
+            ]
+        }
+    
+    @staticmethod
+    def clamp_limit(limit: Optional[int]) -> int:
+        """Acota el tamaño de página"""
+        if not limit or limit < 1:
+            return Pagination.DEFAULT_LIMIT
+        return min(limit, Pagination.MAX_LIMIT)
+    
+    @staticmethod
+    def _keyset_of(item) -> Tuple[datetime, ObjectId]:
+        """(datetime, _id) de un modelo o de un documento de MongoDB"""
+        if isinstance(item, dict):
+            return item["datetime"], item["_id"]
+        return item.datetime, item._id
+    
+    @staticmethod
+    def page_cursors(items: List, has_more: bool, after: Optional[str] = None, before: Optional[str] = None) -> Dict:
+        """Calcula los cursores de la página siguiente y anterior"""
+        if not items:
+            return {"next_cursor": None, "prev_cursor": None, "has_more": False}
+        
+        first = Pagination.encode_cursor(*Pagination._keyset_of(items[0]))
+        last = Pagination.encode_cursor(*Pagination._keyset_of(items[-1]))
+        if before:
+            return {"next_cursor": last, "prev_cursor": first if has_more else None, "has_more": has_more}
+        return {"next_cursor": last if has_more else None, "prev_cursor": first if after else None, "has_more": has_more}
@@ -0,0 +1,204 @@
+import os
+import time
+import asyncio
+from typing import Dict, Optional, Tuple
+from app.src.utils.Metrics import LLM_RATE_LIMIT_WAIT
+
+
+class ProviderRateLimiter:
+    """Límite de peticiones y tokens por minuto de un proveedor LLM, compartido entre procesos
+
+    Cada dimensión es un token bucket en forma GCRA: se guarda el instante
+    teórico en que el cupo queda libre y cada reserva lo corre `costo/tasa`
+    segundos; la espera es lo que ese instante excede la ráfaga permitida
+    (LLM_RATE_BURST_SECONDS). Con LLM_RATE_LIMIT_SHARED=true el estado vive
+    en MongoDB (colección rate_limits) y lo comparten todos los workers; si
+    MongoDB no responde se limita solo este proceso. Nunca rechaza: espacia
+    las llamadas.
+
+    Los tokens se reservan estimados antes de la llamada y se corrigen con
+    el uso real que informa el proveedor al terminar; si la llamada se
+    cancela (por ejemplo, la cobertura perdedora del router) se devuelven.
+    """
+
+    MAX_ATTEMPTS = 10
+
+    def __init__(self, name: str, rpm: float = 0, tpm: float = 0, burst: float = 5.0,
+                 expected_completion: int = 500, shared: bool = True):
+        self.name = name
+        self.rpm = rpm
+        self.tpm = tpm
+        # Segundos que consume cada petición y cada token (solo las dimensiones con límite)
+        self.intervals: Dict[str, float] = {}
+        if rpm > 0:
+            self.intervals["requests"] = 60.0 / rpm
+        if tpm > 0:
+            self.intervals["tokens"] = 60.0 / tpm
+        self.burst = burst
+        self.expected_completion = expected_completion
+        self.shared = shared
+        self._local: Dict[str, float] = {}
+        self._repository = None
+        self.calls = 0
+        self.waited = 0.0
+        self.refunded = 0
+        self.fallbacks = 0
+
+    @classmethod
+    def from_env(cls, name: str) -> "ProviderRateLimiter":
+        """Configura el limitador con <NOMBRE>_RPM y <NOMBRE>_TPM (0 = sin límite)"""
+        prefix = name.upper()
+        return cls(
+            name,
+            rpm=float(os.getenv(f"{prefix}_RPM", "0")),
+            tpm=float(os.getenv(f"{prefix}_TPM", "0")),
+            burst=float(os.getenv("LLM_RATE_BURST_SECONDS", "5")),
+            expected_completion=int(os.getenv("LLM_EXPECTED_COMPLETION_TOKENS", "500")),
+            shared=os.getenv("LLM_RATE_LIMIT_SHARED", "true").lower() == "true"
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.intervals)
+
+    def estimate_tokens(self, *texts: str) -> int:
+        """Tokens aproximados de la petición (~4 caracteres por token) más la respuesta esperada"""
+        return sum(len(text) for text in texts if text) // 4 + self.expected_completion
+
+    def _schedule(self, state: Dict, costs: Dict[str, float], now: float) -> Tuple[Dict[str, float], float]:
+        """Reserva `costs` sobre `state`; retorna los nuevos instantes y los segundos a esperar"""
+        values, delay = {}, 0.0
+        for field, cost in costs.items():
+            tat = max(state.get(field) or now, now) + cost
+            values[field] = tat
+            delay = max(delay, tat - now - self.burst)
+        return values, delay
+
+    def _get_repository(self):
+        if self._repository is None:
+            from app.src.repository.RepositoryRateLimit import RepositoryRateLimit
+            self._repository = RepositoryRateLimit()
+        return self._repository
+
+    async def _reserve_shared(self, costs: Dict[str, float]) -> float:
+        repository = self._get_repository()
+        for _ in range(self.MAX_ATTEMPTS):
+            state = await repository.get_state(self.name) or {}
+            values, delay = self._schedule(state, costs, time.time())
+            if await repository.replace_state(self.name, state.get("revision"), values):
+                return delay
+        raise RuntimeError("demasiados conflictos al reservar")
+
+    async def reserve(self, tokens: int = 0) -> Optional["RateReservation"]:
+        """Reserva una petición y `tokens` sin esperar; la espera queda en la reserva (None sin límites)"""
+        if not self.intervals:
+            return None
+        costs = {}
+        if "requests" in self.intervals:
+            costs["requests"] = self.intervals["requests"]
+        if "tokens" in self.intervals:
+            costs["tokens"] = self.intervals["tokens"] * tokens
+        delay, shared = None, False
+        if self.shared:
+            try:
+                delay, shared = await self._reserve_shared(costs), True
+            except Exception as e:
+                self.fallbacks += 1
+                print(f"Límite de {self.name} sin estado compartido, se aplica solo a este proceso: {e}")
+        if delay is None:
+            self._local, delay = self._schedule(self._local, costs, time.time())
+        self.calls += 1
+        return RateReservation(self, tokens, costs, max(delay, 0.0), shared)
+
+    async def acquire(self, tokens: int = 0) -> Optional["RateReservation"]:
+        """Reserva y espera lo necesario para respetar los límites"""
+        reservation = await self.reserve(tokens)
+        if reservation is not None:
+            await reservation.wait()
+        return reservation
+
+    async def _shift(self, seconds: Dict[str, float], shared: bool):
+        """Corre los instantes de las dimensiones (positivo = consumo extra, negativo = devolución)"""
+        if shared:
+            try:
+                await self._get_repository().shift(self.name, seconds)
+            except Exception as e:
+                print(f"Error al corregir el cupo de {self.name}: {e}")
+            return
+        self._shift_local(seconds)
+
+    def _shift_local(self, seconds: Dict[str, float]):
+        for field, value in seconds.items():
+            if field in self._local:
+                self._local[field] += value
+
+    def get_stats(self) -> Dict:
+        """Estado para /health"""
+        return {
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "shared": self.shared,
+            "calls": self.calls,
+            "waited_s": round(self.waited, 3),
+            "refunded": self.refunded,
+            "fallbacks": self.fallbacks
+        }
+
+
+class RateReservation:
+    """Cupo reservado para una llamada: se espera, se corrige con el uso real o se devuelve"""
+    __slots__ = ("limiter", "tokens", "costs", "delay", "shared", "_closed")
+
+    def __init__(self, limiter: ProviderRateLimiter, tokens: int, costs: Dict[str, float],
+                 delay: float, shared: bool):
+        self.limiter = limiter
+        self.tokens = tokens
+        self.costs = costs
+        self.delay = delay
+        self.shared = shared
+        self._closed = False
+
+    async def wait(self):
+        """Duerme hasta el turno reservado"""
+        LLM_RATE_LIMIT_WAIT.observe(self.delay, self.limiter.name)
+        if self.delay > 0:
+            self.limiter.waited += self.delay
+            await asyncio.sleep(self.delay)
+
+    async def settle(self, actual: Optional[int]):
+        """Corrige la reserva de tokens con el uso real (devuelve o cobra la diferencia)"""
+        if self._closed:
+            return
+        self._closed = True
+        interval = self.limiter.intervals.get("tokens")
+        if interval and actual and actual != self.tokens:
+            await self.limiter._shift({"tokens": (actual - self.tokens) * interval}, self.shared)
+
+    def cancel(self, dispatched: bool):
+        """Devuelve el cupo de una llamada cancelada
+
+        Sin enviar se devuelve todo; ya enviada, solo los tokens de respuesta
+        estimados (la petición y el prompt sí se consumieron). No espera nada:
+        puede llamarse desde una tarea cancelada.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        refund = dict(self.costs)
+        if dispatched:
+            refund.pop("requests", None)
+            if "tokens" in refund:
+                refund["tokens"] = min(refund["tokens"],
+                                       self.limiter.expected_completion * self.limiter.intervals["tokens"])
+        refund = {field: -seconds for field, seconds in refund.items() if seconds}
+        if not refund:
+            return
+        self.limiter.refunded += 1
+        if self.shared:
+            asyncio.create_task(self.limiter._shift(refund, True))
+        else:
+            self.limiter._shift_local(refund)
+
+
+# Límites de los proveedores (GEMINI_RPM/TPM, MISTRAL_RPM/TPM); los clientes de Mistral comparten el suyo
+provider_limiters = {name: ProviderRateLimiter.from_env(name) for name in ("gemini", "mistral")}
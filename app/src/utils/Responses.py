@@ -0,0 +1,38 @@
+import json
+from datetime import datetime
+from typing import Any
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él se usa json de la librería estándar
+    orjson = None
+
+
+def _default(value: Any):
+    """Tipos de MongoDB que no son JSON nativo"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """Serializa a JSON en bytes (orjson si está instalado)"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """Respuesta JSON serializada con orjson
+
+    Las rutas que la retornan directamente evitan además el paso por
+    jsonable_encoder de FastAPI; como clase por defecto de la aplicación
+    acelera la serialización del resto de rutas.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,98 @@
+import os
+import asyncio
+from typing import AsyncIterator, Dict, Optional
+from app.src.utils.Responses import dumps
+
+
+class SSEEncoder:
+    """Codifica los eventos del chat como frames SSE (`data: {...}\\n\\n`)
+
+    El prefijo y el sufijo de los frames de contenido se arman una sola vez
+    por stream; por cada token solo se serializa el texto que cambia.
+    """
+
+    def __init__(self):
+        self._user_message_id: Optional[str] = None
+        self._content_suffix = self._suffix(None)
+
+    @staticmethod
+    def _suffix(user_message_id: Optional[str]) -> bytes:
+        return b',"type":"content","user_message_id":' + dumps(user_message_id) + b"}\n\n"
+
+    def content(self, text: str, user_message_id: Optional[str] = None) -> bytes:
+        """Frame de un delta de texto"""
+        if user_message_id != self._user_message_id:
+            self._user_message_id = user_message_id
+            self._content_suffix = self._suffix(user_message_id)
+        return b'data: {"content":' + dumps(text) + self._content_suffix
+
+    @staticmethod
+    def event(data: Dict) -> bytes:
+        """Frame genérico (done, error)"""
+        return b"data: " + dumps(data) + b"\n\n"
+
+    @staticmethod
+    def error(message: str) -> bytes:
+        return SSEEncoder.event({"error": message, "type": "error"})
+
+    @staticmethod
+    async def coalesce(chunks: AsyncIterator[Dict], window: Optional[float] = None,
+                       max_chars: Optional[int] = None) -> AsyncIterator[Dict]:
+        """Agrupa deltas de contenido consecutivos en un solo evento
+
+        El primer delta se envía de inmediato (no retrasa el primer token).
+        Después, cada grupo espera `window` segundos y junta todo lo que llegó
+        mientras tanto, hasta `max_chars` caracteres. Los eventos que no son de
+        contenido cortan el grupo. Con window=0 no agrupa.
+        """
+        window = window if window is not None else float(os.getenv("SSE_COALESCE_MS", "0")) / 1000
+        max_chars = max_chars or int(os.getenv("SSE_COALESCE_MAX_CHARS", "512"))
+        if window <= 0:
+            async for chunk in chunks:
+                yield chunk
+            return
+
+        # Una tarea lee el stream mientras se espera la ventana (una espera por frame, no por token)
+        queue: asyncio.Queue = asyncio.Queue()
+        end = object()
+
+        async def pump():
+            try:
+                async for chunk in chunks:
+                    queue.put_nowait(chunk)
+            except Exception as e:
+                queue.put_nowait(e)
+            finally:
+                queue.put_nowait(end)
+
+        task = asyncio.create_task(pump())
+        held = None
+        first = True
+        try:
+            while True:
+                item, held = (held, None) if held is not None else (await queue.get(), None)
+                if item is end:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                if item.get("type") != "content":
+                    yield item
+                    continue
+                if first:
+                    first = False
+                    yield item
+                    continue
+                if queue.empty():
+                    await asyncio.sleep(window)
+                parts, size = [item["content"]], len(item["content"])
+                while not queue.empty():
+                    following = queue.get_nowait()
+                    if (following is end or isinstance(following, Exception)
+                            or following.get("type") != "content" or size >= max_chars):
+                        held = following
+                        break
+                    parts.append(following["content"])
+                    size += len(following["content"])
+                yield dict(item, content="".join(parts))
+        finally:
+            task.cancel()
@@ -0,0 +1,37 @@
+import os
+
+try:
+    from opentelemetry import trace
+except ImportError:  # opentelemetry-api es opcional: sin él los spans no hacen nada
+    trace = None
+
+# Spans al estilo OpenTelemetry (TRACING_ENABLED=true); el SDK y el exportador se configuran
+# con las variables estándar OTEL_* o con opentelemetry-instrument
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true" and trace is not None
+tracer = trace.get_tracer("hackaton-chat-api") if TRACING_ENABLED else None
+
+
+class _NoopSpan:
+    """Span vacío con la misma interfaz mínima (sin costo cuando el tracing está desactivado)"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set_attribute(self, key, value):
+        pass
+
+    def update_name(self, name):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str, **attributes):
+    """Abre un span hijo del actual (un turno de chat queda enlazado de la ruta al LLM y la BD)"""
+    if tracer is None:
+        return _NOOP_SPAN
+    return tracer.start_as_current_span(name, attributes=attributes)
@@ -0,0 +1,67 @@
+"""Tamaño de prompt y latencia simulada del LLM con historial completo vs ventana deslizante.
+
+La latencia se modela como base + costo por token de entrada, de modo que
+el benchmark no requiere credenciales ni red.
+
+Uso:
+    python -m benchmarks.bench_context_window --sizes 10 100 1000
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import report
+
+
+def make_history(size: int, words: int):
+    """Historial sintético alternando usuario y asistente"""
+    from app.src.models.Message import Message
+
+    now = datetime.now()
+    history = []
+    for i in range(size):
+        message = Message(role="user" if i % 2 == 0 else "assistant",
+                          content=" ".join(f"palabra{j}" for j in range(words)))
+        message.datetime = now - timedelta(seconds=size - i)
+        history.append(message)
+    return history
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--words", type=int, default=40, help="Palabras por mensaje")
+    parser.add_argument("--base-latency-ms", type=float, default=300.0)
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=80.0)
+    args = parser.parse_args()
+
+    from app.src.service.ServiceContexto import ServiceContexto
+
+    contexto = ServiceContexto()
+    summary = "El cliente Juan consulta por automatización de parqueaderos con ANPR." * 3
+
+    def mocked_latency(tokens: int) -> float:
+        return round(args.base_latency_ms + tokens / 1000 * args.ms_per_1k_tokens, 1)
+
+    results = {"benchmark": "context_window", "max_tokens": contexto.max_tokens, "sizes": {}}
+    for size in args.sizes:
+        history = make_history(size, args.words)
+        full_tokens = sum(contexto.estimate_tokens(message.content) for message in history)
+
+        start = time.perf_counter()
+        window, dropped = contexto.build_window(history[-contexto.max_messages:], summary if size > 10 else None)
+        build_ms = (time.perf_counter() - start) * 1000
+        window_tokens = sum(contexto.estimate_tokens(i["content"]) for i in window)
+
+        results["sizes"][size] = {
+            "full_history": {"messages": size, "prompt_tokens": full_tokens,
+                             "mocked_latency_ms": mocked_latency(full_tokens)},
+            "sliding_window": {"messages": len(window), "prompt_tokens": window_tokens,
+                               "mocked_latency_ms": mocked_latency(window_tokens),
+                               "build_ms": round(build_ms, 3)},
+        }
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
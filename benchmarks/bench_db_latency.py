@@ -0,0 +1,63 @@
+"""Latencia p50/p95/p99 de GET /api/chat/ y GET /api/message/chat/{id} con clientes concurrentes.
+
+Uso:
+    python -m benchmarks.bench_db_latency --mongomock
+    MONGO_URL=mongodb://localhost:27017 python -m benchmarks.bench_db_latency --concurrency 100
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.common import add_database_arguments, backend_name, use_database, seed, summarize, report
+
+
+async def run(args):
+    database = use_database(args)
+    chat_ids = await seed(database, args.chats, args.messages)
+
+    import httpx
+    from main import app
+
+    latencies = {"list_chats": [], "chat_history": []}
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def one_request(i: int):
+            async with semaphore:
+                if i % 2 == 0:
+                    name, url = "list_chats", "/api/chat/"
+                else:
+                    name, url = "chat_history", f"/api/message/chat/{random.choice(chat_ids)}"
+                start = time.perf_counter()
+                response = await client.get(url)
+                latencies[name].append(time.perf_counter() - start)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one_request(i) for i in range(args.requests)))
+        wall_time = time.perf_counter() - start
+
+    report({
+        "benchmark": "db_latency",
+        "backend": backend_name(args),
+        "concurrency": args.concurrency,
+        "chats": args.chats,
+        "messages_per_chat": args.messages,
+        "list_chats": summarize(latencies["list_chats"], wall_time),
+        "chat_history": summarize(latencies["chat_history"], wall_time),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_database_arguments(parser)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
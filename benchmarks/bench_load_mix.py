@@ -0,0 +1,285 @@
+"""Carga mixta contra la aplicación completa (main.app servida por uvicorn) con LLM y MongoDB falsos.
+
+Arranca main.app en un uvicorn dentro del proceso (con su lifespan: pool,
+índices, trabajos) en un puerto libre y lo recorre por HTTP real con
+--users usuarios virtuales durante --duration segundos. Cada usuario elige
+operaciones según --mix:
+
+    create   POST /api/chat/
+    turn     POST /api/message/chat/{id} (SSE; mide también el primer token)
+    history  GET  /api/message/chat/{id}
+    list     GET  /api/chat/
+    metrics  GET  /api/metricas/{id}
+
+Los proveedores "gemini", "mistral_chat" y "mistral" se reemplazan por
+fakes con latencias y tamaño de chunk configurables, conectados a los
+límites de cada proveedor (GEMINI_RPM/TPM, MISTRAL_RPM/TPM); el chat pasa
+por el router real (cobertura, circuit breaker). MongoDB se reemplaza por
+mongomock (--mongomock), un mongod efímero (--mongod) o MONGO_URL. El
+resultado (throughput, p50/p95/p99 por operación, errores por código HTTP,
+peticiones rechazadas por el control de admisión, estado del router y
+memoria) se imprime en JSON; con --output se guarda y con --baseline se
+agrega la variación porcentual respecto de una corrida anterior.
+
+Uso:
+    python -m benchmarks.bench_load_mix --mongomock --users 50 --duration 20
+    python -m benchmarks.bench_load_mix --mongod --mix turn=6,history=3,create=1 --output base.json
+    python -m benchmarks.bench_load_mix --mongomock --baseline base.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+import httpx
+
+from benchmarks.common import (add_database_arguments, backend_name, use_database, seed, summarize,
+                               report, rss_mb, peak_rss_mb)
+
+DEFAULT_MIX = "create=1,turn=4,history=4,list=2,metrics=1"
+# Rechazos esperados del control de admisión (turno en curso en el chat, servicio saturado): no son fallos
+SHED_STATUSES = {429, 503}
+QUESTIONS = ["¿Qué servicios ofrecen?", "¿Dónde están ubicados?", "¿Cómo los contacto?",
+             "¿Trabajan con pymes?", "Cuéntame sobre Lean Manufacturing"]
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Operación desconocida: {name}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class LoadState:
+    """Chats disponibles y mediciones compartidas por los usuarios virtuales"""
+
+    def __init__(self, chat_ids):
+        self.chat_ids = list(chat_ids)
+        self.latencies = defaultdict(list)
+        # Por operación y causa: código HTTP o tipo de error
+        self.errors = defaultdict(lambda: defaultdict(int))
+        self.shed = defaultdict(lambda: defaultdict(int))
+        self.ttft = []
+
+
+async def create_chat(client, state: LoadState, rng: random.Random):
+    response = await client.post("/api/chat/")
+    response.raise_for_status()
+    state.chat_ids.append(response.json()["data"]["id"])
+
+
+async def message_turn(client, state: LoadState, rng: random.Random):
+    start = time.perf_counter()
+    first = None
+    chat_id = rng.choice(state.chat_ids)
+    async with client.stream("POST", f"/api/message/chat/{chat_id}",
+                             json={"content": rng.choice(QUESTIONS)}) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[6:])
+            if event["type"] == "error":
+                raise RuntimeError(event.get("error"))
+            if first is None and event["type"] == "content":
+                first = time.perf_counter() - start
+    if first is not None:
+        state.ttft.append(first)
+
+
+async def read_history(client, state: LoadState, rng: random.Random):
+    response = await client.get(f"/api/message/chat/{rng.choice(state.chat_ids)}", params={"limit": 50})
+    response.raise_for_status()
+
+
+async def list_chats(client, state: LoadState, rng: random.Random):
+    response = await client.get("/api/chat/", params={"limit": 20})
+    response.raise_for_status()
+
+
+async def chat_metrics(client, state: LoadState, rng: random.Random):
+    response = await client.get(f"/api/metricas/{rng.choice(state.chat_ids)}")
+    response.raise_for_status()
+
+
+OPERATIONS = {
+    "create": create_chat,
+    "turn": message_turn,
+    "history": read_history,
+    "list": list_chats,
+    "metrics": chat_metrics,
+}
+
+
+async def virtual_user(client, state: LoadState, mix: dict, rng: random.Random, deadline: float, think: float):
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        start = time.perf_counter()
+        try:
+            await OPERATIONS[name](client, state, rng)
+            state.latencies[name].append(time.perf_counter() - start)
+        except httpx.HTTPStatusError as e:
+            status = e.response.status_code
+            (state.shed if status in SHED_STATUSES else state.errors)[name][str(status)] += 1
+        except Exception as e:
+            state.errors[name][type(e).__name__] += 1
+        if think:
+            await asyncio.sleep(rng.expovariate(1 / think))
+
+
+async def sample_memory(samples: list, interval: float = 0.25):
+    while True:
+        samples.append(rss_mb())
+        await asyncio.sleep(interval)
+
+
+def compare(results: dict, baseline: dict) -> dict:
+    """Variación porcentual (positivo = más lento o más throughput) respecto de la línea base"""
+    def change(new, old):
+        return round((new - old) / old * 100, 1) if old else None
+
+    regression = {}
+    for name, current in results["operations"].items():
+        previous = baseline.get("operations", {}).get(name)
+        if not previous:
+            continue
+        regression[name] = {key: change(current[key], previous[key])
+                            for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")}
+    if baseline.get("turn_ttft") and results["turn_ttft"]["requests"]:
+        regression["turn_ttft"] = {key: change(results["turn_ttft"][key], baseline["turn_ttft"][key])
+                                   for key in ("p50_ms", "p95_ms", "p99_ms")}
+    regression["memory_peak_mb"] = change(results["memory_mb"]["peak_sampled"],
+                                          baseline.get("memory_mb", {}).get("peak_sampled", 0))
+    return regression
+
+
+async def run(args):
+    # Los mensajes de la aplicación van a stderr: stdout queda solo con el JSON del resultado
+    with contextlib.redirect_stdout(sys.stderr):
+        results = await run_load(args)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2, ensure_ascii=False)
+    report(results)
+
+
+async def run_load(args) -> dict:
+    # Se mide la aplicación, no la recuperación del PDF ni el caché de respuestas (salvo que se pidan)
+    os.environ.setdefault("RETRIEVAL_ENABLED", "false")
+    database = use_database(args)
+    chat_ids = await seed(database, args.chats, args.messages)
+
+    import uvicorn
+    from API.ProviderRegistry import provider_registry
+    from app.src.cache.ResponseCache import response_cache
+    from app.src.utils.RateLimiter import provider_limiters
+    from benchmarks.fakes import FakeGemini, FakeMistral
+    from main import app
+
+    response_cache.enabled = args.response_cache
+    # Fakes bajo los nombres de los proveedores: el "chat" sigue siendo el router real
+    fakes = {
+        "gemini": FakeGemini(args.first_token_delay, args.chunk_delay, args.chunks, chunk_text="x" * args.chunk_chars),
+        "mistral_chat": FakeGemini(args.first_token_delay, args.chunk_delay, args.chunks,
+                                   chunk_text="x" * args.chunk_chars),
+        "mistral": FakeMistral(args.mistral_latency),
+    }
+    for name, fake in fakes.items():
+        fake.rate_limiter = provider_limiters["gemini" if name == "gemini" else "mistral"]
+        provider_registry.set(name, fake)
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", lifespan="on"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        if serving.done():
+            serving.result()
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+
+    state = LoadState(chat_ids)
+    memory = {"start": rss_mb()}
+    samples = []
+    sampler = asyncio.create_task(sample_memory(samples))
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=None) as client:
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(*(
+            virtual_user(client, state, args.mix, random.Random(args.seed + user), deadline, args.think_time)
+            for user in range(args.users)
+        ))
+        wall_time = time.perf_counter() - start
+    sampler.cancel()
+    memory.update({"end": rss_mb(), "peak_sampled": max(samples + [memory["start"]]), "peak_process": peak_rss_mb()})
+
+    server.should_exit = True
+    await serving
+
+    operations = {}
+    for name in args.mix:
+        operations[name] = summarize(state.latencies[name], wall_time)
+        operations[name]["errors"] = sum(state.errors[name].values())
+        operations[name]["errors_by_cause"] = dict(state.errors[name])
+        operations[name]["shed"] = dict(state.shed[name])
+    completed = sum(len(values) for values in state.latencies.values())
+    results = {
+        "benchmark": "load_mix",
+        "backend": backend_name(args),
+        "users": args.users,
+        "duration_s": round(wall_time, 3),
+        "mix": args.mix,
+        "seed": args.seed,
+        "llm": {"first_token_delay": args.first_token_delay, "chunk_delay": args.chunk_delay,
+                "chunks": args.chunks, "chunk_chars": args.chunk_chars, "mistral_latency": args.mistral_latency},
+        "total": {
+            "requests": completed,
+            "errors": sum(sum(causes.values()) for causes in state.errors.values()),
+            "shed": sum(sum(causes.values()) for causes in state.shed.values()),
+            "throughput_rps": round(completed / wall_time, 2) if wall_time else 0.0,
+        },
+        "operations": operations,
+        "turn_ttft": summarize(state.ttft, wall_time),
+        "router": provider_registry.get("chat").get_stats(),
+        "rate_limits": {name: limiter.get_stats() for name, limiter in provider_limiters.items()},
+        "memory_mb": memory,
+    }
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            results["regression_pct"] = compare(results, json.load(baseline))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_database_arguments(parser)
+    parser.add_argument("--users", type=int, default=20, help="Usuarios virtuales concurrentes")
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos de carga")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"Pesos por operación (por defecto {DEFAULT_MIX})")
+    parser.add_argument("--think-time", type=float, default=0.0,
+                        help="Pausa media (exponencial) entre operaciones de un usuario, en segundos")
+    parser.add_argument("--seed", type=int, default=1, help="Semilla de la secuencia de operaciones")
+    parser.add_argument("--chats", type=int, default=50, help="Chats precargados")
+    parser.add_argument("--messages", type=int, default=10, help="Mensajes precargados por chat")
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    parser.add_argument("--chunk-delay", type=float, default=0.02)
+    parser.add_argument("--chunks", type=int, default=20)
+    parser.add_argument("--chunk-chars", type=int, default=6, help="Caracteres por chunk del LLM falso")
+    parser.add_argument("--mistral-latency", type=float, default=0.2)
+    parser.add_argument("--response-cache", action="store_true", help="Deja activo el caché de respuestas")
+    parser.add_argument("--output", help="Guarda el resultado JSON en este archivo")
+    parser.add_argument("--baseline", help="Resultado JSON anterior con el que comparar")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Tiempo total de ServiceMetricas: bucle secuencial original vs concurrente vs por lotes.
+
+Usa un cliente Mistral falso con latencia fija por petición.
+
+Uso:
+    python -m benchmarks.bench_metricas --messages 50 --latency 0.5
+"""
+import argparse
+import asyncio
+import time
+
+from API.ProviderRegistry import provider_registry
+from benchmarks.common import report
+
+
+def make_messages(count: int):
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"Mensaje de prueba número {i}"}
+        for i in range(count)
+    ]
+
+
+async def run(args):
+    from app.src.service.ServiceMetricas import ServiceMetricas
+    from benchmarks.fakes import FakeMistral
+
+    messages = make_messages(args.messages)
+    service = ServiceMetricas()
+    service._semaphore = asyncio.Semaphore(args.concurrency)
+    service.batch_size = args.batch_size
+    results = {"benchmark": "metricas", "messages": args.messages, "latency_s": args.latency,
+               "concurrency": args.concurrency, "batch_size": args.batch_size}
+
+    # Bucle secuencial y síncrono equivalente a la implementación original
+    fake = FakeMistral(args.latency)
+    start = time.perf_counter()
+    sequential = []
+    for message in messages:
+        score = {}
+        for dict_data in service._parse_response(fake.responder_pregunta(f"Escrito por {message['role']}: " + message["content"])):
+            score.update(dict_data)
+        sequential.append(score)
+    results["sequential"] = {"wall_s": round(time.perf_counter() - start, 3), "requests": fake.requests}
+
+    for mode, method in (("concurrent", service._analizar_concurrente), ("batch", service._analizar_lotes)):
+        fake = FakeMistral(args.latency)
+        provider_registry.set("mistral", fake)
+        start = time.perf_counter()
+        scores = await method(messages)
+        results[mode] = {"wall_s": round(time.perf_counter() - start, 3), "requests": fake.requests,
+                         "matches_sequential": scores == sequential}
+    report(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
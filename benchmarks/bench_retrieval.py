@@ -0,0 +1,73 @@
+"""Latencia de recuperación BM25 y tamaño de prompt: documento completo vs top-k fragmentos.
+
+Uso:
+    python -m benchmarks.bench_retrieval
+    python -m benchmarks.bench_retrieval --synthetic-words 200000 --top-k 4
+"""
+import argparse
+import random
+import tempfile
+import time
+
+from benchmarks.common import percentile, report
+
+QUESTIONS = [
+    "¿Qué servicios ofrecen?",
+    "¿Cómo los contacto?",
+    "Necesito automatizar un parqueadero con lectura de placas",
+    "¿Trabajan con PLCs y control automático?",
+    "¿Tienen presencia en Antioquia?",
+    "¿Qué es IngeleanPlus?",
+    "Quiero tarjetas NFC personalizadas",
+    "¿Qué metodología de trabajo usan?",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top-k", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--synthetic-words", type=int, default=0,
+                        help="Agrega un documento sintético de N palabras para simular catálogos grandes")
+    args = parser.parse_args()
+
+    from API.Knowledge import FAQ_CONTENT
+    from API.RetrievalIndex import RetrievalIndex
+    from app.src.service.ServiceContexto import ServiceContexto
+
+    index = RetrievalIndex(index_dir=tempfile.mkdtemp(prefix="retrieval-"))
+    documents = [(path, index._read_document(path)) for path in index.document_paths()]
+    if args.synthetic_words:
+        vocabulary = [f"termino{i}" for i in range(5000)]
+        rng = random.Random(0)
+        documents.append(("synthetic", " ".join(rng.choice(vocabulary) for _ in range(args.synthetic_words))))
+
+    start = time.perf_counter()
+    index.build(None if not args.synthetic_words else documents)
+    build_s = time.perf_counter() - start
+    index.save()
+    index.weights = None
+    index.load()
+
+    latencies = []
+    for i in range(args.queries):
+        start = time.perf_counter()
+        index.search(QUESTIONS[i % len(QUESTIONS)], args.top_k)
+        latencies.append(time.perf_counter() - start)
+
+    full_text = FAQ_CONTENT + "".join(text for _, text in documents)
+    retrieved = [index.build_context(question, args.top_k) for question in QUESTIONS]
+    report({
+        "benchmark": "retrieval",
+        "chunks": len(index.chunks),
+        "vocabulary": len(index.vocabulary),
+        "build_s": round(build_s, 3),
+        "search_p50_us": round(percentile(latencies, 50) * 1e6, 1),
+        "search_p99_us": round(percentile(latencies, 99) * 1e6, 1),
+        "prompt_tokens_full_document": ServiceContexto.estimate_tokens(full_text),
+        "prompt_tokens_top_k_mean": round(sum(ServiceContexto.estimate_tokens(text) for text in retrieved) / len(retrieved), 1),
+    })
+
+
+if __name__ == "__main__":
+    main()
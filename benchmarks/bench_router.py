@@ -0,0 +1,68 @@
+"""Time-to-first-token del router LLM con proveedores falsos.
+
+Escenarios:
+- primario lento: sin cobertura se espera al primario; con cobertura responde
+  el respaldo tras `--hedge-delay` y el EWMA termina eligiéndolo como primario.
+- primario caído: failover inmediato al respaldo, que pasa a ser el
+  primario; el caído solo vuelve a recibir peticiones como respaldo.
+
+Uso:
+    python -m benchmarks.bench_router --requests 20
+"""
+import argparse
+import asyncio
+import time
+
+from API.LLMRouter import LLMRouter
+from benchmarks.common import summarize, report
+from benchmarks.fakes import FakeGemini
+
+
+async def measure(router: LLMRouter, requests: int):
+    """Peticiones secuenciales (para que el EWMA evolucione entre ellas)"""
+    ttft = []
+    start = time.perf_counter()
+    for _ in range(requests):
+        begin = time.perf_counter()
+        stream = await router.responder_pregunta_async("¿Qué servicios ofrecen?")
+        async for _chunk in stream:
+            ttft.append(time.perf_counter() - begin)
+            break
+        await stream.aclose()
+    return {"ttft": summarize(ttft, time.perf_counter() - start), "providers": router.get_stats()}
+
+
+def build_router(providers: dict, hedge_delay: float) -> LLMRouter:
+    return LLMRouter(list(providers), providers.__getitem__, hedge_delay=hedge_delay,
+                     failure_threshold=3, reset_timeout=60)
+
+
+async def run(args):
+    results = {"benchmark": "llm_router", "hedge_delay_s": args.hedge_delay, "scenarios": {}}
+
+    slow = {"primary": FakeGemini(first_token_delay=args.slow_ttft, chunks=3),
+            "backup": FakeGemini(first_token_delay=args.backup_ttft, chunks=3)}
+    results["scenarios"]["slow_primary_no_hedge"] = await measure(
+        build_router({"primary": slow["primary"]}, args.hedge_delay), args.requests)
+    results["scenarios"]["slow_primary_hedged"] = await measure(
+        build_router(slow, args.hedge_delay), args.requests)
+
+    down = {"primary": FakeGemini(first_token_delay=0.05, fail=True),
+            "backup": FakeGemini(first_token_delay=args.backup_ttft, chunks=3)}
+    scenario = await measure(build_router(down, args.hedge_delay), args.requests)
+    scenario["primary_calls"] = down["primary"].requests
+    results["scenarios"]["primary_down"] = scenario
+    report(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--hedge-delay", type=float, default=0.5)
+    parser.add_argument("--slow-ttft", type=float, default=2.0, help="Primer token del primario lento (s)")
+    parser.add_argument("--backup-ttft", type=float, default=0.3, help="Primer token del respaldo (s)")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Frames por segundo y CPU por stream al codificar los eventos SSE del chat.
+
+Compara el controlador anterior (json.dumps de un dict nuevo por token)
+contra SSEEncoder (frames preformateados con orjson) y, con tokens que
+llegan cada `--token-interval` segundos, el efecto de agrupar tokens en
+ventanas de `--coalesce-ms` (a través de StreamingResponse).
+
+Uso:
+    python -m benchmarks.bench_sse_encoding --tokens 500 --streams 50
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from app.src.utils.SSE import SSEEncoder
+from benchmarks.common import report
+
+USER_MESSAGE_ID = "66f1c0ffee0000000000beef"
+TOKENS = ["Hola", " 👋", ",", " soy", " Johan", " de", " Ingelean", ".", " ¿", "En", " qué", " te", " ayudo", "?"]
+
+
+def chunk_events(count: int):
+    for i in range(count):
+        yield {"content": TOKENS[i % len(TOKENS)], "type": "content", "user_message_id": USER_MESSAGE_ID}
+    yield {"content": "", "type": "done", "user_message_id": USER_MESSAGE_ID}
+
+
+def encode_json(chunk: dict) -> bytes:
+    """Equivalente al controlador anterior"""
+    chunk_data = {
+        "content": chunk.get("content", ""),
+        "type": chunk.get("type", "content"),
+        "user_message_id": chunk.get("user_message_id")
+    }
+    return f"data: {json.dumps(chunk_data)}\n\n".encode("utf-8")
+
+
+def encode_sse(encoder: SSEEncoder, chunk: dict) -> bytes:
+    if chunk["type"] == "content":
+        return encoder.content(chunk["content"], chunk["user_message_id"])
+    return encoder.event(chunk)
+
+
+def bench_encoding(tokens: int, repeat: int) -> dict:
+    """Solo CPU de serialización, sin esperas"""
+    results = {}
+    events = list(chunk_events(tokens))
+    for name in ("json_dumps", "sse_encoder"):
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        size = 0
+        for _ in range(repeat):
+            encoder = SSEEncoder()
+            for chunk in events:
+                frame = encode_json(chunk) if name == "json_dumps" else encode_sse(encoder, chunk)
+                size += len(frame)
+        cpu = time.process_time() - cpu_start
+        frames = len(events) * repeat
+        results[name] = {
+            "frames_per_second": round(frames / (time.perf_counter() - wall_start)),
+            "cpu_us_per_frame": round(cpu / frames * 1e6, 3),
+            "cpu_ms_per_stream": round(cpu / repeat * 1000, 3),
+            "bytes_per_stream": size // repeat,
+        }
+    return results
+
+
+async def token_stream(tokens: int, interval: float):
+    for chunk in chunk_events(tokens):
+        await asyncio.sleep(interval)
+        yield chunk
+
+
+async def bench_coalescing(tokens: int, streams: int, interval: float, window: float) -> dict:
+    """Streams concurrentes servidos por StreamingResponse (pila ASGI completa)
+
+    Con tokens espaciados, agrupar reduce los frames que atraviesan
+    Starlette y el transporte; se mide el CPU total por stream.
+    """
+    import httpx
+    from fastapi import FastAPI
+    from fastapi.responses import StreamingResponse
+
+    app = FastAPI()
+
+    @app.get("/stream")
+    async def stream(window: float = 0.0):
+        async def generate():
+            encoder = SSEEncoder()
+            async for chunk in SSEEncoder.coalesce(token_stream(tokens, interval), window=window):
+                yield encode_sse(encoder, chunk)
+        return StreamingResponse(generate(), media_type="text/event-stream")
+
+    results = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for name, coalesce_window in (("per_token", 0.0), ("coalesced", window)):
+            cpu_start, wall_start = time.process_time(), time.perf_counter()
+            responses = await asyncio.gather(*(
+                client.get("/stream", params={"window": coalesce_window}) for _ in range(streams)
+            ))
+            cpu = time.process_time() - cpu_start
+            frames = sum(response.text.count("data: ") for response in responses)
+            results[name] = {
+                "frames_per_stream": round(frames / streams, 1),
+                "cpu_ms_per_stream": round(cpu / streams * 1000, 3),
+                "wall_s": round(time.perf_counter() - wall_start, 3),
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=500, help="Tokens por respuesta")
+    parser.add_argument("--repeat", type=int, default=200, help="Streams codificados en la prueba de CPU")
+    parser.add_argument("--streams", type=int, default=50, help="Streams concurrentes en la prueba de agrupación")
+    parser.add_argument("--token-interval", type=float, default=0.002)
+    parser.add_argument("--coalesce-ms", type=float, default=25)
+    args = parser.parse_args()
+
+    report({
+        "benchmark": "sse_encoding",
+        "tokens_per_stream": args.tokens,
+        "encoding": bench_encoding(args.tokens, args.repeat),
+        "coalescing": asyncio.run(bench_coalescing(args.tokens, args.streams, args.token_interval,
+                                                   args.coalesce_ms / 1000)),
+    })
+
+
+if __name__ == "__main__":
+    main()
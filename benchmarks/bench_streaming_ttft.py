@@ -0,0 +1,75 @@
+"""Time-to-first-token de N chats en paralelo con un Gemini falso de chunks retardados.
+
+Compara el stream asíncrono contra uno bloqueante (equivalente a iterar el
+stream síncrono del SDK dentro del event loop).
+
+Uso:
+    python -m benchmarks.bench_streaming_ttft --mongomock --parallel 50
+"""
+import argparse
+import asyncio
+import time
+
+from API.ProviderRegistry import provider_registry
+from app.src.cache.ResponseCache import response_cache
+from benchmarks.common import add_database_arguments, use_database, summarize, report
+
+
+async def measure(service, chat_ids, fake):
+    """Lanza un turno por chat en paralelo y mide TTFT y duración total"""
+    provider_registry.set("chat", fake)
+    ttft, total = [], []
+    # Reloj común desde el lanzamiento: en modo bloqueante una tarea puede empezar tarde porque
+    # las anteriores bloquearon el event loop, y esa espera también es parte de su TTFT
+    start = time.perf_counter()
+
+    async def one_turn(chat_id: str):
+        first = None
+        async for chunk in service.create_message_with_response_streaming(chat_id, "¿Qué servicios ofrecen?"):
+            if chunk["type"] == "error":
+                raise RuntimeError(chunk["error"])
+            if first is None and chunk["type"] == "content":
+                first = time.perf_counter() - start
+        ttft.append(first)
+        total.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one_turn(chat_id) for chat_id in chat_ids))
+    wall_time = time.perf_counter() - start
+    return {"ttft": summarize(ttft, wall_time), "stream_total": summarize(total, wall_time)}
+
+
+async def run(args):
+    use_database(args)
+    # Todas las peticiones repiten la pregunta: se mide el modelo, no el caché de respuestas
+    response_cache.enabled = False
+
+    from app.src.models.Chat import Chat
+    from app.src.repository.RepositoryChat import RepositoryChat
+    from app.src.service.ServiceMessage import ServiceMessage
+    from benchmarks.fakes import FakeGemini
+
+    chat_repository = RepositoryChat()
+    chat_ids = [str((await chat_repository.create_chat(Chat()))._id) for _ in range(args.parallel)]
+    service = ServiceMessage()
+
+    results = {"benchmark": "streaming_ttft", "parallel": args.parallel}
+    for mode, blocking in (("async", False), ("blocking", True)):
+        fake = FakeGemini(args.first_token_delay, args.chunk_delay, args.chunks, blocking=blocking)
+        results[mode] = await measure(service, chat_ids, fake)
+    # Dejar terminar los guardados en segundo plano
+    await asyncio.sleep(0.1)
+    report(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_database_arguments(parser)
+    parser.add_argument("--parallel", type=int, default=20)
+    parser.add_argument("--chunks", type=int, default=20)
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    parser.add_argument("--chunk-delay", type=float, default=0.02)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
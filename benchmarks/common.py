@@ -0,0 +1,150 @@
+import argparse
+import atexit
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def add_database_arguments(parser: argparse.ArgumentParser):
+    """Opciones comunes para elegir el backend de MongoDB del benchmark"""
+    parser.add_argument("--mongomock", action="store_true",
+                        help="Usa mongomock en memoria en lugar de MONGO_URL")
+    parser.add_argument("--mongod", action="store_true",
+                        help="Levanta un mongod efímero en un directorio temporal (binario mongod en el PATH)")
+    parser.add_argument("--db-latency", type=float, default=0.002,
+                        help="Latencia simulada por operación con --mongomock (segundos)")
+    parser.add_argument("--db-name", default="hackaton_chat_bench",
+                        help="Base de datos a usar contra un mongod real")
+
+
+def use_database(args):
+    """Configura db_connection antes de importar la aplicación"""
+    from app.src.database.connection import db_connection
+
+    if args.mongomock:
+        from benchmarks.fakes import AsyncMockDatabase
+        db_connection.set_database(AsyncMockDatabase(args.db_name, args.db_latency))
+        # mongomock no implementa explain(): se omite la verificación de índices al arrancar
+        os.environ["MONGO_INDEX_CHECK"] = "false"
+    else:
+        if getattr(args, "mongod", False):
+            os.environ["MONGO_URL"] = start_ephemeral_mongod()
+        db_connection.set_database(db_connection.get_client()[args.db_name])
+    return db_connection.get_database()
+
+
+def backend_name(args) -> str:
+    if args.mongomock:
+        return "mongomock"
+    return "mongod_ephemeral" if getattr(args, "mongod", False) else "mongod"
+
+
+def start_ephemeral_mongod(timeout: float = 20.0) -> str:
+    """Arranca un mongod en un puerto libre y un dbpath temporal; se detiene al salir"""
+    binary = shutil.which("mongod")
+    if binary is None:
+        sys.exit("No se encontró el binario mongod en el PATH (use --mongomock o MONGO_URL)")
+    dbpath = tempfile.mkdtemp(prefix="bench-mongod-")
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    process = subprocess.Popen(
+        [binary, "--dbpath", dbpath, "--port", str(port), "--bind_ip", "127.0.0.1", "--quiet"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    def stop():
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        shutil.rmtree(dbpath, ignore_errors=True)
+
+    atexit.register(stop)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit(f"mongod terminó al arrancar (código {process.returncode})")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return f"mongodb://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.1)
+    sys.exit("mongod no aceptó conexiones a tiempo")
+
+
+async def seed(database, chats: int, messages_per_chat: int):
+    """Crea chats y mensajes de prueba directamente en las colecciones"""
+    await database["chats"].delete_many({})
+    await database["messages"].delete_many({})
+    chat_ids = []
+    now = datetime.now()
+    for i in range(chats):
+        result = await database["chats"].insert_one({"datetime": now - timedelta(minutes=i)})
+        chat_ids.append(result.inserted_id)
+        if messages_per_chat:
+            await database["messages"].insert_many([
+                {
+                    "role": "user" if j % 2 == 0 else "assistant",
+                    "content": f"Mensaje {j} del chat {i}",
+                    "datetime": now - timedelta(minutes=i) + timedelta(seconds=j),
+                    "chat_id": result.inserted_id,
+                }
+                for j in range(messages_per_chat)
+            ])
+    return [str(chat_id) for chat_id in chat_ids]
+
+
+def rss_mb() -> float:
+    """Memoria residente actual del proceso en MB (0 si /proc no está disponible)"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return round(int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20, 1)
+    except (OSError, ValueError):
+        return 0.0
+
+
+def peak_rss_mb() -> float:
+    """Pico de memoria residente del proceso en MB"""
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KB; macOS, bytes
+    return round(peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10, 1)
+
+
+def percentile(values, pct: float) -> float:
+    """Percentil por interpolación lineal"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+
+def summarize(latencies, wall_time: float) -> dict:
+    """Resumen de latencias en milisegundos"""
+    return {
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / wall_time, 2) if wall_time else 0.0,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3) if latencies else 0.0,
+    }
+
+
+def report(results: dict):
+    """Imprime el resultado en JSON para comparar entre ejecuciones"""
+    print(json.dumps(results, indent=2, ensure_ascii=False))
@@ -0,0 +1,218 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from API.interface.ILLMApi import ILLMApi
+
+
+class AsyncMockCursor:
+    """Adapta un cursor de mongomock a la interfaz asíncrona de PyMongo"""
+
+    def __init__(self, cursor, latency: float = 0.0):
+        self._cursor = cursor
+        self._latency = latency
+        self._iterator = None
+
+    def sort(self, *args, **kwargs):
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, limit: int):
+        self._cursor = self._cursor.limit(limit)
+        return self
+
+    def batch_size(self, batch_size: int):
+        return self
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._iterator is None:
+            # Primer batch: simula el round trip al servidor
+            await asyncio.sleep(self._latency)
+            self._iterator = iter(self._cursor)
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def to_list(self, length=None):
+        result = []
+        async for document in self:
+            result.append(document)
+            if length is not None and len(result) >= length:
+                break
+        return result
+
+
+class AsyncMockCollection:
+    """Colección mongomock con la misma superficie asíncrona que AsyncCollection"""
+
+    def __init__(self, collection, latency: float = 0.0):
+        self._collection = collection
+        self._latency = latency
+
+    def find(self, *args, **kwargs):
+        return AsyncMockCursor(self._collection.find(*args, **kwargs), self._latency)
+
+    async def aggregate(self, pipeline, **kwargs):
+        await asyncio.sleep(self._latency)
+        return AsyncMockCursor(iter(list(self._collection.aggregate(self._compatible(pipeline)))))
+
+    @classmethod
+    def _compatible(cls, value):
+        """Reemplaza $substrCP (no implementado en mongomock) por $substr, que en él también cuenta caracteres"""
+        if isinstance(value, dict):
+            return {("$substr" if key == "$substrCP" else key): cls._compatible(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [cls._compatible(item) for item in value]
+        return value
+
+    async def bulk_write(self, operations, ordered: bool = True):
+        """bulk_write sobre mongomock (su implementación no acepta las operaciones de PyMongo 4.x)"""
+        from pymongo import InsertOne, UpdateOne
+
+        await asyncio.sleep(self._latency)
+        inserted = modified = 0
+        for operation in operations:
+            if isinstance(operation, InsertOne):
+                self._collection.insert_one(operation._doc)
+                inserted += 1
+            elif isinstance(operation, UpdateOne):
+                modified += self._collection.update_one(operation._filter, operation._doc,
+                                                        upsert=bool(operation._upsert)).modified_count
+            else:
+                raise NotImplementedError(type(operation).__name__)
+        return SimpleNamespace(inserted_count=inserted, modified_count=modified)
+
+    def __getattr__(self, name):
+        attribute = getattr(self._collection, name)
+        if not callable(attribute):
+            return attribute
+
+        async def call(*args, **kwargs):
+            await asyncio.sleep(self._latency)
+            return attribute(*args, **kwargs)
+
+        return call
+
+
+class AsyncMockDatabase:
+    """Base de datos en memoria (mongomock) con latencia de red simulada"""
+
+    def __init__(self, name: str = "hackaton_chat", latency: float = 0.0):
+        import mongomock
+
+        self._database = mongomock.MongoClient()[name]
+        self._latency = latency
+        self._collections = {}
+
+    def __getitem__(self, name: str) -> AsyncMockCollection:
+        if name not in self._collections:
+            self._collections[name] = AsyncMockCollection(self._database[name], self._latency)
+        return self._collections[name]
+
+    async def command(self, *args, **kwargs):
+        await asyncio.sleep(self._latency)
+        return {"ok": 1.0}
+
+
+class FakeChunk:
+    """Chunk con la misma forma que los del SDK de Gemini"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGemini(ILLMApi):
+    """Sustituto de Gemini que emite chunks con retardo configurable
+
+    Con blocking=True cada retardo usa time.sleep, reproduciendo el
+    comportamiento de iterar un stream síncrono dentro del event loop.
+    """
+
+    def __init__(self, first_token_delay: float = 0.3, chunk_delay: float = 0.02,
+                 chunks: int = 20, chunk_text: str = "token ", blocking: bool = False,
+                 fail: bool = False):
+        super().__init__("fake-gemini")
+        self.first_token_delay = first_token_delay
+        self.chunk_delay = chunk_delay
+        self.chunks = chunks
+        self.chunk_text = chunk_text
+        self.blocking = blocking
+        # Con fail=True cada petición falla antes del primer token (proveedor caído)
+        self.fail = fail
+        self.requests = 0
+
+    async def _sleep(self, seconds: float):
+        if self.blocking:
+            import time
+            time.sleep(seconds)
+        else:
+            await asyncio.sleep(seconds)
+
+    async def _stream(self):
+        await self._sleep(self.first_token_delay)
+        if self.fail:
+            raise RuntimeError("Proveedor falso no disponible")
+        for i in range(self.chunks):
+            if i:
+                await self._sleep(self.chunk_delay)
+            yield FakeChunk(self.chunk_text)
+
+    async def responder_pregunta_async(self, pregunta: str):
+        self.requests += 1
+        return self._stream()
+
+    async def responder_pregunta_con_contexto_async(self, pregunta: str, contexto: list):
+        self.requests += 1
+        return self._stream()
+
+    async def resumir_conversacion_async(self, resumen_previo: str, contexto: list) -> str:
+        await self._sleep(self.first_token_delay)
+        return f"Resumen de {len(contexto)} mensajes"
+
+
+class FakeMistral(ILLMApi):
+    """Sustituto de MistralAPI con latencia por petición configurable
+
+    Con `rate_limiter` asignado cada petición pasa por él, igual que en
+    MistralAPI._complete_async.
+    """
+
+    def __init__(self, latency: float = 0.5, per_message_latency: float = 0.02):
+        super().__init__("fake-mistral")
+        self.latency = latency
+        self.per_message_latency = per_message_latency
+        self.requests = 0
+
+    @staticmethod
+    def _score(pregunta: str) -> str:
+        # Puntaje determinista a partir del mensaje (ignora la referencia recuperada)
+        mensaje = pregunta[pregunta.rfind("Escrito por"):]
+        key = "satisfacion" if mensaje.startswith("Escrito por user") else "precision"
+        return json.dumps({key: 50 + len(mensaje) % 50})
+
+    def responder_pregunta(self, pregunta: str):
+        import time
+        self.requests += 1
+        time.sleep(self.latency)
+        return self._score(pregunta)
+
+    async def responder_pregunta_async(self, pregunta: str):
+        self.requests += 1
+        async with self._con_cupo([pregunta]):
+            await asyncio.sleep(self.latency)
+        return self._score(pregunta)
+
+    async def analizar_lote_async(self, mensajes: list, referencia: str = None):
+        self.requests += 1
+        async with self._con_cupo([mensaje["content"] for mensaje in mensajes]):
+            await asyncio.sleep(self.latency + self.per_message_latency * len(mensajes))
+        resultados = []
+        for indice, mensaje in enumerate(mensajes):
+            item = json.loads(self._score(f"Escrito por {mensaje['role']}: {mensaje['content']}"))
+            item["indice"] = indice
+            resultados.append(item)
+        return json.dumps({"resultados": resultados})
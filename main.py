@@ -1,18 +1,57 @@
 from dotenv import load_dotenv
 load_dotenv()
 
-from fastapi import FastAPI
+import os
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.src.controller.ControllerChat import ControllerChat
 from app.src.controller.ControllerMessage import ControllerMessage
 from app.src.controller.ControllerMetricas import ControllerMetricas
+from app.src.controller.ControllerExport import ControllerExport
 from app.src.database.connection import db_connection
+from app.src.database.indexes import index_registry
+from app.src.database.write_behind import message_writer
+from app.src.service.ServiceMetricasJob import metricas_jobs
+from app.src.cache.HistoryCache import history_cache
+from app.src.utils.Responses import FastJSONResponse
+from app.src.utils.Metrics import MetricsMiddleware, metrics
+from app.src.utils.AdmissionControl import chat_admission, metricas_admission
+from app.src.utils.RateLimiter import provider_limiters
+from app.src.cache.ResponseCache import response_cache
+from API.RetrievalIndex import RETRIEVAL_ENABLED, retrieval_index
+from API.ProviderRegistry import provider_registry
+
+# Fracción del pool en uso a partir de la cual /health reporta "degraded"
+POOL_SATURATION_WARNING = float(os.getenv("HEALTH_POOL_SATURATION", "0.9"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Inicialización y cierre de recursos de la aplicación"""
+    # Crear el cliente y calentar el pool antes de aceptar peticiones
+    await db_connection.open()
+    # Falla al arrancar si una consulta crítica no está cubierta por un índice
+    await index_registry.setup(db_connection.get_database())
+    if RETRIEVAL_ENABLED:
+        # Cargar (o construir) el índice de recuperación fuera del event loop
+        await asyncio.to_thread(retrieval_index.ensure_loaded)
+    # Retomar trabajos de métricas que quedaron a medias (proceso caído o reiniciado)
+    await metricas_jobs.resume_orphans()
+    yield
+    # Detener los trabajos de métricas guardando su checkpoint
+    await metricas_jobs.close()
+    # Insertar los mensajes pendientes antes de cerrar la conexión
+    await message_writer.close()
+    await db_connection.close_connection()
 
 # Crear la aplicación FastAPI
 app = FastAPI(
     title="Hackaton Chat API",
     description="API para gestionar chats y mensajes con MongoDB",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # Configurar CORS
@@ -24,15 +63,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Latencia por ruta (y span raíz de cada petición si TRACING_ENABLED=true)
+if metrics.enabled:
+    app.add_middleware(MetricsMiddleware)
+
 # Inicializar controladores
 chat_controller = ControllerChat()
 message_controller = ControllerMessage()
 metricas_controller = ControllerMetricas()
+export_controller = ControllerExport()
 
 # Registrar rutas
 app.include_router(chat_controller.get_router())
 app.include_router(message_controller.get_router())
 app.include_router(metricas_controller.get_router())
+app.include_router(export_controller.get_router())
 
 @app.get("/")
 async def root():
@@ -43,25 +88,42 @@ async def root():
         "version": "1.0.0"
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Histogramas de latencia por etapa en formato de texto de Prometheus"""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/health")
 async def health_check():
     """Endpoint para verificar el estado de la aplicación"""
-    try:
-        # Verificar conexión a MongoDB
-        db = db_connection.get_database()
-        db.command("ping")
-        
-        return {
-            "status": "healthy",
-            "database": "connected",
-            "message": "Todos los servicios funcionando correctamente"
-        }
-    except Exception as e:
+    # Ping acotado por HEALTH_PING_TIMEOUT y estado del pool (sin bloquear si MongoDB no responde)
+    database = await db_connection.probe()
+    if not database["connected"]:
         return {
             "status": "unhealthy",
             "database": "disconnected",
-            "error": str(e)
+            "pool": database["pool"],
+            "error": database["error"]
         }
+    
+    # El router solo se construye aquí; los clientes de cada proveedor siguen siendo perezosos
+    router = provider_registry.get("chat")
+    saturation = database["pool"]["saturation"] or 0.0
+    
+    return {
+        "status": "degraded" if saturation >= POOL_SATURATION_WARNING else "healthy",
+        "database": "connected",
+        "ping_ms": database["ping_ms"],
+        "pool": database["pool"],
+        "history_cache": history_cache.get_stats(),
+        "response_cache": response_cache.get_stats(),
+        "message_writer": message_writer.get_stats(),
+        "metricas_jobs": metricas_jobs.get_stats(),
+        "admission": {"chat": chat_admission.get_stats(), "metricas": metricas_admission.get_stats()},
+        "rate_limits": {name: limiter.get_stats() for name, limiter in provider_limiters.items()},
+        "llm_providers": router.get_stats() if hasattr(router, "get_stats") else {},
+        "message": "Todos los servicios funcionando correctamente"
+    }
 
 if __name__ == "__main__":
     import uvicorn